@@ -1,525 +1,344 @@
-import streamlit as st
-import pandas as pd
-import numpy as np
-from datetime import datetime
-
-# Настройки страницы
-st.set_page_config(
-    page_title="Antibiotic Stewardship System",
-    page_icon="🛡️", 
-    layout="wide",
-    initial_sidebar_state="expanded"
-)
-
-# Стили с фиолетовой цветовой схемой
-st.markdown("""
-<style>
-    @import url('https://fonts.googleapis.com/css2?family=Inter:wght@300;400;500;600;700&display=swap');
-    
-    html, body, [class*="css"] {
-        font-family: 'Inter', sans-serif;
-        line-height: 1.6;
-    }
-    
-    h1, h2, h3, h4, h5, h6 {
-        font-family: 'Inter', sans-serif;
-        font-weight: 600;
-        color: #1a1a1a;
-        letter-spacing: -0.02em;
-    }
-    
-    .main {
-        background-color: #f8f9fa;
-    }
-    
-    .stButton>button {
-        font-family: 'Inter', sans-serif;
-        font-weight: 500;
-    }
-    
-    .stSelectbox, .stMultiselect, .stNumberInput, .stSlider {
-        font-family: 'Inter', sans-serif;
-    }
-    
-    .header-section {
-        background: #8B5FBF;
-        padding: 40px 30px;
-        border-radius: 16px;
-        color: white;
-        text-align: center;
-        margin-bottom: 30px;
-        box-shadow: 0 8px 25px rgba(139, 95, 191, 0.3);
-    }
-    
-    .crisis-alert {
-        background: #ff6b6b;
-        color: white;
-        padding: 24px;
-        border-radius: 12px;
-        margin: 20px 0;
-        border: none;
-        box-shadow: 0 4px 15px rgba(255, 107, 107, 0.3);
-    }
-    
-    .stats-box {
-        background: white;
-        padding: 24px;
-        border-radius: 12px;
-        border-left: 6px solid #8B5FBF;
-        margin: 15px 0;
-        box-shadow: 0 2px 12px rgba(0,0,0,0.08);
-    }
-    
-    .antibiotic-box {
-        background: #f3e8ff;
-        padding: 20px;
-        border-radius: 10px;
-        border-left: 5px solid #8B5FBF;
-        margin: 12px 0;
-        box-shadow: 0 2px 8px rgba(139, 95, 191, 0.1);
-    }
-    
-    .no-antibiotic-box {
-        background: #e8f5e8;
-        padding: 20px;
-        border-radius: 10px;
-        border-left: 5px solid #4caf50;
-        margin: 12px 0;
-        box-shadow: 0 2px 8px rgba(76, 175, 80, 0.1);
-    }
-    
-    .diagnosis-card {
-        background: white;
-        padding: 25px;
-        border-radius: 12px;
-        margin: 15px 0;
-        box-shadow: 0 4px 15px rgba(0,0,0,0.1);
-        border: 1px solid #e0e0e0;
-    }
-    
-    .sidebar-section {
-        background: white;
-        padding: 20px;
-        border-radius: 12px;
-        margin: 10px 0;
-        box-shadow: 0 2px 8px rgba(0,0,0,0.08);
-        border-left: 4px solid #8B5FBF;
-    }
-    
-    @keyframes pulse {
-        0% { transform: scale(1); }
-        50% { transform: scale(1.02); }
-        100% { transform: scale(1); }
-    }
-    
-    .pulse-alert {
-        animation: pulse 2s infinite;
-    }
-</style>
-""", unsafe_allow_html=True)
-
-# 🏥 БАЗА ЗАБОЛЕВАНИЙ И ЛЕЧЕНИЯ
-MEDICAL_KNOWLEDGE_BASE = {
-    "community_acquired_pneumonia": {
-        "diagnosis_criteria": ["Лихорадка >38°C", "Кашель", "Одышка", "Боль в груди", "Лейкоцитоз", "Повышение СРБ"],
-        "required_criteria": 3,
-        "treatments": {
-            "antibiotics": ["Амоксициллин/клавуланат 875/125 мг 2 раза/сут × 7-10 дней", "Азитромицин 500 мг/сут × 3-5 дней"],
-            "symptomatic": ["Парацетамол 500 мг при температуре", "Муколитики (АЦЦ 600 мг/сут)", "Ингаляции с физраствором"],
-            "supportive": ["Постельный режим", "Обильное питье", "Контроль сатурации"]
-        },
-        "referral": "При тяжелом течении - госпитализация",
-        "source": "IDSA/ATS Guidelines 2019"
-    },
-    
-    "streptococcal_pharyngitis": {
-        "diagnosis_criteria": ["Боль в горле", "Лихорадка >38°C", "Налеты на миндалинах", "Увеличение шейных лимфоузлов", "Отсутствие кашля"],
-        "required_criteria": 4,
-        "treatments": {
-            "antibiotics": ["Феноксиметилпенициллин 500 мг 3 раза/сут × 10 дней", "Азитромицин 500 мг/сут × 3 дня при аллергии"],
-            "symptomatic": ["Парацетамол 500 мг при боли", "Местные антисептики (Гексорал, Тантум Верде)", "Полоскание содо-солевым раствором"],
-            "supportive": ["Щадящая диета", "Теплое питье", "Голосовой покой"]
-        },
-        "referral": "При рецидивирующем течении - консультация ЛОРа",
-        "source": "IDSA Pharyngitis Guidelines"
-    },
-    
-    "urinary_tract_infection": {
-        "diagnosis_criteria": ["Дизурия", "Учащенное мочеиспускание", "Боль в надлобковой области", "Лихорадка", "Лейкоциты в моче"],
-        "required_criteria": 2,
-        "treatments": {
-            "antibiotics": ["Нитрофурантоин 100 мг 3 раза/сут × 5 дней", "Фосфомицин 3 г однократно", "Цефтриаксон 1 г/сут в/м при осложнениях"],
-            "symptomatic": ["Ибупрофен 400 мг при боли", "Спазмолитики (Но-шпа 40-80 мг/сут)", "Уросептики (Фитолизин)"],
-            "supportive": ["Обильное питье", "Клюквенные морсы", "Исключение острой пищи"]
-        },
-        "referral": "При рецидивах - уролог, при беременности - срочно к врачу",
-        "source": "IDSA UTI Guidelines"
-    },
-    
-    "acute_bronchitis": {
-        "diagnosis_criteria": ["Кашель <3 недель", "Может быть продуктивным", "Отсутствие лихорадки >38°C", "Отсутствие одышки", "Нормальные показатели воспаления"],
-        "required_criteria": 3,
-        "treatments": {
-            "antibiotics": ["Антибиотики НЕ ПОКАЗАНЫ при вирусной этиологии"],
-            "symptomatic": ["Противокашлевые (Синекод) при сухом кашле", "Муколитики (Амброксол 30 мг 3 раза/сут)", "Бронходилататоры (Сальбутамол) при бронхоспазме"],
-            "supportive": ["Увлажнение воздуха", "Теплое питье", "Ингаляции", "Отказ от курения"]
-        },
-        "referral": "При сохранении симптомов >3 недель - пульмонолог",
-        "source": "NICE Bronchitis Guidelines"
-    },
-    
-    "influenza": {
-        "diagnosis_criteria": ["Внезапное начало", "Лихорадка", "Головная боль", "Мышечные боли", "Слабость", "Сезонность"],
-        "required_criteria": 3,
-        "treatments": {
-            "antivirals": ["Осельтамивир 75 мг 2 раза/сут × 5 дней", "Занамивир ингаляционно"],
-            "symptomatic": ["Парацетамол 500 мг при температуре", "Ибупрофен 400 мг при боли", "Сосудосуживающие капли при рините"],
-            "supportive": ["Постельный режим", "Обильное питье", "Витамин C", "Проветривание помещения"]
-        },
-        "referral": "При тяжелом течении, беременным, пожилым - срочно к врачу",
-        "source": "WHO Influenza Guidelines"
-    },
-    
-    "acute_gastroenteritis": {
-        "diagnosis_criteria": ["Тошнота", "Рвота", "Диарея", "Боль в животе", "Слабость", "Возможна субфебрильная температура"],
-        "required_criteria": 3,
-        "treatments": {
-            "rehydration": ["Регидрон 1 пакет на 1 л воды", "Оральные солевые растворы", "Частое дробное питье"],
-            "symptomatic": ["Смекта 3 пакета/сут", "Энтеросорбенты (Полисорб)", "Противорвотные (Метоклопрамид) только по назначению"],
-            "diet": ["Голод 4-6 часов", "Затем щадящая диета (рис, сухари, бананы)", "Исключение молочного, жирного, острого"]
-        },
-        "referral": "При признаках дегидратации, крови в стуле - срочно к врачу",
-        "source": "ESPID Gastroenteritis Guidelines"
-    },
-    
-    "hypertensive_crisis": {
-        "diagnosis_criteria": ["АД >180/120 мм рт.ст.", "Головная боль", "Тошнота", "Нарушение зрения", "Одышка", "Боль в груди"],
-        "required_criteria": 2,
-        "treatments": {
-            "emergency": ["Немедленный вызов скорой помощи", "Каптоприл 25 мг сублингвально", "Нифедипин 10 мг (только по назначению)"],
-            "monitoring": ["Контроль АД каждые 15 минут", "Покой, полусидячее положение", "Доступ свежего воздуха"]
-        },
-        "referral": "ЭКГ, госпитализация в кардиологическое отделение",
-        "source": "ESC Hypertension Guidelines"
-    }
-}
-
-# 🔍 ДИАГНОСТИЧЕСКАЯ СИСТЕМА
-def medical_diagnosis_system(symptoms, lab_data, vital_signs, temperature, bp_systolic, bp_diastolic, wbc, crp):
-    symptom_score = {}
-    
-    # Проверяем критические состояния первыми
-    if bp_systolic > 180 and bp_diastolic > 120:
-        if any(symptom in ["Головная боль", "Тошнота", "Нарушение зрения", "Одышка", "Боль в груди"] for symptom in symptoms):
-            return "hypertensive_crisis", 10
-    
-    # Определяем лабораторные показатели
-    has_leukocytosis = "Лейкоцитоз" in lab_data or wbc > 10.0
-    has_elevated_crp = "Повышение СРБ" in lab_data or crp > 5.0
-    has_urinary_leuko = "Лейкоциты в моче" in lab_data
-    
-    # Пневмония
-    pneumonia_score = sum([
-        2 if "Лихорадка >38°C" in symptoms and temperature > 38 else 0,
-        2 if "Кашель с мокротой" in symptoms else 1 if "Кашель" in symptoms else 0,
-        2 if "Одышка" in symptoms else 0,
-        2 if "Боль в груди" in symptoms else 0,
-        2 if has_leukocytosis else 0,
-        2 if has_elevated_crp else 0
-    ])
-    symptom_score["community_acquired_pneumonia"] = pneumonia_score
-    
-    # Ангина
-    pharyngitis_score = sum([
-        2 if "Боль в горле" in symptoms else 0,
-        2 if "Налеты на миндалинах" in symptoms else 0,
-        2 if "Лихорадка >38°C" in symptoms and temperature > 38 else 0,
-        2 if "Увеличение лимфоузлов" in symptoms else 0,
-        -2 if "Кашель" in symptoms else 1,
-        1 if "Головная боль" in symptoms else 0
-    ])
-    symptom_score["streptococcal_pharyngitis"] = pharyngitis_score
-    
-    # ИМП
-    uti_score = sum([
-        3 if "Дизурия" in symptoms else 0,
-        2 if "Учащенное мочеиспускание" in symptoms else 0,
-        2 if "Боль в надлобковой области" in symptoms else 0,
-        2 if has_urinary_leuko else 0,
-        2 if "Лихорадка >38°C" in symptoms and temperature > 38 else 0
-    ])
-    symptom_score["urinary_tract_infection"] = uti_score
-    
-    # Бронхит
-    bronchitis_score = sum([
-        2 if "Кашель" in symptoms else 0,
-        2 if "Кашель с мокротой" in symptoms else 0,
-        -2 if "Лихорадка >38°C" in symptoms and temperature > 38 else 1,
-        -2 if "Одышка" in symptoms else 1,
-        -2 if has_leukocytosis else 1,
-        1 if "Слабость" in symptoms else 0
-    ])
-    symptom_score["acute_bronchitis"] = bronchitis_score
-    
-    # Грипп
-    influenza_score = sum([
-        2 if "Лихорадка >38°C" in symptoms and temperature > 38 else 0,
-        2 if "Головная боль" in symptoms else 0,
-        2 if "Мышечные боли" in symptoms else 0,
-        2 if "Слабость" in symptoms else 0,
-        2 if "Внезапное начало" in symptoms else 0,
-        1 if "Сезонность" in symptoms else 0
-    ])
-    symptom_score["influenza"] = influenza_score
-    
-    # Гастроэнтерит
-    gastroenteritis_score = sum([
-        3 if "Тошнота" in symptoms else 0,
-        3 if "Рвота" in symptoms else 0,
-        3 if "Диарея" in symptoms else 0,
-        2 if "Боль в животе" in symptoms else 0,
-        1 if "Слабость" in symptoms else 0,
-        1 if "Субфебрильная температура" in symptoms and 37 < temperature < 38 else 0
-    ])
-    symptom_score["acute_gastroenteritis"] = gastroenteritis_score
-    
-    # Находим наиболее вероятный диагноз
-    sorted_diagnoses = sorted(symptom_score.items(), key=lambda x: x[1], reverse=True)
-    
-    return sorted_diagnoses[0][0], sorted_diagnoses
-
-# 🎯 ОСНОВНОЙ ИНТЕРФЕЙС
-def main():
-    # ЗАГОЛОВОК С ФИОЛЕТОВЫМ ФОНОМ
-    st.markdown("""
-    <div class="header-section">
-        <h1 style="margin:0; font-size:2.8rem; font-weight:700;">Antibiotic Stewardship System</h1>
-        <p style="font-size:1.3rem; margin:15px 0 0 0; opacity:0.9;">
-            Борьба с антибиотикорезистентностью через рациональную диагностику
-        </p>
-    </div>
-    """, unsafe_allow_html=True)
-    
-    # СТАТИСТИКА ПРОБЛЕМЫ
-    col1, col2, col3 = st.columns(3)
-    with col1:
-        st.markdown("""
-        <div class="stats-box">
-            <h3 style="color:#8B5FBF; margin:0">1.2M</h3>
-            <p style="margin:5px 0 0 0; color:#666">смертей в год от резистентности</p>
-        </div>
-        """, unsafe_allow_html=True)
-    
-    with col2:
-        st.markdown("""
-        <div class="stats-box">
-            <h3 style="color:#8B5FBF; margin:0">50%</h3>
-            <p style="margin:5px 0 0 0; color:#666">нерациональных назначений антибиотиков</p>
-        </div>
-        """, unsafe_allow_html=True)
-    
-    with col3:
-        st.markdown("""
-        <div class="stats-box">
-            <h3 style="color:#8B5FBF; margin:0">$100T</h3>
-            <p style="margin:5px 0 0 0; color:#666">мировые потери к 2050 году</p>
-        </div>
-        """, unsafe_allow_html=True)
-    
-    # ОСНОВНОЙ ИНТЕРФЕЙС ДИАГНОСТИКИ
-    st.markdown("---")
-    st.header("Клиническая диагностика")
-    st.write("Система поддержки врачебных решений для рационального назначения антибиотиков")
-    
-    # ВВОД ДАННЫХ
-    col1, col2 = st.columns(2)
-    
-    with col1:
-        st.subheader("Клиническая картина")
-        
-        symptoms = st.multiselect(
-            "Симптомы пациента:",
-            [
-                "Лихорадка >38°C", "Озноб", "Кашель", "Кашель с мокротой", 
-                "Одышка", "Боль в груди", "Боль в горле", "Налеты на миндалинах", 
-                "Увеличение лимфоузлов", "Дизурия", "Учащенное мочеиспускание",
-                "Боль в надлобковой области", "Тошнота", "Рвота", "Диарея",
-                "Боль в животе", "Головная боль", "Мышечные боли", "Слабость",
-                "Внезапное начало", "Сезонность", "Субфебрильная температура"
-            ]
-        )
-        
-        temperature = st.slider("Температура тела (°C):", 35.0, 42.0, 37.0, 0.1)
-        
-    with col2:
-        st.subheader("Лабораторные показатели")
-        
-        wbc = st.number_input("Лейкоциты (×10⁹/л):", min_value=1.0, max_value=50.0, value=6.0, step=0.1,
-                             help="Норма: 4.0-9.0 ×10⁹/л")
-        
-        crp = st.number_input("СРБ (мг/л):", min_value=0.0, max_value=200.0, value=2.0, step=0.1,
-                             help="Норма: <5 мг/л")
-        
-        lab_data = st.multiselect(
-            "Другие результаты анализов:",
-            [
-                "Лейкоциты в моче", "Нитриты в моче", "Анализы в норме"
-            ]
-        )
-        
-        st.subheader("Артериальное давление")
-        bp_col1, bp_col2 = st.columns(2)
-        with bp_col1:
-            bp_systolic = st.number_input("Систолическое (мм рт.ст.):", 80, 250, 120)
-        with bp_col2:
-            bp_diastolic = st.number_input("Диастолическое (мм рт.ст.):", 50, 150, 80)
-    
-    # ДИАГНОСТИКА
-    if st.button("Запустить диагностику", type="primary", use_container_width=True):
-        if not symptoms:
-            st.warning("Пожалуйста, введите симптомы пациента")
-            return
-            
-        with st.spinner("Проводим анализ по клиническим рекомендациям..."):
-            # Диагностика
-            vital_signs = f"Температура: {temperature}°C, АД: {bp_systolic}/{bp_diastolic} мм рт.ст."
-            main_diagnosis, all_diagnoses = medical_diagnosis_system(
-                symptoms, lab_data, vital_signs, temperature, bp_systolic, bp_diastolic, wbc, crp
-            )
-            
-            # РЕЗУЛЬТАТЫ
-            st.markdown("---")
-            st.header("Результаты диагностики")
-            
-            # Основной диагноз
-            diagnosis_info = MEDICAL_KNOWLEDGE_BASE[main_diagnosis]
-            diagnosis_name = main_diagnosis.replace('_', ' ').title()
-            
-            st.markdown(f"""
-            <div class="diagnosis-card">
-                <h2 style="color:#2c3e50; margin:0 0 15px 0">{diagnosis_name}</h2>
-                <p><strong>Баллы диагностики:</strong> {all_diagnoses[0][1]}/10</p>
-                <p><strong>Источник рекомендаций:</strong> {diagnosis_info['source']}</p>
-            </div>
-            """, unsafe_allow_html=True)
-            
-            # КРИТИЧЕСКИЕ СОСТОЯНИЯ
-            if main_diagnosis == "hypertensive_crisis":
-                st.markdown("""
-                <div class="crisis-alert pulse-alert">
-                    <h3 style="margin:0; color:white">Критическое состояние!</h3>
-                    <p style="margin:10px 0 0 0; color:white; font-size:1.1rem">
-                    Немедленный вызов скорой помощи • Контроль АД каждые 15 минут • Покой, полусидячее положение
-                    </p>
-                </div>
-                """, unsafe_allow_html=True)
-            
-            # ЛЕЧЕНИЕ
-            st.subheader("Рекомендации по лечению")
-            
-            treatments = diagnosis_info["treatments"]
-            
-            if "antibiotics" in treatments:
-                st.markdown("""
-                <div class="antibiotic-box">
-                    <h4 style="margin:0 0 10px 0; color:#8B5FBF">Антибактериальная терапия</h4>
-                """, unsafe_allow_html=True)
-                for med in treatments["antibiotics"]:
-                    st.write(f"• {med}")
-                st.markdown("</div>", unsafe_allow_html=True)
-            
-            if "antivirals" in treatments:
-                st.markdown("""
-                <div class="antibiotic-box">
-                    <h4 style="margin:0 0 10px 0; color:#8B5FBF">Противовирусная терапия</h4>
-                """, unsafe_allow_html=True)
-                for med in treatments["antivirals"]:
-                    st.write(f"• {med}")
-                st.markdown("</div>", unsafe_allow_html=True)
-            
-            if "antibiotics" not in treatments and "Антибиотики НЕ ПОКАЗАНЫ" in str(treatments.get("antibiotics", [])):
-                st.markdown("""
-                <div class="no-antibiotic-box">
-                    <h4 style="margin:0 0 10px 0; color:#2e7d32">Рациональная антибиотикотерапия</h4>
-                    <p style="margin:0; font-weight:500">Антибиотики не показаны - сохранение эффективности препаратов для будущих поколений</p>
-                </div>
-                """, unsafe_allow_html=True)
-            
-            # СИМПТОМАТИЧЕСКОЕ ЛЕЧЕНИЕ
-            if "symptomatic" in treatments or "supportive" in treatments or "rehydration" in treatments:
-                st.markdown("""
-                <div class="stats-box">
-                    <h4 style="margin:0 0 15px 0; color:#2c3e50">Симптоматическое и вспомогательное лечение</h4>
-                """, unsafe_allow_html=True)
-                
-                if "symptomatic" in treatments:
-                    st.write("**Симптоматическое:**")
-                    for med in treatments["symptomatic"]:
-                        st.write(f"• {med}")
-                
-                if "supportive" in treatments:
-                    st.write("**Вспомогательное:**")
-                    for action in treatments["supportive"]:
-                        st.write(f"• {action}")
-                
-                if "rehydration" in treatments:
-                    st.write("**Регидратация:**")
-                    for med in treatments["rehydration"]:
-                        st.write(f"• {med}")
-                
-                st.markdown("</div>", unsafe_allow_html=True)
-            
-            # НАПРАВЛЕНИЯ
-            st.markdown("""
-            <div class="stats-box">
-                <h4 style="margin:0 0 10px 0; color:#2c3e50">Дальнейшие действия</h4>
-                <p style="margin:0">{}</p>
-            </div>
-            """.format(diagnosis_info["referral"]), unsafe_allow_html=True)
-            
-            # ДИФФЕРЕНЦИАЛЬНАЯ ДИАГНОСТИКА
-            st.subheader("Дифференциальная диагностика")
-            for i, (diagnosis, score) in enumerate(all_diagnoses[1:4], 1):
-                diag_name = diagnosis.replace('_', ' ').title()
-                st.write(f"{i}. **{diag_name}** ({score} баллов)")
-    
-    # БОКОВАЯ ПАНЕЛЬ
-    with st.sidebar:
-        st.markdown("""
-        <div class="sidebar-section">
-            <h3 style="margin:0 0 15px 0">О системе</h3>
-            <p style="margin:0 0 15px 0; color:#666">
-            Образовательная платформа для борьбы с антибиотикорезистентностью 
-            через рациональную диагностику и назначение терапии.
-            </p>
-        </div>
-        """, unsafe_allow_html=True)
-        
-        st.markdown("""
-        <div class="sidebar-section">
-            <h4 style="margin:0 0 12px 0">Диагностируемые состояния</h4>
-            <ul style="margin:0; padding-left:20px; color:#666">
-            <li>Пневмония</li>
-            <li>Стрептококковая ангина</li>
-            <li>Инфекции мочевых путей</li>
-            <li>Острый бронхит</li>
-            <li>Грипп</li>
-            <li>Острый гастроэнтерит</li>
-            <li>Гипертонический криз</li>
-            </ul>
-        </div>
-        """, unsafe_allow_html=True)
-        
-        st.markdown("""
-        <div class="sidebar-section">
-            <h4 style="margin:0 0 12px 0; color:#d32f2f">Важно</h4>
-            <p style="margin:0; color:#666; font-size:0.9rem">
-            Данная система предназначена для образовательных целей 
-            и не заменяет консультацию врача. При критических состояниях 
-            немедленно обращайтесь за медицинской помощью.
-            </p>
-        </div>
-        """, unsafe_allow_html=True)
-
-if __name__ == "__main__":
-    main()
+import streamlit as st
+import html
+import time
+
+import metrics
+from diagnosis_engine import DIFFERENTIAL_SIZE, cached_medical_diagnosis_system, get_ruleset
+from page_style import PAGE_CSS
+
+# Настройки страницы
+st.set_page_config(
+    page_title="Antibiotic Stewardship System",
+    page_icon="🛡️", 
+    layout="wide",
+    initial_sidebar_state="expanded"
+)
+
+st.markdown(PAGE_CSS, unsafe_allow_html=True)
+
+# 🖼️ ШАБЛОНЫ РЕЗУЛЬТАТОВ
+# Разделы с лечением и направлением зависят только от состояния, поэтому
+# готовятся один раз на процесс. Каждый раздел отправляется в браузер одним
+# st.markdown вместо отдельного st.write на каждый препарат.
+CRISIS_ALERT_HTML = (
+    '<div class="crisis-alert pulse-alert">'
+    '<h3 style="margin:0; color:white">Критическое состояние!</h3>'
+    '<p style="margin:10px 0 0 0; color:white; font-size:1.1rem">'
+    'Немедленный вызов скорой помощи • Контроль АД каждые 15 минут • Покой, полусидячее положение'
+    '</p></div>'
+)
+
+def _items_html(items):
+    return "".join(f'<p style="margin:4px 0">• {html.escape(item)}</p>' for item in items)
+
+def _treatment_html(treatments):
+    parts = []
+    if "antibiotics" in treatments:
+        parts.append(
+            '<div class="antibiotic-box">'
+            '<h4 style="margin:0 0 10px 0; color:#8B5FBF">Антибактериальная терапия</h4>'
+            + _items_html(treatments["antibiotics"]) + '</div>'
+        )
+    if "antivirals" in treatments:
+        parts.append(
+            '<div class="antibiotic-box">'
+            '<h4 style="margin:0 0 10px 0; color:#8B5FBF">Противовирусная терапия</h4>'
+            + _items_html(treatments["antivirals"]) + '</div>'
+        )
+    
+    # СИМПТОМАТИЧЕСКОЕ ЛЕЧЕНИЕ
+    groups = [("symptomatic", "Симптоматическое"), ("supportive", "Вспомогательное"), ("rehydration", "Регидратация")]
+    if any(key in treatments for key, _ in groups):
+        body = "".join(
+            f'<p style="margin:10px 0 4px 0"><strong>{title}:</strong></p>' + _items_html(treatments[key])
+            for key, title in groups if key in treatments
+        )
+        parts.append(
+            '<div class="stats-box">'
+            '<h4 style="margin:0 0 15px 0; color:#2c3e50">Симптоматическое и вспомогательное лечение</h4>'
+            + body + '</div>'
+        )
+    return "".join(parts)
+
+def _referral_html(referral):
+    return (
+        '<div class="stats-box">'
+        '<h4 style="margin:0 0 10px 0; color:#2c3e50">Дальнейшие действия</h4>'
+        f'<p style="margin:0">{html.escape(referral)}</p></div>'
+    )
+
+# Шаблоны собираются один раз на версию базы знаний: ключ кэша - отпечаток
+# набора правил, сам набор в хэширование не входит
+@st.cache_resource(show_spinner=False, max_entries=4)
+def compile_result_templates(fingerprint, _rules):
+    templates = {}
+    for condition, info in _rules.knowledge_base.items():
+        name = condition.replace('_', ' ').title()
+        templates[condition] = {
+            "name": name,
+            # Балл вставляется при отрисовке между двумя частями карточки:
+            # текст базы знаний может содержать фигурные скобки, поэтому
+            # шаблон не проходит через str.format
+            "card": (
+                '<div class="diagnosis-card">'
+                f'<h2 style="color:#2c3e50; margin:0 0 15px 0">{html.escape(name)}</h2>'
+                '<p><strong>Баллы диагностики:</strong> ',
+                '/10</p>'
+                f'<p><strong>Источник рекомендаций:</strong> {html.escape(info["source"])}</p>'
+                '</div>' + (CRISIS_ALERT_HTML if condition == "hypertensive_crisis" else "")
+            ),
+            "treatment": _treatment_html(info["treatments"]),
+            "referral": _referral_html(info["referral"])
+        }
+    return templates
+
+def render_diagnosis(main_diagnosis, all_diagnoses, rules):
+    with metrics.phase("knowledge_base"):
+        templates = compile_result_templates(rules.fingerprint, rules)
+        template = templates[main_diagnosis]
+    
+    # При гипертоническом кризе система возвращает только итоговый балл
+    if isinstance(all_diagnoses, int):
+        score, differential = all_diagnoses, []
+    else:
+        score, differential = all_diagnoses[0][1], all_diagnoses[1:DIFFERENTIAL_SIZE]
+    
+    with metrics.phase("render"):
+        _render_sections(template, templates, score, differential)
+
+def _render_sections(template, templates, score, differential):
+    st.markdown("---")
+    st.header("Результаты диагностики")
+    before, after = template["card"]
+    st.markdown(f"{before}{score}{after}", unsafe_allow_html=True)
+    
+    # ЛЕЧЕНИЕ
+    st.subheader("Рекомендации по лечению")
+    st.markdown(template["treatment"] + template["referral"], unsafe_allow_html=True)
+    
+    # ДИФФЕРЕНЦИАЛЬНАЯ ДИАГНОСТИКА
+    if differential:
+        st.subheader("Дифференциальная диагностика")
+        st.markdown("\n".join(
+            f"{i}. **{templates[diagnosis]['name']}** ({score} баллов)"
+            for i, (diagnosis, score) in enumerate(differential, 1)
+        ))
+
+# 📝 ВВОД ДАННЫХ
+def _patient_inputs(rules):
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        st.subheader("Клиническая картина")
+        
+        symptoms = st.multiselect("Симптомы пациента:", rules.symptom_options)
+        
+        temperature = st.slider("Температура тела (°C):", 35.0, 42.0, 37.0, 0.1)
+        
+    with col2:
+        st.subheader("Лабораторные показатели")
+        
+        wbc = st.number_input("Лейкоциты (×10⁹/л):", min_value=1.0, max_value=50.0, value=6.0, step=0.1,
+                             help="Норма: 4.0-9.0 ×10⁹/л")
+        
+        crp = st.number_input("СРБ (мг/л):", min_value=0.0, max_value=200.0, value=2.0, step=0.1,
+                             help="Норма: <5 мг/л")
+        
+        lab_data = st.multiselect("Другие результаты анализов:", rules.lab_options)
+        
+        st.subheader("Артериальное давление")
+        bp_col1, bp_col2 = st.columns(2)
+        with bp_col1:
+            bp_systolic = st.number_input("Систолическое (мм рт.ст.):", 80, 250, 120)
+        with bp_col2:
+            bp_diastolic = st.number_input("Диастолическое (мм рт.ст.):", 50, 150, 80)
+    
+    return symptoms, lab_data, temperature, bp_systolic, bp_diastolic, wbc, crp
+
+def run_diagnosis(rules, symptoms, lab_data, temperature, bp_systolic, bp_diastolic, wbc, crp):
+    with st.spinner("Проводим анализ по клиническим рекомендациям..."):
+        # Диагностика
+        with metrics.phase("scoring"):
+            # Общий для всех сессий LRU-кэш по канонической форме ввода;
+            # на экран выводятся только основной и дифференциальные диагнозы.
+            # Оценка и вывод - по одному набору правил, даже если фоновая
+            # перезагрузка уже подменила действующий
+            main_diagnosis, all_diagnoses = cached_medical_diagnosis_system(
+                symptoms, lab_data, None, temperature, bp_systolic, bp_diastolic, wbc, crp,
+                top_k=DIFFERENTIAL_SIZE, rules=rules
+            )
+        
+        render_diagnosis(main_diagnosis, all_diagnoses, rules)
+
+def diagnosis_form(rules):
+    # Форма: изменение полей не перезапускает скрипт до нажатия кнопки
+    with metrics.phase("input"), st.form("diagnosis_form"):
+        patient = _patient_inputs(rules)
+        submitted = st.form_submit_button("Запустить диагностику", type="primary", use_container_width=True)
+    
+    # ДИАГНОСТИКА
+    if submitted:
+        if not patient[0]:
+            st.warning("Пожалуйста, введите симптомы пациента")
+            return
+        run_diagnosis(rules, *patient)
+
+# ⚡ ЖИВОЙ ПРЕДВАРИТЕЛЬНЫЙ РАСЧЕТ
+# Фрагмент перезапускается сам по себе, без остальной страницы. Ключи
+# баллов состояний хранятся в session_state вместе с маской признаков, и
+# при изменении ввода пересчитываются только вклады признаков, которые
+# появились или исчезли: показатели, не пересекшие порог правил, не
+# меняют маску и не стоят ничего. Дебаунс: если предыдущее обновление было
+# меньше LIVE_DEBOUNCE_SECONDS назад, фрагмент сначала выжидает остаток
+# окна - новое изменение за это время прерывает запуск, и серия
+# изменений при перетаскивании ползунка дает один пересчет.
+LIVE_DEBOUNCE_SECONDS = 0.15
+
+@st.fragment
+def live_preview():
+    rules = get_ruleset()
+    symptoms, lab_data, temperature, bp_systolic, bp_diastolic, wbc, crp = _patient_inputs(rules)
+    
+    state = st.session_state.get("live_scores")
+    if state is None or state["fingerprint"] != rules.fingerprint:
+        state = st.session_state["live_scores"] = {
+            "fingerprint": rules.fingerprint, "mask": 0, "keys": rules.initial_keys(), "updated": 0.0
+        }
+    
+    wait = state["updated"] + LIVE_DEBOUNCE_SECONDS - time.monotonic()
+    if wait > 0:
+        time.sleep(wait)
+    
+    with metrics.phase("live_scoring"):
+        mask = rules.encode(symptoms, lab_data, temperature, wbc, crp)
+        rules.update_keys(state["keys"], state["mask"], mask)
+        state["mask"] = mask
+        state["updated"] = time.monotonic()
+        crisis = rules.is_crisis(mask, bp_systolic, bp_diastolic)
+        ranked = rules.top_keys(state["keys"], DIFFERENTIAL_SIZE)
+    
+    with metrics.phase("live_render"):
+        st.markdown("---")
+        st.subheader("Предварительный дифференциальный ряд")
+        if crisis:
+            st.markdown(CRISIS_ALERT_HTML, unsafe_allow_html=True)
+        elif not symptoms:
+            st.info("Отметьте симптомы - ряд обновится автоматически")
+        else:
+            main_diagnosis = ranked[0][0]
+            if rules.antibiotics_indicated(main_diagnosis):
+                box, status = "antibiotic-box", "Антибиотики показаны"
+            else:
+                box, status = "no-antibiotic-box", "Антибиотики не показаны"
+            st.markdown(
+                f'<div class="{box}"><strong>{status}</strong> при ведущем диагнозе '
+                f'{html.escape(main_diagnosis.replace("_", " ").title())}</div>',
+                unsafe_allow_html=True
+            )
+            st.markdown("\n".join(
+                f"{i}. **{condition.replace('_', ' ').title()}** ({score} баллов)"
+                for i, (condition, score) in enumerate(ranked, 1)
+            ))
+    
+    # Полные рекомендации - тем же путем, что и в форме (с кэшем и журналом аудита)
+    if st.button("Показать полные рекомендации", type="primary", use_container_width=True, disabled=not symptoms):
+        run_diagnosis(rules, symptoms, lab_data, temperature, bp_systolic, bp_diastolic, wbc, crp)
+
+# 🎯 ОСНОВНОЙ ИНТЕРФЕЙС
+def main():
+    # Действующая версия базы знаний; новая подхватывается при следующем перезапуске скрипта.
+    # Набор правил - один неизменяемый объект на процесс, общий для всех
+    # сессий: в session_state хранится только ввод и ключи живого расчета.
+    # st.cache_resource здесь не нужен - он удерживал бы старые версии после
+    # горячей перезагрузки базы знаний
+    rules = get_ruleset()
+    
+    # ЗАГОЛОВОК С ФИОЛЕТОВЫМ ФОНОМ
+    st.markdown("""
+    <div class="header-section">
+        <h1 style="margin:0; font-size:2.8rem; font-weight:700;">Antibiotic Stewardship System</h1>
+        <p style="font-size:1.3rem; margin:15px 0 0 0; opacity:0.9;">
+            Борьба с антибиотикорезистентностью через рациональную диагностику
+        </p>
+    </div>
+    """, unsafe_allow_html=True)
+    
+    # СТАТИСТИКА ПРОБЛЕМЫ
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.markdown("""
+        <div class="stats-box">
+            <h3 style="color:#8B5FBF; margin:0">1.2M</h3>
+            <p style="margin:5px 0 0 0; color:#666">смертей в год от резистентности</p>
+        </div>
+        """, unsafe_allow_html=True)
+    
+    with col2:
+        st.markdown("""
+        <div class="stats-box">
+            <h3 style="color:#8B5FBF; margin:0">50%</h3>
+            <p style="margin:5px 0 0 0; color:#666">нерациональных назначений антибиотиков</p>
+        </div>
+        """, unsafe_allow_html=True)
+    
+    with col3:
+        st.markdown("""
+        <div class="stats-box">
+            <h3 style="color:#8B5FBF; margin:0">$100T</h3>
+            <p style="margin:5px 0 0 0; color:#666">мировые потери к 2050 году</p>
+        </div>
+        """, unsafe_allow_html=True)
+    
+    # ОСНОВНОЙ ИНТЕРФЕЙС ДИАГНОСТИКИ
+    st.markdown("---")
+    st.header("Клиническая диагностика")
+    st.write("Система поддержки врачебных решений для рационального назначения антибиотиков")
+    
+    # Живой режим: предварительный дифференциальный ряд пересчитывается
+    # при каждом изменении ввода, без кнопки
+    if st.toggle("Живой предварительный расчет", key="live_mode",
+                 help="Дифференциальный ряд и показания к антибиотикам обновляются по мере ввода"):
+        live_preview()
+    else:
+        diagnosis_form(rules)
+    
+    # БОКОВАЯ ПАНЕЛЬ
+    with st.sidebar:
+        st.markdown("""
+        <div class="sidebar-section">
+            <h3 style="margin:0 0 15px 0">О системе</h3>
+            <p style="margin:0 0 15px 0; color:#666">
+            Образовательная платформа для борьбы с антибиотикорезистентностью 
+            через рациональную диагностику и назначение терапии.
+            </p>
+        </div>
+        """, unsafe_allow_html=True)
+        
+        st.markdown("""
+        <div class="sidebar-section">
+            <h4 style="margin:0 0 12px 0">Диагностируемые состояния</h4>
+            <ul style="margin:0; padding-left:20px; color:#666">
+            <li>Пневмония</li>
+            <li>Стрептококковая ангина</li>
+            <li>Инфекции мочевых путей</li>
+            <li>Острый бронхит</li>
+            <li>Грипп</li>
+            <li>Острый гастроэнтерит</li>
+            <li>Гипертонический криз</li>
+            </ul>
+        </div>
+        """, unsafe_allow_html=True)
+        
+        st.markdown("""
+        <div class="sidebar-section">
+            <h4 style="margin:0 0 12px 0; color:#d32f2f">Важно</h4>
+            <p style="margin:0; color:#666; font-size:0.9rem">
+            Данная система предназначена для образовательных целей 
+            и не заменяет консультацию врача. При критических состояниях 
+            немедленно обращайтесь за медицинской помощью.
+            </p>
+        </div>
+        """, unsafe_allow_html=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,282 @@
+# 🗄️ ЖУРНАЛ АУДИТА ДИАГНОЗОВ
+# Каждый поставленный диагноз дописывается в журнал только на добавление:
+# время, битовая маска симптомов и признаков, показатели, анализы, диагноз,
+# баллы состояний и показаны ли антибиотики. Включается переменной
+# окружения STEWARDSHIP_AUDIT_DIR (каталог журнала).
+#
+# Журнал - набор сегментов фиксированной емкости (STEWARDSHIP_AUDIT_SEGMENT_RECORDS
+# записей). Сегмент - файл, отображенный в память целиком: заголовок с
+# описанием схемы в JSON, затем колонки фиксированной ширины одна за другой.
+# Добавление записи - несколько struct.pack_into в уже отображенную память
+# без системных вызовов, счетчик записей в заголовке обновляется последним,
+# поэтому читатель всегда видит целые записи. Сегмент сменяется, когда
+# заполнен или когда сменилась версия базы знаний (биты маски и список
+# состояний зависят от нее).
+#
+# Аналитика читает сегменты через read_segment() как массивы NumPy поверх
+# того же отображения, без копирования и без базы данных:
+#
+#   for segment in read_audit_log("audit/"):
+#       segment.columns["diagnosis"], segment.columns["scores"], ...
+#
+#   python audit_log.py audit/    # сводка по журналу
+import argparse
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+
+AUDIT_DIR = os.environ.get("STEWARDSHIP_AUDIT_DIR")
+SEGMENT_RECORDS = int(os.environ.get("STEWARDSHIP_AUDIT_SEGMENT_RECORDS", "65536"))
+
+MAGIC = b"STWAUDIT"
+FORMAT_VERSION = 1
+SEGMENT_SUFFIX = ".audit"
+# magic, версия формата, размер заголовка, емкость, число записей, длина схемы
+HEADER = struct.Struct("<8sIIQQI")
+COUNT_OFFSET = 24
+PAGE = 4096
+ALIGN = 64
+# Баллы состояний, которые не считались (гипертонический криз)
+NO_SCORE = -32768
+VITALS = ("temperature", "bp_systolic", "bp_diastolic", "wbc", "crp")
+
+_INT16 = struct.Struct("<h")
+_INT64 = struct.Struct("<q")
+_UINT64 = struct.Struct("<Q")
+_VITALS = struct.Struct(f"<{len(VITALS)}f")
+
+
+def _align(value, alignment):
+    return -(-value // alignment) * alignment
+
+
+def _schema(rules):
+    # Схема сегмента: смысл битов масок, список диагнозов и колонки
+    symptom_words = max(1, _align(max(rules.symptom_bits.values(), default=1).bit_length(), 64) // 64)
+    lab_words = max(1, _align(max(rules.lab_bits.values(), default=1).bit_length(), 64) // 64)
+    diagnoses = list(rules.conditions)
+    if rules.crisis_condition not in diagnoses:
+        diagnoses.append(rules.crisis_condition)
+    columns = [
+        ("timestamp_ns", "<i8", 1),
+        ("symptom_mask", "<u8", symptom_words),
+        ("lab_mask", "<u8", lab_words),
+        ("vitals", "<f4", len(VITALS)),
+        ("diagnosis", "<i2", 1),
+        ("score", "<i2", 1),
+        ("scores", "<i2", len(rules.conditions)),
+        ("antibiotics_indicated", "|u1", 1)
+    ]
+    return {
+        "knowledge_base_version": rules.version,
+        "fingerprint": rules.fingerprint,
+        "features": [spec["name"] for spec in rules.features],
+        "symptom_bits": {s: bit.bit_length() - 1 for s, bit in rules.symptom_bits.items()},
+        "lab_bits": {lab: bit.bit_length() - 1 for lab, bit in rules.lab_bits.items()},
+        "conditions": list(rules.conditions),
+        "diagnoses": diagnoses,
+        "vitals": list(VITALS),
+        "no_score": NO_SCORE,
+        "columns": [{"name": n, "dtype": d, "width": w} for n, d, w in columns]
+    }
+
+
+def _layout(schema, capacity):
+    # Смещения колонок: каждая колонка - непрерывный массив capacity x width
+    meta = json.dumps(schema, ensure_ascii=False).encode("utf-8")
+    header_size = _align(HEADER.size + len(meta), PAGE)
+    offset = header_size
+    columns = {}
+    for column in schema["columns"]:
+        # Типы в нотации NumPy ("<i8", "|u1"): размер - число после кода типа
+        itemsize = int(column["dtype"][2:]) * column["width"]
+        columns[column["name"]] = (offset, itemsize)
+        offset = _align(offset + itemsize * capacity, ALIGN)
+    return meta, header_size, columns, offset
+
+
+class _Segment:
+    def __init__(self, path, rules, capacity):
+        self.schema = _schema(rules)
+        self.fingerprint = rules.fingerprint
+        self.capacity = capacity
+        meta, header_size, self.columns, size = _layout(self.schema, capacity)
+        self.diagnosis_index = {d: i for i, d in enumerate(self.schema["diagnoses"])}
+        self.condition_index = {c: i for i, c in enumerate(self.schema["conditions"])}
+        self.indicated = {d: rules.antibiotics_indicated(d) for d in self.schema["diagnoses"]}
+        self.no_scores = [NO_SCORE] * len(rules.conditions)
+        self.scores_struct = struct.Struct(f"<{len(rules.conditions)}h")
+
+        # Файл сразу создается полного размера: отображение не меняется до смены сегмента
+        fd = os.open(path, os.O_RDWR | os.O_CREAT | os.O_EXCL, 0o644)
+        try:
+            os.ftruncate(fd, size)
+            self.mm = mmap.mmap(fd, size)
+        finally:
+            os.close(fd)
+        HEADER.pack_into(self.mm, 0, MAGIC, FORMAT_VERSION, header_size, capacity, 0, len(meta))
+        self.mm[HEADER.size:HEADER.size + len(meta)] = meta
+        self.count = 0
+
+    def write(self, timestamp, symptom_mask, lab_mask, vitals, diagnosis, score, ranked):
+        mm, columns, i = self.mm, self.columns, self.count
+
+        offset, size = columns["timestamp_ns"]
+        _INT64.pack_into(mm, offset + i * size, timestamp)
+        offset, size = columns["symptom_mask"]
+        mm[offset + i * size:offset + (i + 1) * size] = symptom_mask.to_bytes(size, "little")
+        offset, size = columns["lab_mask"]
+        mm[offset + i * size:offset + (i + 1) * size] = lab_mask.to_bytes(size, "little")
+        offset, size = columns["vitals"]
+        _VITALS.pack_into(mm, offset + i * size, *vitals)
+        offset, size = columns["diagnosis"]
+        _INT16.pack_into(mm, offset + i * size, self.diagnosis_index[diagnosis])
+        offset, size = columns["score"]
+        _INT16.pack_into(mm, offset + i * size, score)
+        values = list(self.no_scores)
+        condition_index = self.condition_index
+        for condition, condition_score in ranked:
+            values[condition_index[condition]] = condition_score
+        offset, size = columns["scores"]
+        self.scores_struct.pack_into(mm, offset + i * size, *values)
+        offset, size = columns["antibiotics_indicated"]
+        mm[offset + i] = self.indicated[diagnosis]
+
+        # Счетчик - последним: до этого момента читатель запись не видит
+        self.count = i + 1
+        _UINT64.pack_into(mm, COUNT_OFFSET, self.count)
+
+    def close(self):
+        self.mm.flush()
+        self.mm.close()
+
+
+class AuditLog:
+    def __init__(self, directory, segment_records=SEGMENT_RECORDS):
+        self.directory = directory
+        self.segment_records = segment_records
+        self._segment = None
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _open_segment(self, rules):
+        if self._segment is not None:
+            self._segment.close()
+        # Имена сортируются в порядке создания; pid разделяет процессы,
+        # пишущие в один каталог
+        name = f"{time.time_ns():020d}-{os.getpid()}{SEGMENT_SUFFIX}"
+        self._segment = _Segment(os.path.join(self.directory, name), rules, self.segment_records)
+        return self._segment
+
+    def append(self, rules, symptoms, lab_data, temperature, bp_systolic, bp_diastolic, wbc, crp, result):
+        timestamp = time.time_ns()
+        symptom_mask = rules.encode(symptoms, lab_data, temperature, wbc, crp)
+        lab_mask = 0
+        for flag in lab_data:
+            lab_mask |= rules.lab_bits.get(flag, 0)
+        diagnosis, scores = result
+        if isinstance(scores, int):
+            score, ranked = scores, ()
+        else:
+            # При top_k в результате только первые диагнозы - в журнал пишутся
+            # баллы всех состояний, пересчитанные по той же маске
+            score = scores[0][1]
+            ranked = scores if len(scores) == len(rules.conditions) else rules.score_mask(symptom_mask)
+
+        with self._lock:
+            segment = self._segment
+            if segment is None or segment.fingerprint != rules.fingerprint or segment.count == segment.capacity:
+                segment = self._open_segment(rules)
+            segment.write(timestamp, symptom_mask, lab_mask, (temperature, bp_systolic, bp_diastolic, wbc, crp),
+                          diagnosis, score, ranked)
+
+    def close(self):
+        with self._lock:
+            if self._segment is not None:
+                self._segment.close()
+                self._segment = None
+
+
+def open_from_env():
+    # Журнал включается только явно - каталогом в STEWARDSHIP_AUDIT_DIR
+    if not AUDIT_DIR:
+        return None
+    import atexit
+    log = AuditLog(AUDIT_DIR)
+    atexit.register(log.close)
+    return log
+
+
+# 📖 ЧТЕНИЕ ЖУРНАЛА
+class AuditSegment:
+    def __init__(self, path, schema, count, columns):
+        self.path = path
+        self.schema = schema
+        self.count = count
+        self.columns = columns
+
+    def diagnosis_names(self):
+        import numpy as np
+        return np.array(self.schema["diagnoses"], dtype=object)[self.columns["diagnosis"]]
+
+
+def read_segment(path):
+    # Колонки - массивы NumPy поверх отображения файла (без копирования);
+    # видны только записи, завершенные к моменту чтения
+    import numpy as np
+
+    with open(path, "rb") as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    magic, version, header_size, capacity, count, meta_size = HEADER.unpack_from(mm, 0)
+    if magic != MAGIC or version != FORMAT_VERSION:
+        raise ValueError(f"{path}: не сегмент журнала аудита")
+    schema = json.loads(mm[HEADER.size:HEADER.size + meta_size].decode("utf-8"))
+    _, _, offsets, _ = _layout(schema, capacity)
+
+    columns = {}
+    for column in schema["columns"]:
+        offset, _ = offsets[column["name"]]
+        dtype = np.dtype(column["dtype"])
+        array = np.frombuffer(mm, dtype=dtype, count=count * column["width"], offset=offset)
+        columns[column["name"]] = array.reshape(count, column["width"]) if column["width"] > 1 else array
+    columns["antibiotics_indicated"] = columns["antibiotics_indicated"].view(bool)
+    return AuditSegment(path, schema, count, columns)
+
+
+def read_audit_log(directory):
+    # Сегменты по порядку создания
+    for name in sorted(os.listdir(directory)):
+        if name.endswith(SEGMENT_SUFFIX):
+            yield read_segment(os.path.join(directory, name))
+
+
+def main():
+    import numpy as np
+
+    parser = argparse.ArgumentParser(description="Сводка по журналу аудита диагнозов")
+    parser.add_argument("directory", nargs="?", default=AUDIT_DIR)
+    args = parser.parse_args()
+    if not args.directory:
+        parser.error("укажите каталог журнала или STEWARDSHIP_AUDIT_DIR")
+
+    total = 0
+    indicated = 0
+    diagnoses = {}
+    for segment in read_audit_log(args.directory):
+        total += segment.count
+        indicated += int(segment.columns["antibiotics_indicated"].sum())
+        counts = np.bincount(segment.columns["diagnosis"], minlength=len(segment.schema["diagnoses"]))
+        for name, n in zip(segment.schema["diagnoses"], counts):
+            diagnoses[name] = diagnoses.get(name, 0) + int(n)
+
+    print(f"записей: {total}, антибиотики показаны: {indicated} ({indicated / total if total else 0:.1%})")
+    for name, n in sorted(diagnoses.items(), key=lambda x: -x[1]):
+        if n:
+            print(f"  {name:32s} {n}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+# ⏱️ МАСШТАБИРОВАНИЕ ПО ЯДРАМ
+# Прогоняет score_encounters.py на одном и том же синтетическом CSV с
+# разным числом процессов и печатает пропускную способность и ускорение
+# относительно одного процесса.
+#
+#   python benchmarks/bench_parallel.py --rows 1000000 --max-workers 8
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from synthetic import as_list_columns, generate_encounters
+
+
+def write_synthetic_csv(path, rows, seed, chunk_rows=200_000):
+    for start in range(0, rows, chunk_rows):
+        frame = as_list_columns(generate_encounters(min(chunk_rows, rows - start), seed + start))
+        frame["encounter_id"] += start
+        frame.to_csv(path, mode="a" if start else "w", header=not start, index=False)
+
+
+def timed_run(src, dst, workers, chunksize):
+    started = time.perf_counter()
+    subprocess.run(
+        [sys.executable, os.path.join(ROOT, "score_encounters.py"), src, "-o", dst,
+         "--workers", str(workers), "--chunksize", str(chunksize)],
+        check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Масштабирование score_encounters.py по числу процессов")
+    parser.add_argument("--rows", type=int, default=500_000)
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--chunksize", type=int, default=50_000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        src = os.path.join(tmp, "encounters.csv")
+        write_synthetic_csv(src, args.rows, args.seed)
+        
+        print(f"строк: {args.rows}, ядер в системе: {os.cpu_count()}")
+        print(f"{'процессов':>10} {'время, с':>10} {'строк/с':>12} {'ускорение':>10}")
+        baseline = None
+        for workers in range(1, args.max_workers + 1):
+            elapsed = timed_run(src, os.path.join(tmp, f"scored_{workers}.csv"), workers, args.chunksize)
+            baseline = baseline or elapsed
+            print(f"{workers:>10} {elapsed:>10.2f} {args.rows / elapsed:>12,.0f} {baseline / elapsed:>9.2f}x")
+
+
+if __name__ == "__main__":
+    main()
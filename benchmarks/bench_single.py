@@ -0,0 +1,106 @@
+# ⏱️ МИКРОБЕНЧМАРК: ОДИН ПАЦИЕНТ
+# Сравнивает скомпилированную (битовые маски) и эталонную реализации
+# medical_diagnosis_system на одних и тех же синтетических пациентах, а также
+# вызов через LRU-кэш по канонической форме ввода (попадание обязано быть
+# дешевле вызова без кэша). До замеров проверяется,
+# что поштучная и пакетная (medical_diagnosis_batch) диагностика совпадают с
+# эталоном, в том числе на показателях ровно на порогах правил.
+#
+#   python benchmarks/bench_single.py [--patients 2000] [--repeat 5]
+import argparse
+import itertools
+import os
+import sys
+import timeit
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import diagnosis_engine as engine
+from synthetic import as_call_arguments, generate_encounters
+
+# Значения ровно на порогах правил и сразу за ними
+BOUNDARY_TEMPERATURES = [37.0, 37.5, 38.0, 38.1]
+BOUNDARY_BP = [(180, 120), (181, 120), (180, 121), (181, 121)]
+BOUNDARY_WBC = [10.0, 10.1]
+BOUNDARY_CRP = [5.0, 5.1]
+
+
+def per_call_us(func, patients, repeat):
+    def run():
+        for p in patients:
+            func(*p)
+    best = min(timeit.repeat(run, number=1, repeat=repeat))
+    return best / len(patients) * 1e6
+
+
+def boundary_patients(patients):
+    # Наборы симптомов синтетических пациентов с показателями из сетки порогов
+    grid = itertools.cycle(itertools.product(BOUNDARY_TEMPERATURES, BOUNDARY_BP, BOUNDARY_WBC, BOUNDARY_CRP))
+    return [
+        (symptoms, lab_data, vital_signs, temperature, bp_systolic, bp_diastolic, wbc, crp)
+        for (symptoms, lab_data, vital_signs, *_), (temperature, (bp_systolic, bp_diastolic), wbc, crp)
+        in zip(patients, grid)
+    ]
+
+
+def expected_row(diagnosis, scores):
+    # Строка medical_diagnosis_batch, соответствующая эталонному результату
+    if isinstance(scores, int):
+        row = {"diagnosis": diagnosis, "score": scores, "hypertensive_crisis": True}
+        row.update({f"differential_{i}": None for i in range(1, engine.DIFFERENTIAL_SIZE)})
+        return row
+    row = {"diagnosis": diagnosis, "score": scores[0][1], "hypertensive_crisis": False}
+    row.update({f"differential_{i}": scores[i][0] for i in range(1, engine.DIFFERENTIAL_SIZE)})
+    row.update({f"score_{condition}": score for condition, score in scores})
+    return row
+
+
+def check_batch(patients):
+    frame = pd.DataFrame(
+        [(s, l, t, sys_, dia, wbc, crp) for s, l, _, t, sys_, dia, wbc, crp in patients],
+        columns=["symptoms", "lab_data", "temperature", "bp_systolic", "bp_diastolic", "wbc", "crp"]
+    )
+    result = engine.medical_diagnosis_batch(frame).to_dict("records")
+    for p, row in zip(patients, result):
+        expected = expected_row(*engine.medical_diagnosis_system_reference(*p))
+        # Пустой дифференциальный ряд в таблице - пропуск
+        if {k: None if pd.isna(row[k]) else row[k] for k in expected} != expected:
+            sys.exit(f"Расхождение пакетной диагностики на пациенте {p}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--patients", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    
+    patients = as_call_arguments(generate_encounters(args.patients, args.seed))
+    
+    # Результаты обязаны совпадать до сравнения скорости
+    checked = patients + boundary_patients(patients)
+    for p in checked:
+        if engine.medical_diagnosis_system(*p) != engine.medical_diagnosis_system_reference(*p):
+            sys.exit(f"Расхождение результатов на пациенте {p}")
+    check_batch(checked)
+    
+    reference = per_call_us(engine.medical_diagnosis_system_reference, patients, args.repeat)
+    compiled = per_call_us(engine.medical_diagnosis_system, patients, args.repeat)
+    cache = engine.DiagnosisCache()
+    memoized = per_call_us(cache.diagnose, patients, args.repeat)
+    # Все пациенты уже в кэше (емкость больше их числа) - только попадания
+    hits = per_call_us(cache.diagnose, patients, args.repeat)
+    
+    print(f"эталонная реализация:     {reference:7.2f} мкс/вызов")
+    print(f"скомпилированные маски:   {compiled:7.2f} мкс/вызов")
+    print(f"ускорение:                {reference / compiled:7.2f}x")
+    print(f"LRU-кэш диагнозов:        {memoized:7.2f} мкс/вызов (попаданий {cache.stats()['hit_rate']:.1%})")
+    print(f"попадание в кэш:          {hits:7.2f} мкс/вызов")
+    # Кэш имеет смысл, только если попадание дешевле вызова без кэша
+    if hits >= compiled:
+        sys.exit(f"Попадание в кэш ({hits:.2f} мкс) не дешевле вызова без кэша ({compiled:.2f} мкс)")
+
+
+if __name__ == "__main__":
+    main()
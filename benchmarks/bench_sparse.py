@@ -0,0 +1,94 @@
+# 📚 БЕНЧМАРК: КРУПНАЯ БАЗА ЗНАНИЙ
+# Синтетическая база знаний на сотни состояний и признаков: полное
+# ранжирование против выбора первых k диагнозов по разреженным весам для
+# одного пациента и пакетная оценка с argpartition.
+#
+#   python benchmarks/bench_sparse.py [--conditions 300] [--findings 300] [--top-k 4]
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import timeit
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import diagnosis_engine as engine
+from synthetic import generate_findings, synthetic_knowledge_base
+
+
+def per_call_us(func, patients, repeat):
+    def run():
+        for p in patients:
+            func(*p)
+    best = min(timeit.repeat(run, number=1, repeat=repeat))
+    return best / len(patients) * 1e6
+
+
+def full_ranking(rules, symptoms, lab_data, temperature, wbc, crp):
+    # Прямой пересчет всех баллов и полная стабильная сортировка - эталон для проверки
+    mask = rules.encode(symptoms, lab_data, temperature, wbc, crp)
+    names = [spec["name"] for spec in rules.features]
+    present = {name for name in names if mask & rules.feature_bits[name]}
+    scores = [
+        (c, rules.scoring_rules[c]["base"] + sum(w for f, w in rules.scoring_rules[c]["weights"].items() if f in present))
+        for c in rules.conditions
+    ]
+    return sorted(scores, key=lambda x: x[1], reverse=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--conditions", type=int, default=300)
+    parser.add_argument("--findings", type=int, default=300)
+    parser.add_argument("--patients", type=int, default=2000)
+    parser.add_argument("--batch-rows", type=int, default=100_000)
+    parser.add_argument("--top-k", type=int, default=engine.DIFFERENTIAL_SIZE)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    
+    knowledge_base = synthetic_knowledge_base(args.conditions, args.findings, seed=args.seed)
+    with tempfile.NamedTemporaryFile("w", suffix=".json", delete=False, encoding="utf-8") as f:
+        json.dump(knowledge_base, f, ensure_ascii=False)
+    try:
+        started = time.perf_counter()
+        rules = engine.load_ruleset(f.name, cache_dir="")
+        compile_ms = (time.perf_counter() - started) * 1000
+    finally:
+        os.unlink(f.name)
+    
+    patients = generate_findings(knowledge_base, args.patients, seed=args.seed)
+    calls = [(s, l, t, sys_, dia, wbc, crp) for s, l, _, t, sys_, dia, wbc, crp in patients]
+    
+    # Результаты обязаны совпадать до сравнения скорости
+    for symptoms, lab_data, temperature, bp_systolic, bp_diastolic, wbc, crp in calls[:200]:
+        expected = full_ranking(rules, symptoms, lab_data, temperature, wbc, crp)
+        _, ranked = rules.diagnose(symptoms, lab_data, temperature, bp_systolic, bp_diastolic, wbc, crp)
+        _, top = rules.diagnose(symptoms, lab_data, temperature, bp_systolic, bp_diastolic, wbc, crp, args.top_k)
+        if isinstance(ranked, int):
+            continue
+        if ranked != expected or top != expected[:args.top_k]:
+            sys.exit(f"Расхождение результатов на пациенте {symptoms}")
+    
+    full = per_call_us(rules.diagnose, calls, args.repeat)
+    top_k = per_call_us(lambda *c: rules.diagnose(*c, args.top_k), calls, args.repeat)
+    
+    rows = [dict(zip(("symptoms", "lab_data", "temperature", "bp_systolic", "bp_diastolic", "wbc", "crp"), c))
+            for c in calls]
+    frame = pd.DataFrame(rows * max(1, args.batch_rows // len(rows)))
+    started = time.perf_counter()
+    rules.diagnose_batch(frame)
+    batch_s = time.perf_counter() - started
+    
+    print(f"база знаний:              {args.conditions} состояний x {args.findings} признаков, "
+          f"компиляция {compile_ms:.0f} мс")
+    print(f"полное ранжирование:      {full:7.2f} мкс/вызов")
+    print(f"первые {args.top_k}:                {top_k:7.2f} мкс/вызов")
+    print(f"пакетная оценка:          {len(frame) / batch_s:,.0f} строк/с")
+
+
+if __name__ == "__main__":
+    main()
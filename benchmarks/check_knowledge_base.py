@@ -0,0 +1,102 @@
+# ✅ ПРОВЕРКА ОШИБОЧНЫХ БАЗ ЗНАНИЙ
+# Портит копию действующей базы знаний типичными ошибками правки (вес
+# "abc", порог "x", пропавший ключ, не тот тип) и проверяет, что:
+#   - load_ruleset сообщает о каждой из них KnowledgeBaseError;
+#   - горячая перезагрузка пишет ошибку в лог и оставляет прежние правила,
+#     а medical_diagnosis_system продолжает отвечать;
+#   - исправленный файл снова подхватывается.
+#
+#   python benchmarks/check_knowledge_base.py
+import copy
+import json
+import logging
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import diagnosis_engine as engine
+
+PATIENT = (["Кашель", "Лихорадка >38°C"], [], None, 38.5, 120, 80, 12.0, 20.0)
+
+
+def _first_weight(kb, value):
+    weights = next(c["scoring"]["weights"] for c in kb["conditions"].values() if "scoring" in c)
+    weights[next(iter(weights))] = value
+
+
+def _first_threshold(kb, value):
+    spec = next(f for f in kb["features"] if "temperature_above" in f)
+    spec["temperature_above"] = value
+
+
+MALFORMED = {
+    "вес \"abc\"": lambda kb: _first_weight(kb, "abc"),
+    "вес null": lambda kb: _first_weight(kb, None),
+    "порог \"x\"": lambda kb: _first_threshold(kb, "x"),
+    "базовый балл \"два\"": lambda kb: next(c for c in kb["conditions"].values() if "scoring" in c)["scoring"].update(base="два"),
+    "балл криза \"10!\"": lambda kb: kb["crisis"].update(score="10!"),
+    "нет crisis": lambda kb: kb.pop("crisis"),
+    "features - строка": lambda kb: kb.update(features="abc"),
+    "scoring - список": lambda kb: next(c for c in kb["conditions"].values() if "scoring" in c).update(scoring=[])
+}
+
+
+def write_kb(path, kb):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(kb, f, ensure_ascii=False)
+
+
+def check_load(source, tmp):
+    path = os.path.join(tmp, "malformed.json")
+    for name, corrupt in MALFORMED.items():
+        kb = copy.deepcopy(source)
+        corrupt(kb)
+        write_kb(path, kb)
+        try:
+            engine.load_ruleset(path, cache_dir="")
+        except engine.KnowledgeBaseError:
+            continue
+        except Exception as exc:
+            sys.exit(f"{name}: {type(exc).__name__} вместо KnowledgeBaseError: {exc}")
+        sys.exit(f"{name}: ошибочная база знаний загружена без ошибки")
+
+
+def check_reload(source, tmp):
+    path = os.path.join(tmp, "stewardship.json")
+    engine.KB_PATH, engine.KB_CACHE_DIR = path, os.path.join(tmp, "cache")
+    write_kb(path, source)
+    expected = engine.medical_diagnosis_system_reference(*PATIENT)
+    version = engine.reload_ruleset(force=True).version
+
+    for name, corrupt in MALFORMED.items():
+        kb = copy.deepcopy(source)
+        corrupt(kb)
+        write_kb(path, kb)
+        try:
+            rules = engine.reload_ruleset(force=True)
+            result = engine.medical_diagnosis_system(*PATIENT)
+        except Exception as exc:
+            sys.exit(f"{name}: горячая перезагрузка упала с {type(exc).__name__}: {exc}")
+        if rules.version != version or result != expected:
+            sys.exit(f"{name}: после ошибочной правки не сохранились прежние правила")
+
+    fixed = copy.deepcopy(source)
+    fixed["version"] = f"{version}-fixed"
+    write_kb(path, fixed)
+    if engine.reload_ruleset(force=True).version != fixed["version"]:
+        sys.exit("Исправленная база знаний не подхватилась")
+
+
+def main():
+    # Ожидаемые сообщения об ошибочных файлах не засоряют вывод
+    logging.disable(logging.ERROR)
+    source = engine.read_knowledge_base(engine.KB_PATH)
+    with tempfile.TemporaryDirectory() as tmp:
+        check_load(source, tmp)
+        check_reload(source, tmp)
+    print(f"ошибочных баз знаний: {len(MALFORMED)}, все отклонены, прежние правила сохраняются")
+
+
+if __name__ == "__main__":
+    main()
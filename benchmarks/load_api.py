@@ -0,0 +1,110 @@
+# ⏱️ НАГРУЗОЧНЫЙ ГЕНЕРАТОР ДЛЯ scoring_api.py
+# Открывает --concurrency keep-alive соединений, каждое отправляет запросы
+# /diagnose подряд, и печатает пропускную способность, перцентили задержки
+# и средний размер пакета на сервере. Без --port сервер поднимается в том
+# же процессе с указанными --window-ms/--max-batch.
+#
+#   python benchmarks/load_api.py --requests 20000 --concurrency 64
+#   python benchmarks/load_api.py --port 8765 --requests 20000
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scoring_api import DEFAULT_MAX_BATCH, DEFAULT_WINDOW_MS, ScoringServer
+from synthetic import as_call_arguments, generate_encounters
+
+
+def build_payloads(n, seed):
+    payloads = []
+    for symptoms, lab_data, _, temperature, bp_systolic, bp_diastolic, wbc, crp in as_call_arguments(generate_encounters(n, seed)):
+        body = json.dumps({
+            "symptoms": symptoms, "lab_data": lab_data, "temperature": temperature,
+            "bp_systolic": bp_systolic, "bp_diastolic": bp_diastolic, "wbc": wbc, "crp": crp
+        }, ensure_ascii=False).encode("utf-8")
+        payloads.append(
+            f"POST /diagnose HTTP/1.1\r\nHost: localhost\r\nContent-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n\r\n".encode("latin-1") + body
+        )
+    return payloads
+
+
+async def _read_response(reader):
+    head = await reader.readuntil(b"\r\n\r\n")
+    status = int(head.split(b" ", 2)[1])
+    length = 0
+    for line in head.split(b"\r\n"):
+        if line.lower().startswith(b"content-length:"):
+            length = int(line.split(b":", 1)[1])
+    body = await reader.readexactly(length)
+    return status, body
+
+
+async def client(host, port, requests, latencies):
+    reader, writer = await asyncio.open_connection(host, port)
+    clock = time.perf_counter
+    for request in requests:
+        started = clock()
+        writer.write(request)
+        status, _ = await _read_response(reader)
+        latencies.append(clock() - started)
+        if status != 200:
+            raise RuntimeError(f"ответ {status}")
+    writer.close()
+
+
+async def health(host, port):
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write(b"GET /health HTTP/1.1\r\nHost: localhost\r\nConnection: close\r\n\r\n")
+    _, body = await _read_response(reader)
+    writer.close()
+    return json.loads(body)
+
+
+async def run(args):
+    host, port, server = args.host, args.port, None
+    if port is None:
+        server = await ScoringServer(args.window_ms, args.max_batch).start(host, 0)
+        port = server.sockets[0].getsockname()[1]
+    
+    payloads = build_payloads(args.requests, args.seed)
+    shards = [payloads[i::args.concurrency] for i in range(args.concurrency)]
+    before = await health(host, port)
+    latencies = []
+    started = time.perf_counter()
+    await asyncio.gather(*(client(host, port, shard, latencies) for shard in shards))
+    elapsed = time.perf_counter() - started
+    after = await health(host, port)
+    
+    if server is not None:
+        server.close()
+    
+    values = np.array(latencies) * 1000
+    batches = after["batches"] - before["batches"]
+    print(f"запросов: {len(values)}, соединений: {args.concurrency}, время: {elapsed:.2f} с")
+    print(f"пропускная способность: {len(values) / elapsed:,.0f} запросов/с")
+    print(f"задержка, мс: p50 {np.percentile(values, 50):.2f}  p90 {np.percentile(values, 90):.2f}  "
+          f"p99 {np.percentile(values, 99):.2f}  max {values.max():.2f}")
+    print(f"пакетов на сервере: {batches}, средний размер: {(after['requests'] - before['requests']) / max(batches, 1):.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Нагрузочный тест scoring_api.py")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, help="порт запущенного сервера (иначе сервер в процессе)")
+    parser.add_argument("--requests", type=int, default=20_000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--window-ms", type=float, default=DEFAULT_WINDOW_MS)
+    parser.add_argument("--max-batch", type=int, default=DEFAULT_MAX_BATCH)
+    parser.add_argument("--seed", type=int, default=42)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
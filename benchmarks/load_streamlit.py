@@ -0,0 +1,216 @@
+# 👥 НАГРУЗОЧНЫЙ ТЕСТ СЕССИЙ STREAMLIT
+# Поднимает N одновременных сессий app2.py через AppTest в одном процессе
+# (как сессии одного сервера Streamlit), каждая вводит --rounds пациентов и
+# нажимает "Запустить диагностику". Для каждого N печатает перцентили
+# задержки нажатия, среднюю задержку самой медленной сессии, прирост
+# памяти процесса на сессию и число объектов набора правил, которые видели
+# сессии (должен быть один общий).
+#
+#   python benchmarks/load_streamlit.py --sessions 1,5,10,25,50 --rounds 5
+import argparse
+import contextlib
+import gc
+import os
+import resource
+import sys
+import threading
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import diagnosis_engine
+from synthetic import as_call_arguments, generate_encounters
+
+APP = os.path.join(ROOT, "app2.py")
+SUBMIT_LABEL = "Запустить диагностику"
+RESULTS_HEADER = "Результаты диагностики"
+
+
+def enable_concurrent_apptest():
+    # AppTest рассчитан на последовательные тесты: каждый запуск скрипта
+    # заменяет глобальные объекты процесса. Для одновременных сессий они
+    # создаются один раз и больше не подменяются:
+    # - Runtime: AppTest записывает свой mock в Runtime._instance и стирает
+    #   его после запуска - все сессии получают один общий mock, а запись
+    #   AppTest уходит в отдельный класс;
+    # - PagesManager.uses_pages_directory: AppTest сбрасывает этот атрибут
+    #   класса перед каждым запуском, и соседний запуск мог выполнить
+    #   скрипт другим путем (с другими идентификаторами виджетов и потерей
+    #   их значений) - сброс попадает в подкласс;
+    # - patch_config_options: временная правка глобального конфига на
+    #   каждый запуск - параметр выставляется один раз;
+    # - ScriptCache: одновременная компиляция одного скрипта в Python 3.11
+    #   ломает ast ("AST constructor recursion depth mismatch") - кэш
+    #   скомпилированного скрипта общий.
+    from unittest.mock import MagicMock
+
+    from streamlit import config
+    from streamlit.components.v2.component_manager import BidiComponentManager
+    from streamlit.runtime import Runtime
+    from streamlit.runtime.caching.storage.dummy_cache_storage import MemoryCacheStorageManager
+    from streamlit.runtime.dataframe_source_manager import DataframeSourceManager
+    from streamlit.runtime.media_file_manager import MediaFileManager
+    from streamlit.runtime.memory_media_file_storage import MemoryMediaFileStorage
+    from streamlit.runtime.pages_manager import PagesManager
+    from streamlit.runtime.scriptrunner.script_cache import ScriptCache
+    import streamlit.testing.v1.app_test as app_test
+    import streamlit.testing.v1.local_script_runner as local_script_runner
+
+    runtime = MagicMock(spec=Runtime)
+    runtime.media_file_mgr = MediaFileManager(MemoryMediaFileStorage("/mock/media"))
+    runtime.dataframe_source_mgr = DataframeSourceManager()
+    runtime.cache_storage_manager = MemoryCacheStorageManager()
+    components = BidiComponentManager()
+    components.discover_and_register_components(start_file_watching=False)
+    runtime.bidi_component_registry = components
+    Runtime._instance = runtime
+
+    class RuntimeSlot:
+        _instance = None
+
+    class SessionPagesManager(PagesManager):
+        pass
+
+    script_cache = ScriptCache()
+    config.set_option("global.appTest", True)
+    app_test.Runtime = RuntimeSlot
+    app_test.PagesManager = SessionPagesManager
+    app_test.patch_config_options = lambda options: contextlib.nullcontext()
+    app_test.ScriptCache = local_script_runner.ScriptCache = lambda: script_cache
+
+
+def rss_bytes():
+    # Текущий RSS процесса; без /proc - пиковый
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def fill_inputs(at, patient):
+    symptoms, lab_data, _, temperature, bp_systolic, bp_diastolic, wbc, crp = patient
+    at.multiselect[0].set_value(symptoms)
+    at.multiselect[1].set_value(lab_data)
+    at.slider[0].set_value(round(min(max(temperature, 35.0), 42.0), 1))
+    wbc_input, crp_input, systolic_input, diastolic_input = at.number_input[:4]
+    wbc_input.set_value(round(min(max(wbc, 1.0), 50.0), 1))
+    crp_input.set_value(round(min(max(crp, 0.0), 200.0), 1))
+    systolic_input.set_value(int(min(max(bp_systolic, 80), 250)))
+    diastolic_input.set_value(int(min(max(bp_diastolic, 50), 150)))
+
+
+def session(patients, start, timeout, apps, latencies, errors):
+    from streamlit.testing.v1 import AppTest
+
+    try:
+        at = AppTest.from_file(APP, default_timeout=timeout).run()
+        # Сессия живет до конца уровня нагрузки, чтобы замер памяти учитывал ее состояние
+        apps.append(at)
+        start.wait()
+        for patient in patients:
+            fill_inputs(at, patient)
+            submit = next(b for b in at.button if b.label == SUBMIT_LABEL)
+            started = time.perf_counter()
+            submit.click().run()
+            latencies.append(time.perf_counter() - started)
+            if at.exception or not any(h.value == RESULTS_HEADER for h in at.header):
+                errors.append("нет результатов диагностики")
+    except Exception as exc:
+        errors.append(f"{type(exc).__name__}: {exc}")
+        start.abort()
+
+
+def run_level(n, rounds, patients, timeout):
+    seen = set()
+    get_ruleset = diagnosis_engine.get_ruleset
+
+    def tracking_get_ruleset():
+        rules = get_ruleset()
+        seen.add(id(rules))
+        return rules
+
+    gc.collect()
+    before = rss_bytes()
+    apps = []
+    start = threading.Barrier(n + 1)
+    per_session = [[] for _ in range(n)]
+    errors = []
+    threads = [
+        threading.Thread(target=session, args=(
+            [patients[(i * rounds + j) % len(patients)] for j in range(rounds)],
+            start, timeout, apps, per_session[i], errors
+        ))
+        for i in range(n)
+    ]
+    # Скрипт импортирует get_ruleset из модуля при каждом запуске, поэтому
+    # подмена видна всем сессиям
+    diagnosis_engine.get_ruleset = tracking_get_ruleset
+    try:
+        for thread in threads:
+            thread.start()
+        # Все сессии открыты - нажатия начинаются одновременно
+        with contextlib.suppress(threading.BrokenBarrierError):
+            start.wait()
+        started = time.perf_counter()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+    finally:
+        diagnosis_engine.get_ruleset = get_ruleset
+    gc.collect()
+    after = rss_bytes()
+
+    latencies = np.array([x for values in per_session for x in values]) * 1000
+    session_means = [np.mean(values) * 1000 for values in per_session if values]
+    return {
+        "sessions": n,
+        "clicks": len(latencies),
+        "elapsed": elapsed,
+        "p50": np.percentile(latencies, 50) if len(latencies) else float("nan"),
+        "p95": np.percentile(latencies, 95) if len(latencies) else float("nan"),
+        "slowest_session": max(session_means, default=float("nan")),
+        "rss": after,
+        "rss_per_session": (after - before) / n,
+        "rulesets": len(seen),
+        "errors": errors
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Нагрузочный тест одновременных сессий app2.py")
+    parser.add_argument("--sessions", default="1,5,10,25,50", help="числа одновременных сессий через запятую")
+    parser.add_argument("--rounds", type=int, default=5, help="диагнозов на сессию")
+    parser.add_argument("--timeout", type=float, default=60, help="таймаут одного запуска скрипта, с")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    levels = [int(x) for x in args.sessions.split(",")]
+
+    # Без симптомов форма только предупреждает - такие обращения не нагружают диагностику
+    patients = [p for p in as_call_arguments(generate_encounters(2 * max(levels) * args.rounds, args.seed)) if p[0]]
+    enable_concurrent_apptest()
+    # Прогрев: компиляция скрипта и импорт модулей
+    from streamlit.testing.v1 import AppTest
+    AppTest.from_file(APP, default_timeout=args.timeout).run()
+    print(f"память после прогрева: {rss_bytes() / 2**20:.1f} МБ")
+
+    print(f"{'сессий':>6} {'нажатий':>8} {'p50, мс':>9} {'p95, мс':>9} {'медл. сессия, мс':>17} "
+          f"{'RSS, МБ':>8} {'МБ/сессию':>10} {'наборов правил':>15}")
+    for n in levels:
+        result = run_level(n, args.rounds, patients, args.timeout)
+        print(f"{result['sessions']:>6} {result['clicks']:>8} {result['p50']:>9.1f} {result['p95']:>9.1f} "
+              f"{result['slowest_session']:>17.1f} {result['rss'] / 2**20:>8.1f} "
+              f"{result['rss_per_session'] / 2**20:>10.2f} {result['rulesets']:>15}")
+        for error in sorted(set(result["errors"])):
+            print(f"  ошибка ({result['errors'].count(error)}): {error}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+# ⏱️ НАБОР БЕНЧМАРКОВ ДИАГНОСТИЧЕСКОГО ДВИЖКА
+# Измеряет на синтетических обращениях (benchmarks/synthetic.py):
+#   - задержку одного вызова medical_diagnosis_system (p50/p90/p99/p99.9),
+#   - пропускную способность medical_diagnosis_batch для 10^3..10^N строк,
+#   - пиковую память пакетной оценки,
+#   - время холодного импорта движка (и интерфейса app2) в новом интерпретаторе.
+# Результаты пишутся в JSON; с --compare печатается сравнение с прошлым прогоном.
+#
+#   python benchmarks/run_benchmarks.py -o bench.json
+#   python benchmarks/run_benchmarks.py --max-rows-exp 7 -o new.json --compare bench.json
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import numpy as np
+
+import diagnosis_engine as engine
+from synthetic import as_call_arguments, generate_encounters
+
+BATCH_CHUNK_ROWS = 1_000_000
+
+
+def _percentiles(samples_ns):
+    values = np.array(samples_ns) / 1000.0
+    return {
+        "p50_us": float(np.percentile(values, 50)),
+        "p90_us": float(np.percentile(values, 90)),
+        "p99_us": float(np.percentile(values, 99)),
+        "p999_us": float(np.percentile(values, 99.9)),
+        "mean_us": float(values.mean())
+    }
+
+
+def bench_single_latency(calls, func):
+    # Прогрев, затем замер каждого вызова отдельно
+    for args in calls[:1000]:
+        func(*args)
+    clock = time.perf_counter_ns
+    samples = []
+    for args in calls:
+        started = clock()
+        func(*args)
+        samples.append(clock() - started)
+    return _percentiles(samples)
+
+
+def bench_batch_throughput(rows, seed):
+    # Большие объемы оцениваются кусками по BATCH_CHUNK_ROWS, чтобы замер не
+    # упирался в память генератора; время генерации не учитывается
+    elapsed = 0.0
+    done = 0
+    while done < rows:
+        size = min(BATCH_CHUNK_ROWS, rows - done)
+        frame = generate_encounters(size, seed + done)
+        started = time.perf_counter()
+        engine.medical_diagnosis_batch(frame)
+        elapsed += time.perf_counter() - started
+        done += size
+    return {"rows": rows, "seconds": elapsed, "rows_per_second": rows / elapsed}
+
+
+def bench_batch_memory(rows, seed):
+    frame = generate_encounters(rows, seed)
+    tracemalloc.start()
+    engine.medical_diagnosis_batch(frame)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"rows": rows, "peak_mib": peak / 2**20, "bytes_per_row": peak / rows}
+
+
+def bench_cold_import(module, repeat):
+    code = (
+        "import logging, time; logging.disable(logging.WARNING); t = time.perf_counter(); "
+        f"import {module}; print(time.perf_counter() - t)"
+    )
+    samples = []
+    for _ in range(repeat):
+        out = subprocess.run(
+            [sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip().splitlines()
+        samples.append(float(out[-1]))
+    return {"module": module, "median_ms": statistics.median(samples) * 1000, "min_ms": min(samples) * 1000}
+
+
+def environment():
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True
+        ).stdout.strip()
+    except OSError:
+        commit = ""
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S")
+    }
+
+
+def _flatten(results, prefix=""):
+    flat = {}
+    for key, value in results.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(_flatten(value, name + "."))
+        elif isinstance(value, list):
+            for item in value:
+                flat.update(_flatten(item, f"{name}[{item.get('rows', '')}]."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = value
+    return flat
+
+
+def print_comparison(current, previous):
+    now, before = _flatten(current), _flatten(previous)
+    print(f"\n{'метрика':<55} {'было':>12} {'стало':>12} {'изм.':>8}")
+    for key in sorted(now.keys() & before.keys()):
+        if key.startswith("environment."):
+            continue
+        old, new = before[key], now[key]
+        change = (new - old) / old * 100 if old else 0.0
+        print(f"{key:<55} {old:>12.2f} {new:>12.2f} {change:>+7.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарки диагностического движка")
+    parser.add_argument("-o", "--output", default="bench_results.json")
+    parser.add_argument("--compare", help="JSON предыдущего прогона для сравнения")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--latency-calls", type=int, default=50_000)
+    parser.add_argument("--min-rows-exp", type=int, default=3)
+    parser.add_argument("--max-rows-exp", type=int, default=6,
+                        help="наибольший объем пакета 10^N строк (для 10^7 укажите 7)")
+    parser.add_argument("--memory-rows", type=int, default=100_000)
+    parser.add_argument("--import-repeat", type=int, default=5)
+    args = parser.parse_args()
+    
+    calls = as_call_arguments(generate_encounters(args.latency_calls, args.seed))
+    results = {"environment": environment()}
+    
+    print("задержка одного вызова...", file=sys.stderr)
+    results["single_latency"] = bench_single_latency(calls, engine.medical_diagnosis_system)
+    results["single_latency_reference"] = bench_single_latency(calls, engine.medical_diagnosis_system_reference)
+    
+    results["batch_throughput"] = []
+    for exp in range(args.min_rows_exp, args.max_rows_exp + 1):
+        print(f"пакет 10^{exp} строк...", file=sys.stderr)
+        results["batch_throughput"].append(bench_batch_throughput(10 ** exp, args.seed))
+    
+    print("пиковая память...", file=sys.stderr)
+    results["batch_memory"] = bench_batch_memory(args.memory_rows, args.seed)
+    
+    print("холодный импорт...", file=sys.stderr)
+    results["cold_import"] = bench_cold_import("diagnosis_engine", args.import_repeat)
+    results["cold_import_ui"] = bench_cold_import("app2", args.import_repeat)
+    
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    print(json.dumps(results, ensure_ascii=False, indent=2))
+    
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            print_comparison(results, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+# 🧪 СИНТЕТИЧЕСКИЕ ОБРАЩЕНИЯ
+# Воспроизводимый (по seed) генератор пациентов для бенчмарков. Для каждой
+# записи сначала выбирается "истинное" состояние по распространенности,
+# затем симптомы из словаря st.multiselect с вероятностями, характерными
+# для этого состояния (плюс фоновый шум), и согласованные с ним
+# температура, давление, лейкоциты и СРБ. Генерация векторная, поэтому
+# годится и для 10^7 строк.
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from diagnosis_engine import LAB_OPTIONS, SYMPTOM_OPTIONS
+
+BACKGROUND_SYMPTOM_RATE = 0.03
+
+# состояние: (распространенность, вероятности симптомов, вероятности анализов,
+#             доля лихорадящих, бактериальное воспаление)
+PROFILES = {
+    "community_acquired_pneumonia": (
+        0.12,
+        {"Лихорадка >38°C": 0.8, "Озноб": 0.4, "Кашель": 0.5, "Кашель с мокротой": 0.5,
+         "Одышка": 0.7, "Боль в груди": 0.5, "Слабость": 0.6},
+        {},
+        0.8, True
+    ),
+    "streptococcal_pharyngitis": (
+        0.12,
+        {"Лихорадка >38°C": 0.7, "Боль в горле": 0.95, "Налеты на миндалинах": 0.6,
+         "Увеличение лимфоузлов": 0.6, "Головная боль": 0.3},
+        {},
+        0.7, True
+    ),
+    "urinary_tract_infection": (
+        0.12,
+        {"Дизурия": 0.85, "Учащенное мочеиспускание": 0.7, "Боль в надлобковой области": 0.5,
+         "Лихорадка >38°C": 0.2},
+        {"Лейкоциты в моче": 0.8, "Нитриты в моче": 0.5},
+        0.2, True
+    ),
+    "acute_bronchitis": (
+        0.2,
+        {"Кашель": 0.9, "Кашель с мокротой": 0.5, "Слабость": 0.4, "Боль в горле": 0.2},
+        {"Анализы в норме": 0.5},
+        0.1, False
+    ),
+    "influenza": (
+        0.2,
+        {"Лихорадка >38°C": 0.9, "Озноб": 0.6, "Головная боль": 0.8, "Мышечные боли": 0.8,
+         "Слабость": 0.9, "Внезапное начало": 0.7, "Сезонность": 0.6, "Кашель": 0.4},
+        {"Анализы в норме": 0.3},
+        0.9, False
+    ),
+    "acute_gastroenteritis": (
+        0.2,
+        {"Тошнота": 0.8, "Рвота": 0.6, "Диарея": 0.85, "Боль в животе": 0.6, "Слабость": 0.5,
+         "Субфебрильная температура": 0.4},
+        {},
+        0.1, False
+    ),
+    "hypertensive_crisis": (
+        0.04,
+        {"Головная боль": 0.7, "Тошнота": 0.3, "Одышка": 0.3, "Боль в груди": 0.3, "Слабость": 0.3},
+        {},
+        0.0, False
+    )
+}
+CONDITIONS = list(PROFILES)
+
+
+def _probability_matrix(vocabulary, column):
+    return np.array([[PROFILES[c][column].get(v, 0.0) for v in vocabulary] for c in CONDITIONS])
+
+
+def generate_encounters(n, seed=0):
+    # DataFrame в "широком" формате medical_diagnosis_batch: булева колонка на
+    # каждый симптом и анализ + temperature, bp_systolic, bp_diastolic, wbc, crp,
+    # а также true_condition - состояние, из профиля которого взята запись
+    rng = np.random.default_rng(seed)
+    prevalence = np.array([PROFILES[c][0] for c in CONDITIONS])
+    condition = rng.choice(len(CONDITIONS), size=n, p=prevalence / prevalence.sum())
+    
+    symptom_p = np.maximum(_probability_matrix(SYMPTOM_OPTIONS, 1), BACKGROUND_SYMPTOM_RATE)
+    lab_p = _probability_matrix(LAB_OPTIONS, 2)
+    symptoms = rng.random((n, len(SYMPTOM_OPTIONS))) < symptom_p[condition]
+    labs = rng.random((n, len(LAB_OPTIONS))) < lab_p[condition]
+    
+    febrile_share = np.array([PROFILES[c][3] for c in CONDITIONS])[condition]
+    bacterial = np.array([PROFILES[c][4] for c in CONDITIONS])[condition]
+    febrile = rng.random(n) < febrile_share
+    subfebrile = symptoms[:, SYMPTOM_OPTIONS.index("Субфебрильная температура")]
+    temperature = np.where(
+        febrile, rng.normal(38.7, 0.5, n),
+        np.where(subfebrile, rng.normal(37.5, 0.3, n), rng.normal(36.8, 0.3, n))
+    )
+    # Отмеченная лихорадка согласована с измеренной температурой
+    symptoms[:, SYMPTOM_OPTIONS.index("Лихорадка >38°C")] &= febrile
+    
+    crisis = np.array(CONDITIONS)[condition] == "hypertensive_crisis"
+    bp_systolic = np.where(crisis, rng.normal(200, 12, n), rng.normal(125, 15, n))
+    bp_diastolic = np.where(crisis, rng.normal(126, 6, n), rng.normal(80, 9, n))
+    wbc = np.where(bacterial, rng.lognormal(np.log(12.5), 0.3, n), rng.lognormal(np.log(6.5), 0.25, n))
+    crp = np.where(bacterial, rng.lognormal(np.log(40), 0.7, n), rng.lognormal(np.log(3), 0.6, n))
+    
+    frame = pd.DataFrame(symptoms, columns=SYMPTOM_OPTIONS)
+    for i, lab in enumerate(LAB_OPTIONS):
+        frame[lab] = labs[:, i]
+    frame["temperature"] = np.clip(temperature, 35.0, 42.0).round(1)
+    frame["bp_systolic"] = np.clip(bp_systolic, 80, 250).round().astype(int)
+    frame["bp_diastolic"] = np.clip(bp_diastolic, 50, 150).round().astype(int)
+    frame["wbc"] = np.clip(wbc, 1.0, 50.0).round(1)
+    frame["crp"] = np.clip(crp, 0.0, 200.0).round(1)
+    frame["true_condition"] = np.array(CONDITIONS, dtype=object)[condition]
+    return frame
+
+
+def as_call_arguments(frame):
+    # Аргументы medical_diagnosis_system для каждой строки
+    symptom_matrix = frame[SYMPTOM_OPTIONS].to_numpy()
+    lab_matrix = frame[LAB_OPTIONS].to_numpy()
+    vitals = frame[["temperature", "bp_systolic", "bp_diastolic", "wbc", "crp"]].itertuples(index=False)
+    calls = []
+    for symptom_row, lab_row, (temperature, bp_systolic, bp_diastolic, wbc, crp) in zip(symptom_matrix, lab_matrix, vitals):
+        calls.append((
+            [s for s, present in zip(SYMPTOM_OPTIONS, symptom_row) if present],
+            [l for l, present in zip(LAB_OPTIONS, lab_row) if present],
+            None, float(temperature), int(bp_systolic), int(bp_diastolic), float(wbc), float(crp)
+        ))
+    return calls
+
+
+def as_list_columns(frame):
+    # "Узкий" формат файлов обращений: symptoms / lab_data через ";"
+    def joined(columns):
+        matrix = frame[columns].to_numpy()
+        return [";".join(c for c, present in zip(columns, row) if present) for row in matrix]
+    
+    narrow = frame[["temperature", "bp_systolic", "bp_diastolic", "wbc", "crp"]].copy()
+    narrow.insert(0, "lab_data", joined(LAB_OPTIONS))
+    narrow.insert(0, "symptoms", joined(SYMPTOM_OPTIONS))
+    narrow.insert(0, "encounter_id", np.arange(len(frame)))
+    return narrow
+
+
+def synthetic_knowledge_base(n_conditions, n_findings, findings_per_condition=12, seed=0):
+    # База знаний в формате knowledge_base/stewardship.json на сотни состояний
+    # и признаков: у каждого состояния небольшое число ненулевых весов, как в
+    # реальных клинических правилах
+    rng = np.random.default_rng(seed)
+    findings = [f"Симптом {i}" for i in range(n_findings)]
+    conditions = {}
+    for i in range(n_conditions):
+        chosen = rng.choice(n_findings, size=min(findings_per_condition, n_findings), replace=False)
+        weights = rng.choice([-3, -1, 1, 2, 3], size=len(chosen), p=[0.1, 0.1, 0.3, 0.3, 0.2])
+        conditions[f"condition_{i}"] = {
+            "diagnosis_criteria": [], "required_criteria": 0,
+            "treatments": {"antibiotics": ["НЕ ПОКАЗАНЫ"]} if i % 2 else {"antibiotics": ["Амоксициллин"]},
+            "referral": "", "source": "synthetic",
+            "scoring": {"base": int(rng.integers(0, 3)),
+                        "weights": {f"f{j}": int(w) for j, w in zip(chosen, weights)}}
+        }
+    conditions["hypertensive_crisis"] = {
+        "diagnosis_criteria": [], "required_criteria": 0, "treatments": {}, "referral": "", "source": "synthetic"
+    }
+    return {
+        "version": f"synthetic-{n_conditions}x{n_findings}",
+        "symptom_options": findings,
+        "lab_options": [],
+        "features": [{"name": f"f{j}", "symptom": s} for j, s in enumerate(findings)],
+        "crisis": {"condition": "hypertensive_crisis", "score": 10, "systolic_above": 180,
+                   "diastolic_above": 120, "symptoms": findings[:3]},
+        "conditions": conditions
+    }
+
+
+def generate_findings(knowledge_base, n, findings_per_patient=6, seed=0):
+    # Пациенты для синтетической базы знаний: несколько случайных признаков на каждого
+    rng = np.random.default_rng(seed)
+    findings = knowledge_base["symptom_options"]
+    present = [rng.choice(len(findings), size=findings_per_patient, replace=False) for _ in range(n)]
+    return [([findings[j] for j in row], [], None, 36.6, 120, 80, 6.0, 2.0) for row in present]
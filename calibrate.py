@@ -0,0 +1,385 @@
+# 🎯 КАЛИБРОВКА ВЕСОВ ПО РАЗМЕЧЕННЫМ ОБРАЩЕНИЯМ
+# Подбирает целые веса признаков, базовые баллы состояний и пороги
+# показателей (температура, лейкоциты, СРБ) по локальной выборке обращений
+# с подтвержденным диагнозом. Цель - доля верных основных диагнозов минус
+# штраф (--penalty) за каждое лишнее назначение антибиотиков: диагноз с
+# показаниями к ним при подтвержденном состоянии, где они не нужны.
+# Результат - новая версия базы знаний; ее отличия от действующей
+# проверяются через rule_impact.py.
+#
+#   python calibrate.py labeled.csv -o calibrated.json
+#   python calibrate.py labeled.parquet --label true_condition --penalty 1 -o calibrated.json
+#   python rule_impact.py knowledge_base/stewardship.json calibrated.json -o impact.csv
+#
+# Вход - те же колонки, что у score_encounters.py (CSV, JSONL или Parquet),
+# плюс подтвержденный диагноз (--label) - название состояния из базы
+# знаний; записи с неизвестными диагнозами пропускаются. Пустые показатели
+# заменяются нормальными значениями, как в API (VITAL_DEFAULTS), а
+# кандидаты порогов берутся только из измеренных значений. Часть выборки
+# (--holdout) в подборе не участвует: метрики на ней показывают, не
+# подогнаны ли веса под обучающую часть.
+#
+# Выборка сжимается до уникальных векторов признаков с числом обращений по
+# каждому подтвержденному диагнозу, поэтому стоимость оценки зависит от
+# числа различных картин, а не от числа обращений. Кандидаты оцениваются
+# пачками: баллы одного состояния для всех картин и всей пачки наборов
+# весов - одно матричное умножение (картины x признаки состояния) @
+# (признаки состояния x кандидаты), затем поэлементный максимум по
+# состояниям и свертка выбранных состояний с таблицей исходов.
+#
+# Поиск локальный: на каждом шаге оцениваются все изменения одного веса на
+# ±1 и --population случайных изменений нескольких весов, лучший кандидат
+# принимается, если улучшает цель. Когда веса перестают улучшаться,
+# каждый порог перебирается по квантилям показателя в выборке, и при
+# изменении порогов поиск весов повторяется. По умолчанию меняются только
+# заданные экспертами связи признак-состояние (ненулевые веса) и базовые
+# баллы; --all-features разрешает новые связи. Гипертонический криз
+# определяется отдельным правилом по давлению и в подборе не участвует;
+# required_criteria в оценке не используется и не меняется.
+import argparse
+import copy
+import json
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from diagnosis_engine import KB_PATH, VITAL_DEFAULTS, RuleSet, read_knowledge_base
+
+DEFAULT_LABEL = "confirmed_diagnosis"
+DEFAULT_PENALTY = 0.5
+DEFAULT_HOLDOUT = 0.2
+DEFAULT_POPULATION = 1024
+DEFAULT_PATIENCE = 5
+DEFAULT_ROUNDS = 5
+WEIGHT_LIMIT = 10
+# Ячеек (картина x кандидат x состояние) в одной пачке кандидатов - баллы
+# пачки помещаются в кэш процессора
+EVAL_CELLS = 1 << 20
+THRESHOLD_QUANTILES = 40
+THRESHOLD_KEYS = {
+    "temperature_above": "temperature", "temperature_below": "temperature",
+    "wbc_above": "wbc", "crp_above": "crp"
+}
+VITAL_COLUMNS = ["temperature", "bp_systolic", "bp_diastolic", "wbc", "crp"]
+# Улучшение цели меньше этого - шум округления, а не новый лучший кандидат
+EPSILON = 1e-12
+
+
+def read_dataset(path):
+    name = path.lower()
+    if name.endswith(".parquet"):
+        return pd.read_parquet(path)
+    if name.endswith((".jsonl", ".ndjson", ".jsonl.gz", ".ndjson.gz")):
+        return pd.read_json(path, lines=True)
+    return pd.read_csv(path)
+
+
+class Encounters:
+    # Размеченные обращения в виде, не зависящем от весов и порогов: флаги
+    # симптомов и анализов, показатели (пустые - нормальные значения),
+    # отметки неизмеренных показателей и подтвержденные диагнозы
+    def __init__(self, symptoms, labs, vitals, missing, labels):
+        self.symptoms = symptoms
+        self.labs = labs
+        self.vitals = vitals
+        self.missing = missing
+        self.labels = labels
+
+    def __len__(self):
+        return len(self.labels)
+
+    def take(self, rows):
+        return Encounters(
+            {name: flags[rows] for name, flags in self.symptoms.items()},
+            {name: flags[rows] for name, flags in self.labs.items()},
+            {name: values[rows] for name, values in self.vitals.items()},
+            {name: flags[rows] for name, flags in self.missing.items()},
+            self.labels[rows]
+        )
+
+
+def load_encounters(rules, frame, label_column, log=sys.stderr):
+    symptoms, labs = rules.input_flags(frame)
+    vitals, missing = {}, {}
+    for name in VITAL_COLUMNS:
+        values = pd.to_numeric(frame[name], errors="coerce").to_numpy(dtype=float)
+        missing[name] = ~np.isfinite(values)
+        vitals[name] = np.where(missing[name], VITAL_DEFAULTS[name], values)
+        if missing[name].any():
+            print(f"пустых значений {name}: {int(missing[name].sum()):,} - взято {VITAL_DEFAULTS[name]:g}", file=log)
+    return Encounters(symptoms, labs, vitals, missing, frame[label_column].to_numpy(dtype=object))
+
+
+class Objective:
+    # Обращения, сжатые до уникальных векторов признаков при порогах набора
+    # правил: counts[картина, состояние] - число обращений с такой картиной и
+    # подтвержденным диагнозом (последний столбец - диагнозы, которых нет
+    # среди оцениваемых состояний, например криз без критического давления;
+    # такие обращения не бывают верными)
+    def __init__(self, rules, encounters, penalty):
+        vitals = encounters.vitals
+        features = rules.flag_features(
+            encounters.symptoms, encounters.labs, vitals["temperature"], vitals["wbc"], vitals["crp"]
+        )
+        crisis = rules.crisis_flags(encounters.symptoms, vitals["bp_systolic"], vitals["bp_diastolic"])
+        n = len(rules.conditions)
+        index = {c: i for i, c in enumerate(rules.conditions)}
+        inverse, names = pd.factorize(encounters.labels)
+        label = np.array([index.get(name, n) for name in names], dtype=np.int64)[inverse]
+        needed = np.array([rules.antibiotics_indicated(name) for name in names], dtype=bool)[inverse]
+
+        # При критическом давлении диагноз ставит правило криза - вклад этих
+        # обращений от весов не зависит
+        self.total = len(encounters)
+        self.penalty = penalty
+        self.crisis_correct = int(np.sum(encounters.labels[crisis] == rules.crisis_condition))
+        self.crisis_missed = int(np.sum(needed[crisis]))
+        features, label, needed = features[~crisis], label[~crisis], needed[~crisis]
+
+        # Ключ картины - упакованные биты признаков; до 64 признаков - одно
+        # целое, которое сортируется намного быстрее строки байтов
+        packed = np.packbits(features, axis=1)
+        if packed.shape[1] <= 8:
+            keys = np.pad(packed, ((0, 0), (0, 8 - packed.shape[1]))).view(np.uint64).ravel()
+        else:
+            keys = np.ascontiguousarray(packed).view(np.dtype((np.void, packed.shape[1]))).ravel()
+        _, first, pattern = np.unique(keys, return_index=True, return_inverse=True)
+        pattern = pattern.ravel()
+        p = len(first)
+        self.patterns = features[first].astype(np.float32)
+        # Столбцы признаков по наборам используемых весов - общие для всех пачек
+        self.columns = {}
+        counts = np.bincount(pattern * (n + 1) + label, minlength=p * (n + 1)).reshape(p, n + 1)
+        unneeded = np.bincount(pattern, weights=~needed, minlength=p)
+        needed = np.bincount(pattern, weights=needed, minlength=p)
+        # Исход выбора каждого состояния для каждой картины: верные диагнозы,
+        # лишние и пропущенные назначения антибиотиков
+        indicated = [rules.antibiotics_indicated(c) for c in rules.conditions]
+        self.outcomes = [
+            np.stack([counts[:, k], unneeded * flag, needed * (not flag)]) for k, flag in enumerate(indicated)
+        ]
+
+    def evaluate(self, weights, base):
+        # weights (кандидаты x признаки x состояния), base (кандидаты x состояния):
+        # верные диагнозы, лишние и пропущенные назначения антибиотиков и цель
+        # для каждого кандидата
+        n_candidates, _, n = weights.shape
+        p = len(self.patterns)
+        block = max(1, EVAL_CELLS // max(1, p * n))
+        totals = np.empty((3, n_candidates))
+        for start in range(0, n_candidates, block):
+            # Признаки 0/1 и целые веса: суммы в float32 точны
+            w = weights[start:start + block].astype(np.float32)
+            b = base[start:start + block].astype(np.float32)
+            for k in range(n):
+                # Умножаются только признаки с ненулевым весом хотя бы у одного кандидата
+                used = np.flatnonzero(np.any(w[:, :, k], axis=0))
+                key = used.tobytes()
+                if key not in self.columns:
+                    self.columns[key] = np.ascontiguousarray(self.patterns[:, used])
+                scores = self.columns[key] @ w[:, used, k].T + b[:, k]
+                if k == 0:
+                    best, top = scores, np.zeros(scores.shape, dtype=np.min_scalar_type(n))
+                else:
+                    # Строгое сравнение: из равных остается состояние, которое
+                    # раньше в базе знаний, - как в движке
+                    better = scores > best
+                    np.maximum(best, scores, out=best)
+                    np.copyto(top, k, where=better)
+            totals[:, start:start + len(w)] = sum(self.outcomes[k] @ (top == k) for k in range(n))
+        correct, needless, missed = totals
+        correct += self.crisis_correct
+        missed += self.crisis_missed
+        return {
+            "correct": correct,
+            "needless": needless,
+            "missed": missed,
+            "objective": (correct - self.penalty * needless) / max(1, self.total)
+        }
+
+    def score(self, params):
+        return self.evaluate(params[None, :-1], params[None, -1])["objective"][0]
+
+
+def rule_parameters(rules, all_features=False):
+    # Параметры набора правил одной матрицей: строки признаков и строка
+    # базовых баллов (x состояния) и маска изменяемых ячеек
+    weights, base = rules.batch_weights()
+    params = np.vstack([weights, base]).astype(np.int64)
+    editable = np.ones(params.shape, dtype=bool) if all_features else params != 0
+    editable[-1] = True
+    return params, editable
+
+
+def candidates(params, editable, population, rng):
+    # Все изменения одного веса на ±1 и population случайных изменений
+    # одного-трех весов на ±1..2
+    cells = np.flatnonzero(editable)
+    single = len(cells)
+    steps = np.zeros((2 * single + population, params.size), dtype=np.int64)
+    steps[np.arange(single), cells] = 1
+    steps[single + np.arange(single), cells] = -1
+    rows = 2 * single + np.arange(population)
+    for i in range(3):
+        delta = rng.choice([-2, -1, 1, 2], size=population)
+        if i:
+            delta *= rng.random(population) < 0.5
+        np.add.at(steps, (rows, rng.choice(cells, size=population)), delta)
+    batch = np.clip(params.reshape(1, -1) + steps, -WEIGHT_LIMIT, WEIGHT_LIMIT)
+    return batch.reshape(-1, *params.shape)
+
+
+def search_weights(objective, params, editable, population, patience, rng, stats):
+    best = objective.score(params)
+    stale = 0
+    while stale < patience:
+        batch = candidates(params, editable, population, rng)
+        started = time.perf_counter()
+        scores = objective.evaluate(batch[:, :-1], batch[:, -1])["objective"]
+        stats["seconds"] += time.perf_counter() - started
+        stats["candidates"] += len(batch)
+        i = int(np.argmax(scores))
+        if scores[i] > best + EPSILON:
+            params, best, stale = batch[i], scores[i], 0
+        else:
+            stale += 1
+    return params, best
+
+
+def search_thresholds(source, params, encounters, penalty, best):
+    # Пороги по очереди: квантили измеренных значений показателя при текущих весах
+    changed = False
+    for spec in source["features"]:
+        for key, vital in THRESHOLD_KEYS.items():
+            if key not in spec:
+                continue
+            measured = encounters.vitals[vital][~encounters.missing[vital]]
+            if not len(measured):
+                continue
+            quantiles = np.nanquantile(measured, np.linspace(0.01, 0.99, THRESHOLD_QUANTILES))
+            current = spec[key]
+            for value in np.unique(quantiles.round(1)).tolist():
+                if value == current:
+                    continue
+                spec[key] = value
+                score = Objective(RuleSet(source), encounters, penalty).score(params)
+                if score > best + EPSILON:
+                    best, current, changed = score, value, True
+            spec[key] = current
+    return changed, best
+
+
+def apply_parameters(source, rules, params):
+    # Веса в исходном порядке ключей базы знаний, новые связи - в конце
+    names = [spec["name"] for spec in rules.features]
+    for k, condition in enumerate(rules.conditions):
+        scoring = source["conditions"][condition]["scoring"]
+        scoring["base"] = int(params[-1, k])
+        weights = {name: int(params[names.index(name), k]) for name in scoring["weights"]}
+        weights.update({name: int(params[f, k]) for f, name in enumerate(names) if params[f, k] and name not in weights})
+        scoring["weights"] = weights
+
+
+def print_changes(initial, calibrated, log=sys.stderr):
+    for old, new in zip(initial["features"], calibrated["features"]):
+        for key in THRESHOLD_KEYS:
+            if key in old and old[key] != new[key]:
+                print(f"  порог {old['name']}.{key}: {old[key]:g} -> {new[key]:g}", file=log)
+    for condition, info in calibrated["conditions"].items():
+        if "scoring" not in info:
+            continue
+        old, new = initial["conditions"][condition]["scoring"], info["scoring"]
+        if old.get("base", 0) != new["base"]:
+            print(f"  {condition}: базовый балл {old.get('base', 0)} -> {new['base']}", file=log)
+        for name, weight in new["weights"].items():
+            if old["weights"].get(name, 0) != weight:
+                print(f"  {condition}.{name}: {old['weights'].get(name, 0)} -> {weight}", file=log)
+
+
+def print_metrics(rows, log=sys.stderr):
+    print(f"{'':>28} {'точность':>9} {'лишние АБ':>10} {'пропущ. АБ':>11} {'цель':>8}", file=log)
+    for title, objective, params in rows:
+        result = objective.evaluate(params[None, :-1], params[None, -1])
+        total = max(1, objective.total)
+        print(f"{title:>28} {result['correct'][0] / total:>9.2%} {result['needless'][0] / total:>10.2%} "
+              f"{result['missed'][0] / total:>11.2%} {result['objective'][0]:>8.4f}", file=log)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Калибровка весов и порогов по обращениям с подтвержденным диагнозом")
+    parser.add_argument("dataset", help="размеченные обращения: CSV, JSONL или Parquet")
+    parser.add_argument("-o", "--output", default="-", help="калиброванная база знаний, JSON ('-' - stdout)")
+    parser.add_argument("--kb", default=KB_PATH, help="исходная база знаний (по умолчанию действующая)")
+    parser.add_argument("--label", default=DEFAULT_LABEL, help="колонка с подтвержденным диагнозом")
+    parser.add_argument("--penalty", type=float, default=DEFAULT_PENALTY,
+                        help="штраф за лишнее назначение антибиотиков в долях верного диагноза")
+    parser.add_argument("--holdout", type=float, default=DEFAULT_HOLDOUT, help="доля выборки для проверки")
+    parser.add_argument("--population", type=int, default=DEFAULT_POPULATION,
+                        help="случайных кандидатов на шаге в дополнение к изменениям одного веса")
+    parser.add_argument("--patience", type=int, default=DEFAULT_PATIENCE, help="шагов без улучшения до остановки")
+    parser.add_argument("--rounds", type=int, default=DEFAULT_ROUNDS, help="не больше N циклов веса-пороги")
+    parser.add_argument("--all-features", action="store_true", help="разрешить новые связи признак-состояние")
+    parser.add_argument("--fixed-thresholds", action="store_true", help="не менять пороги показателей")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    source = read_knowledge_base(args.kb)
+    rules = RuleSet(source)
+    frame = read_dataset(args.dataset)
+    if args.label not in frame.columns:
+        sys.exit(f"В выборке нет колонки с диагнозом: {args.label}")
+    frame[args.label] = frame[args.label].astype(str).str.strip()
+    known = frame[args.label].isin(rules.knowledge_base)
+    if not known.all():
+        print(f"пропущено записей с неизвестным диагнозом: {int((~known).sum()):,}", file=sys.stderr)
+    encounters = load_encounters(rules, frame[known].reset_index(drop=True), args.label)
+    rng = np.random.default_rng(args.seed)
+    holdout = rng.random(len(encounters)) < args.holdout
+    train, test = encounters.take(~holdout), encounters.take(holdout)
+
+    initial = copy.deepcopy(source)
+    initial_params, editable = rule_parameters(rules, args.all_features)
+    params = initial_params
+    stats = {"candidates": 0, "seconds": 0.0}
+    started = time.perf_counter()
+    for _ in range(args.rounds):
+        objective = Objective(RuleSet(source), train, args.penalty)
+        params, best = search_weights(objective, params, editable, args.population, args.patience, rng, stats)
+        if args.fixed_thresholds:
+            break
+        changed, best = search_thresholds(source, params, train, args.penalty, best)
+        if not changed:
+            break
+
+    apply_parameters(source, rules, params)
+    source["version"] = f"{initial['version']}+calibrated"
+    calibrated = RuleSet(source)
+    print(f"обращений: {len(train):,} для подбора, {len(test):,} для проверки; картин признаков: "
+          f"{len(objective.patterns):,}; оценено кандидатов: {stats['candidates']:,} "
+          f"({stats['candidates'] / max(stats['seconds'], 1e-9):,.0f} в секунду), "
+          f"всего {time.perf_counter() - started:.1f} с", file=sys.stderr)
+    print_metrics([
+        ("исходные, подбор", Objective(rules, train, args.penalty), initial_params),
+        ("калиброванные, подбор", Objective(calibrated, train, args.penalty), params),
+        ("исходные, проверка", Objective(rules, test, args.penalty), initial_params),
+        ("калиброванные, проверка", Objective(calibrated, test, args.penalty), params)
+    ])
+    print_changes(initial, source)
+
+    # NaN и бесконечность в пороге - сломанная база знаний, а не результат
+    for spec in source["features"]:
+        for key in THRESHOLD_KEYS:
+            if key in spec and not np.isfinite(spec[key]):
+                sys.exit(f"Порог {spec['name']}.{key} = {spec[key]} - база знаний не записана")
+    text = json.dumps(source, ensure_ascii=False, indent=2, allow_nan=False) + "\n"
+    if args.output == "-":
+        sys.stdout.write(text)
+    else:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+
+
+if __name__ == "__main__":
+    main()
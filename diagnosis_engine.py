@@ -0,0 +1,1034 @@
+# 🩺 ДИАГНОСТИЧЕСКИЙ ДВИЖОК
+# База знаний, правила оценки и функции диагностики без зависимости от
+# Streamlit. Модуль импортируется за миллисекунды: numpy и pandas нужны
+# только пакетной диагностике и загружаются при первом ее вызове, поэтому
+# фоновые обработчики, API и скрипты не тянут за собой интерфейс.
+#
+# Состояния, критерии, веса, пороги и лечение читаются из версионированного
+# файла базы знаний (knowledge_base/stewardship.json или .toml, путь - в
+# STEWARDSHIP_KB). Скомпилированный набор правил сохраняется в бинарный кэш
+# по хэшу содержимого файла (каталог пользователя сервиса, STEWARDSHIP_KB_CACHE;
+# на каждый файл базы знаний хранится только последняя версия), а в
+# работающих процессах фоновый поток раз в
+# STEWARDSHIP_KB_RELOAD_INTERVAL секунд проверяет mtime файла и атомарно
+# подменяет набор правил - без перезапуска и без потери сессий.
+import functools
+import hashlib
+import heapq
+import json
+import logging
+import math
+import os
+import pickle
+import struct
+import threading
+import time
+
+import audit_log
+import metrics
+
+log = logging.getLogger(__name__)
+
+KB_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "knowledge_base")
+KB_PATH = os.environ.get("STEWARDSHIP_KB", os.path.join(KB_DIR, "stewardship.json"))
+# Кэш скомпилированных правил - pickle, поэтому он лежит вне дерева проекта,
+# в каталоге, куда может писать только пользователь сервиса
+KB_CACHE_DIR = os.environ.get("STEWARDSHIP_KB_CACHE", os.path.join(
+    os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache"), "stewardship", "kbcache"
+))
+KB_RELOAD_INTERVAL = float(os.environ.get("STEWARDSHIP_KB_RELOAD_INTERVAL", "2"))
+# Меняется вместе с форматом скомпилированного набора правил
+COMPILER_VERSION = 4
+
+LANE_BIAS = 64
+# Признаки делятся на наименьшее число кусков не длиннее LANE_MAX_CHUNK_BITS
+# бит: таблица на 2^13 значений еще мала, а каждый лишний кусок - лишнее
+# сложение на каждый вызов
+LANE_MAX_CHUNK_BITS = 13
+# Упакованные дорожки выгодны только для небольших баз знаний; крупные
+# оцениваются по разреженным спискам весов
+LANE_MAX_CONDITIONS = 16
+LANE_MAX_FEATURES = 36
+# Пакетная оценка плотным умножением, пока матрица весов не больше этого числа ячеек
+DENSE_BATCH_CELLS = 4096
+# Основной диагноз и три дифференциальных
+DIFFERENTIAL_SIZE = 4
+# Нормальные значения неизмеренных показателей (API, калибровка)
+VITAL_DEFAULTS = {"temperature": 36.6, "bp_systolic": 120, "bp_diastolic": 80, "wbc": 6.0, "crp": 2.0}
+
+class KnowledgeBaseError(ValueError):
+    pass
+
+# 🔒 НАБОР ПРАВИЛ ТОЛЬКО ДЛЯ ЧТЕНИЯ
+# Один скомпилированный набор правил обслуживает все сессии и потоки
+# процесса, поэтому после компиляции он неизменяем: словари базы знаний
+# запрещают запись, списки становятся кортежами, присваивание атрибутов
+# набора - ошибка. Так сессия не может случайно поменять правила соседям,
+# а чтение не требует блокировок.
+def _read_only(*args, **kwargs):
+    raise TypeError("Набор правил только для чтения")
+
+class _ReadOnlyDict(dict):
+    __setitem__ = __delitem__ = __ior__ = _read_only
+    clear = pop = popitem = setdefault = update = _read_only
+    
+    def __reduce__(self):
+        return _ReadOnlyDict, (dict(self),)
+
+def _freeze(value):
+    if isinstance(value, dict):
+        return _ReadOnlyDict({k: _freeze(v) for k, v in value.items()})
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+# ⚡ СКОМПИЛИРОВАННЫЙ НАБОР ПРАВИЛ
+# Словарь симптомов и таблица весов превращаются в битовые маски: каждый
+# признак - один бит, а баллы всех состояний упакованы в одно целое число
+# по 16 бит на состояние. Диагностика одного пациента сводится к сборке
+# маски и нескольким табличным сложениям (по таблице на 9 признаков) вместо
+# десятков проверок "in" по спискам. В младших битах каждой дорожки
+# хранится обратный порядковый номер состояния, поэтому обычная сортировка
+# упакованных значений дает тот же порядок, что и стабильная сортировка по
+# баллам.
+#
+# Признаки базы знаний бывают двух видов: прямые ({"symptom": ...}) делят
+# бит с самим симптомом, производные вычисляются при кодировании пациента:
+#   {"symptom", "without_symptom", "temperature_above", "temperature_below"}
+#   {"lab", "wbc_above", "crp_above"} - анализ отмечен ИЛИ показатель выше порога
+#
+# Для баз знаний на сотни состояний и признаков дорожки не строятся: веса
+# хранятся разреженно, списком (состояние, вес) на каждый признак. Баллы
+# меняются только у состояний, затронутых присутствующими признаками, а
+# остальные идут в заранее вычисленном порядке базовых баллов, поэтому
+# первые k диагнозов находятся за время, пропорциональное числу найденных
+# признаков, а не произведению состояний на признаки.
+class RuleSet:
+    def __init__(self, source, fingerprint=""):
+        # Любая ошибка разбора и компиляции (нет ключа, вес "abc", порог "x")
+        # - KnowledgeBaseError: горячая перезагрузка тогда оставляет прежние правила
+        try:
+            self._load(source)
+            self.fingerprint = fingerprint
+            self._compile()
+        except KnowledgeBaseError:
+            raise
+        except (KeyError, TypeError, ValueError, AttributeError) as exc:
+            raise KnowledgeBaseError(f"Некорректная база знаний: {exc!r}") from exc
+        self._init_runtime()
+    
+    def _load(self, source):
+        self.version = str(source["version"])
+        self.symptom_options = tuple(source["symptom_options"])
+        self.lab_options = tuple(source["lab_options"])
+        self.features = _freeze([dict(spec) for spec in source["features"]])
+        self.knowledge_base = _freeze({
+            condition: {k: v for k, v in info.items() if k != "scoring"}
+            for condition, info in source["conditions"].items()
+        })
+        self.scoring_rules = _freeze({
+            condition: {"base": int(info["scoring"].get("base", 0)),
+                        "weights": {f: int(w) for f, w in info["scoring"]["weights"].items()}}
+            for condition, info in source["conditions"].items() if "scoring" in info
+        })
+        self.conditions = tuple(self.scoring_rules)
+        
+        crisis = source["crisis"]
+        self.crisis_condition = crisis["condition"]
+        self.crisis_score = int(crisis["score"])
+        self.crisis_systolic = crisis["systolic_above"]
+        self.crisis_diastolic = crisis["diastolic_above"]
+        self.crisis_symptoms = tuple(crisis["symptoms"])
+        
+        names = [spec["name"] for spec in self.features]
+        if len(set(names)) != len(names):
+            raise KnowledgeBaseError("Повторяющиеся имена признаков")
+        for condition, rule in self.scoring_rules.items():
+            unknown = set(rule["weights"]) - set(names)
+            if unknown:
+                raise KnowledgeBaseError(f"{condition}: неизвестные признаки {sorted(unknown)}")
+        missing = ({self.crisis_condition} | set(self.conditions)) - set(self.knowledge_base)
+        if missing:
+            raise KnowledgeBaseError(f"Нет описания состояний {sorted(missing)}")
+        if not self.conditions:
+            raise KnowledgeBaseError("Нет ни одного состояния с правилами оценки")
+    
+    def _compile(self):
+        n_features = len(self.features)
+        self.feature_bits = _ReadOnlyDict({spec["name"]: 1 << i for i, spec in enumerate(self.features)})
+        
+        # Прямые признаки: бит признака и есть бит симптома
+        symptom_bits = {}
+        for spec in self.features:
+            if set(spec) == {"name", "symptom"} and spec["symptom"] not in symptom_bits:
+                symptom_bits[spec["symptom"]] = self.feature_bits[spec["name"]]
+        referenced = list(self.symptom_options) + list(self.crisis_symptoms)
+        referenced += [spec[k] for spec in self.features for k in ("symptom", "without_symptom") if k in spec]
+        next_bit = n_features
+        for symptom in referenced:
+            if symptom not in symptom_bits:
+                symptom_bits[symptom] = 1 << next_bit
+                next_bit += 1
+        self.symptom_bits = _ReadOnlyDict(symptom_bits)
+        
+        labs = list(self.lab_options) + [spec["lab"] for spec in self.features if "lab" in spec]
+        lab_bits = {}
+        for lab in labs:
+            lab_bits.setdefault(lab, 1 << len(lab_bits))
+        self.lab_bits = _ReadOnlyDict(lab_bits)
+        
+        # Производные признаки - кортежи для быстрого цикла в encode()
+        symptom_derived, lab_derived = [], []
+        for spec in self.features:
+            bit = self.feature_bits[spec["name"]]
+            if "lab" in spec or "wbc_above" in spec or "crp_above" in spec:
+                lab_derived.append((
+                    bit, self.lab_bits.get(spec.get("lab"), 0),
+                    float(spec.get("wbc_above", math.inf)), float(spec.get("crp_above", math.inf))
+                ))
+            elif symptom_bits[spec["symptom"]] != bit:
+                symptom_derived.append((
+                    bit, symptom_bits[spec["symptom"]],
+                    symptom_bits[spec["without_symptom"]] if "without_symptom" in spec else 0,
+                    float(spec.get("temperature_above", -math.inf)),
+                    float(spec.get("temperature_below", math.inf))
+                ))
+        self.symptom_derived = tuple(symptom_derived)
+        self.lab_derived = tuple(lab_derived)
+        crisis_mask = 0
+        for symptom in self.crisis_symptoms:
+            crisis_mask |= symptom_bits[symptom]
+        self.crisis_mask = crisis_mask
+        
+        # Симптомы и анализы, от которых зависит результат, - для канонического ключа кэша
+        self.rule_symptoms = frozenset(
+            s for s, bit in symptom_bits.items()
+            if bit & self.crisis_mask or bit < 1 << n_features
+            or any(bit in (d[1], d[2]) for d in self.symptom_derived)
+        )
+        self.rule_labs = frozenset(lab for lab, bit in self.lab_bits.items() if any(bit == d[1] for d in lab_derived))
+        
+        self._compile_sparse()
+        self._compile_lanes()
+    
+    def _compile_sparse(self):
+        # Ключ состояния - целое "баллы * n + обратный номер": сравнение ключей
+        # дает порядок стабильной сортировки по баллам, а веса признаков
+        # хранятся уже умноженными на n и прибавляются к ключу напрямую
+        n = len(self.conditions)
+        feature_index = {spec["name"]: i for i, spec in enumerate(self.features)}
+        postings = [[] for _ in self.features]
+        for lane, condition in enumerate(self.conditions):
+            for name, weight in self.scoring_rules[condition]["weights"].items():
+                if weight:
+                    postings[feature_index[name]].append((lane, weight * n))
+        self.postings = tuple(tuple(p) for p in postings)
+        self.feature_mask = (1 << len(self.features)) - 1
+        self.base_scores = tuple(self.scoring_rules[c]["base"] for c in self.conditions)
+        self.base_keys = tuple(score * n + n - 1 - lane for lane, score in enumerate(self.base_scores))
+        # Порядок состояний без сработавших признаков: по базовому баллу,
+        # при равенстве - по порядку в базе знаний
+        self.base_order = tuple(sorted(range(n), key=self.base_keys.__getitem__, reverse=True))
+    
+    def _compile_lanes(self):
+        self.lane_tables = None
+        self.lane_format = None
+        n_conditions = len(self.conditions)
+        order_bits = n_conditions.bit_length()
+        names = [spec["name"] for spec in self.features]
+        if n_conditions > LANE_MAX_CONDITIONS or len(names) > LANE_MAX_FEATURES:
+            return
+        n_chunks = max(1, -(-len(names) // LANE_MAX_CHUNK_BITS))
+        chunk_bits = -(-len(names) // n_chunks)
+        
+        packed_weights = []
+        for name in names:
+            packed = 0
+            for lane, condition in enumerate(self.conditions):
+                packed += (self.scoring_rules[condition]["weights"].get(name, 0) << order_bits) << (16 * lane)
+            packed_weights.append(packed)
+        
+        tables = []
+        for chunk in range(n_chunks):
+            table = [0] * (1 << chunk_bits)
+            for value in range(1, 1 << chunk_bits):
+                low = value & -value
+                feature = chunk * chunk_bits + low.bit_length() - 1
+                weight = packed_weights[feature] if feature < len(packed_weights) else 0
+                table[value] = table[value ^ low] + weight
+            tables.append(tuple(table))
+        
+        base = 0
+        decode = {}
+        for lane, condition in enumerate(self.conditions):
+            rule = self.scoring_rules[condition]
+            low = rule["base"] + sum(w for w in rule["weights"].values() if w < 0)
+            high = rule["base"] + sum(w for w in rule["weights"].values() if w > 0)
+            # Каждая дорожка обязана оставаться в пределах 16 бит при любом
+            # наборе признаков, иначе оценка идет по разреженным весам
+            if LANE_BIAS + low < 0 or (LANE_BIAS + high) << order_bits >= 1 << 16:
+                return
+            tag = n_conditions - 1 - lane
+            base += (((LANE_BIAS + rule["base"]) << order_bits) | tag) << (16 * lane)
+            # Готовые пары (состояние, баллы) для каждого возможного значения дорожки
+            for score in range(low, high + 1):
+                decode[((LANE_BIAS + score) << order_bits) | tag] = (condition, score)
+        
+        self.lane_tables = tuple(tables)
+        self.chunk_bits = chunk_bits
+        self.chunk_mask = (1 << chunk_bits) - 1
+        self.lane_base = base
+        self.lane_decode = _ReadOnlyDict(decode)
+        self.lane_format = f"<{n_conditions}H"
+    
+    def _init_runtime(self):
+        # Объекты, которые не сохраняются в бинарный кэш; после них набор
+        # правил закрыт для записи
+        self.lane_struct = struct.Struct(self.lane_format) if self.lane_format else None
+        # Путь одного пациента - замыкания над таблицами набора правил:
+        # переменные замыкания читаются быстрее атрибутов объекта
+        self.encode = _compile_encoder(self)
+        self.score_mask = _compile_lane_scorer(self) if self.lane_tables is not None else self._score_sparse
+        self.diagnose = _compile_diagnose(self)
+        self.canonical_key = _compile_canonical_key(self)
+        self.decide = _compile_decide(self)
+        self._batch = None
+        self._batch_lock = threading.Lock()
+        self._frozen = True
+    
+    def __setattr__(self, name, value):
+        if self.__dict__.get("_frozen"):
+            raise AttributeError(f"Набор правил только для чтения: {name}")
+        object.__setattr__(self, name, value)
+    
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        for name in ("lane_struct", "encode", "score_mask", "diagnose", "canonical_key", "decide", "_batch",
+                     "_batch_lock", "_frozen"):
+            state.pop(name, None)
+        return state
+    
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._init_runtime()
+    
+    def _sparse_deltas(self, mask):
+        # Суммы весов только по присутствующим признакам: {номер состояния: прибавка к ключу}
+        deltas = {}
+        postings = self.postings
+        mask &= self.feature_mask
+        while mask:
+            low = mask & -mask
+            for lane, weight in postings[low.bit_length() - 1]:
+                deltas[lane] = deltas.get(lane, 0) + weight
+            mask ^= low
+        return deltas
+    
+    def top_conditions(self, mask, k):
+        # Первые k пар (состояние, баллы) без полного пересчета и сортировки
+        deltas = self._sparse_deltas(mask)
+        keys = self.base_keys
+        candidates = [keys[lane] + delta for lane, delta in deltas.items()]
+        # Из незатронутых состояний в ответ могут попасть только первые k по базовому баллу
+        taken = 0
+        for lane in self.base_order:
+            if taken == k:
+                break
+            if lane not in deltas:
+                candidates.append(keys[lane])
+                taken += 1
+        return self.top_keys(candidates, k)
+    
+    # Инкрементальный пересчет: ключи состояний хранятся между вызовами, а при
+    # изменении ввода учитываются только вклады изменившихся признаков
+    def initial_keys(self):
+        return list(self.base_keys)
+    
+    def update_keys(self, keys, old_mask, new_mask):
+        changed = (old_mask ^ new_mask) & self.feature_mask
+        postings = self.postings
+        while changed:
+            low = changed & -changed
+            sign = 1 if new_mask & low else -1
+            for lane, weight in postings[low.bit_length() - 1]:
+                keys[lane] += sign * weight
+            changed ^= low
+        return keys
+    
+    def top_keys(self, keys, k):
+        conditions = self.conditions
+        last = len(conditions) - 1
+        top = []
+        for key in heapq.nlargest(k, keys):
+            score, tag = divmod(key, len(conditions))
+            top.append((conditions[last - tag], score))
+        return top
+    
+    def is_crisis(self, mask, bp_systolic, bp_diastolic):
+        return bp_systolic > self.crisis_systolic and bp_diastolic > self.crisis_diastolic and bool(mask & self.crisis_mask)
+    
+    # encode(symptoms, lab_data, temperature, wbc, crp) - маска признаков
+    # пациента, score_mask(mask) - отсортированный по убыванию список
+    # (состояние, баллы) и diagnose(...) собираются в _init_runtime
+    def _score_sparse(self, mask):
+        return self.top_conditions(mask, len(self.conditions))
+    
+    def rank(self, mask, top_k=None):
+        # top_k=None - полный ранжированный список, иначе только первые top_k
+        if self.lane_tables is not None or top_k is None:
+            ranked = self.score_mask(mask)
+            return ranked if top_k is None else ranked[:top_k]
+        return self.top_conditions(mask, top_k)
+    
+    # 💊 СВОДКА ПО ЛЕЧЕНИЮ
+    def antibiotics_indicated(self, condition):
+        antibiotics = self.knowledge_base[condition]["treatments"].get("antibiotics", [])
+        return bool(antibiotics) and not any("НЕ ПОКАЗАНЫ" in med for med in antibiotics)
+    
+    def treatment_categories(self, condition):
+        return list(self.knowledge_base[condition]["treatments"])
+    
+    # 🧮 ПАКЕТНАЯ ДИАГНОСТИКА
+    def batch_weights(self):
+        # Матрица весов (признак x состояние) и базовые баллы для пакетной оценки;
+        # numpy загружается только при первом пакетном вызове. Матрицы общие
+        # для всех потоков: строятся один раз под блокировкой и не изменяются
+        if self._batch is None:
+            with self._batch_lock:
+                if self._batch is None:
+                    import numpy as np
+                    weights = np.array(
+                        [[self.scoring_rules[c]["weights"].get(spec["name"], 0) for c in self.conditions] for spec in self.features],
+                        dtype=np.int32
+                    )
+                    base = np.array(self.base_scores, dtype=np.int32)
+                    weights.flags.writeable = False
+                    base.flags.writeable = False
+                    self.__dict__["_batch"] = (weights, base)
+        return self._batch
+    
+    def batch_scores(self, features):
+        import numpy as np
+        
+        weights, base = self.batch_weights()
+        if weights.size <= DENSE_BATCH_CELLS:
+            # Признаки 0/1 и целые веса: сумма в float64 точна, а умножение
+            # идет через BLAS, заметно быстрее целочисленного
+            return (features.astype(np.float64) @ weights.astype(np.float64)).astype(np.int32) + base
+        # Крупная база знаний: к базовым баллам прибавляются только ненулевые
+        # веса присутствующих признаков
+        scores = np.tile(base, (len(features), 1))
+        for i, row in enumerate(weights):
+            lanes = np.flatnonzero(row)
+            if lanes.size:
+                rows = np.flatnonzero(features[:, i])
+                if rows.size:
+                    scores[rows[:, None], lanes] += row[lanes]
+        return scores
+    
+    def batch_top(self, scores, k):
+        import numpy as np
+        
+        # Уникальный ключ "баллы, затем порядок в базе знаний" дает тот же
+        # порядок, что и стабильная сортировка, а argpartition отбирает
+        # первые k без сортировки всей строки
+        n = scores.shape[1]
+        key = scores.astype(np.int64) * n + np.arange(n - 1, -1, -1)
+        if k < n:
+            top = np.argpartition(-key, k - 1, axis=1)[:, :k]
+        else:
+            top = np.broadcast_to(np.arange(n), key.shape)
+        top_order = np.argsort(-np.take_along_axis(key, top, axis=1), axis=1)
+        return np.take_along_axis(top, top_order, axis=1)
+    
+    def input_flags(self, df):
+        # Булевы колонки всех симптомов и анализов словаря (название -> массив)
+        return _flag_columns(df, self.symptom_bits, "symptoms"), _flag_columns(df, self.lab_bits, "lab_data")
+    
+    def feature_matrix(self, df):
+        symptoms, labs = self.input_flags(df)
+        matrix = self.flag_features(
+            symptoms, labs, df["temperature"].to_numpy(dtype=float),
+            df["wbc"].to_numpy(dtype=float), df["crp"].to_numpy(dtype=float)
+        )
+        crisis = self.crisis_flags(
+            symptoms, df["bp_systolic"].to_numpy(dtype=float), df["bp_diastolic"].to_numpy(dtype=float)
+        )
+        return matrix, crisis
+    
+    def flag_features(self, symptoms, labs, temperature, wbc, crp):
+        # Матрица признаков из булевых колонок симптомов и анализов
+        # (название -> массив) и массивов показателей
+        import numpy as np
+        
+        # Столбцы заполняются на месте в матрице с порядком по столбцам
+        matrix = np.empty((len(temperature), len(self.features)), dtype=bool, order="F")
+        for i, spec in enumerate(self.features):
+            column = matrix[:, i]
+            if "lab" in spec or "wbc_above" in spec or "crp_above" in spec:
+                column[:] = False
+                if "lab" in spec:
+                    column |= labs[spec["lab"]]
+                if "wbc_above" in spec:
+                    column |= wbc > spec["wbc_above"]
+                if "crp_above" in spec:
+                    column |= crp > spec["crp_above"]
+            else:
+                column[:] = symptoms[spec["symptom"]]
+                if "without_symptom" in spec:
+                    column &= ~symptoms[spec["without_symptom"]]
+                if "temperature_above" in spec:
+                    column &= temperature > spec["temperature_above"]
+                if "temperature_below" in spec:
+                    column &= temperature < spec["temperature_below"]
+        return matrix
+    
+    def crisis_flags(self, symptoms, bp_systolic, bp_diastolic):
+        # Показатели давления - массивы или числа (сравнение транслируется)
+        crisis_symptom = False
+        for s in self.crisis_symptoms:
+            crisis_symptom = crisis_symptom | symptoms[s]
+        return (bp_systolic > self.crisis_systolic) & (bp_diastolic > self.crisis_diastolic) & crisis_symptom
+    
+    def diagnose_batch(self, df):
+        import numpy as np
+        import pandas as pd
+        
+        features, crisis = self.feature_matrix(df)
+        scores = self.batch_scores(features)
+        
+        k = min(DIFFERENTIAL_SIZE, len(self.conditions))
+        order = self.batch_top(scores, k)
+        conditions = np.array(self.conditions, dtype=object)
+        ranked = conditions[order]
+        
+        result = pd.DataFrame(
+            scores, index=df.index, columns=[f"score_{c}" for c in self.conditions]
+        )
+        result["hypertensive_crisis"] = crisis
+        result["diagnosis"] = np.where(crisis, self.crisis_condition, ranked[:, 0])
+        result["score"] = np.where(crisis, self.crisis_score, np.take_along_axis(scores, order[:, :1], axis=1)[:, 0])
+        for i in range(1, DIFFERENTIAL_SIZE):
+            result[f"differential_{i}"] = np.where(crisis, None, ranked[:, i]) if i < k else None
+        return result
+
+# 🏎️ ПУТЬ ОДНОГО ПАЦИЕНТА
+def _compile_encoder(rules):
+    symptom_bits, lab_bits = rules.symptom_bits.get, rules.lab_bits.get
+    symptom_derived, lab_derived = rules.symptom_derived, rules.lab_derived
+    
+    def encode(symptoms, lab_data, temperature, wbc, crp):
+        # Маска признаков пациента (служебные биты симптомов выше числа признаков сохраняются)
+        mask = 0
+        for symptom in symptoms:
+            mask |= symptom_bits(symptom, 0)
+        labs = 0
+        for flag in lab_data:
+            labs |= lab_bits(flag, 0)
+        
+        for bit, needed, excluded, above, below in symptom_derived:
+            if mask & needed and not mask & excluded and above < temperature < below:
+                mask |= bit
+        for bit, lab, wbc_above, crp_above in lab_derived:
+            if labs & lab or wbc > wbc_above or crp > crp_above:
+                mask |= bit
+        return mask
+    return encode
+
+def _compile_lane_scorer(rules):
+    base, tables = rules.lane_base, rules.lane_tables
+    chunk_bits, chunk_mask = rules.chunk_bits, rules.chunk_mask
+    unpack, size = rules.lane_struct.unpack, rules.lane_struct.size
+    decode = rules.lane_decode.__getitem__
+    
+    def score_mask(mask):
+        packed = base
+        for table in tables:
+            packed += table[mask & chunk_mask]
+            mask >>= chunk_bits
+        return list(map(decode, sorted(unpack(packed.to_bytes(size, "little")), reverse=True)))
+    return score_mask
+
+def _compile_diagnose(rules):
+    encode, score_mask, rank = rules.encode, rules.score_mask, rules.rank
+    systolic, diastolic, crisis_mask = rules.crisis_systolic, rules.crisis_diastolic, rules.crisis_mask
+    crisis = (rules.crisis_condition, rules.crisis_score)
+    
+    def diagnose(symptoms, lab_data, temperature, bp_systolic, bp_diastolic, wbc, crp, top_k=None):
+        mask = encode(symptoms, lab_data, temperature, wbc, crp)
+        
+        # Проверяем критические состояния первыми
+        if bp_systolic > systolic and bp_diastolic > diastolic and mask & crisis_mask:
+            return crisis
+        
+        sorted_diagnoses = score_mask(mask) if top_k is None else rank(mask, top_k)
+        return sorted_diagnoses[0][0], sorted_diagnoses
+    return diagnose
+
+def _compile_canonical_key(rules):
+    # Ключ кэша диагнозов: маска признаков и симптомов криза (уже округлена
+    # до порогов правил - encode сравнивает показатели с порогами), флаг
+    # давления выше порога криза и top_k. Пациенты с одинаковым ключом
+    # получают одинаковый результат
+    encode = rules.encode
+    systolic, diastolic = rules.crisis_systolic, rules.crisis_diastolic
+    relevant = rules.feature_mask | rules.crisis_mask
+    
+    def canonical_key(symptoms, lab_data, temperature, bp_systolic, bp_diastolic, wbc, crp, top_k=None):
+        mask = encode(symptoms, lab_data, temperature, wbc, crp) & relevant
+        return mask, bp_systolic > systolic and bp_diastolic > diastolic, top_k
+    return canonical_key
+
+def _compile_decide(rules):
+    # Диагноз по уже вычисленной маске - для промаха кэша, чтобы не кодировать ввод второй раз
+    score_mask, rank, crisis_mask = rules.score_mask, rules.rank, rules.crisis_mask
+    crisis = (rules.crisis_condition, rules.crisis_score)
+    
+    def decide(mask, high_bp, top_k=None):
+        if high_bp and mask & crisis_mask:
+            return crisis
+        sorted_diagnoses = score_mask(mask) if top_k is None else rank(mask, top_k)
+        return sorted_diagnoses[0][0], sorted_diagnoses
+    return decide
+
+# 📂 ЗАГРУЗКА БАЗЫ ЗНАНИЙ
+def _read_source(path, data):
+    if path.endswith(".toml"):
+        import tomllib
+        return tomllib.loads(data.decode("utf-8"))
+    return json.loads(data)
+
+def read_knowledge_base(path):
+    # Исходный словарь базы знаний, без компиляции
+    with open(path, "rb") as f:
+        data = f.read()
+    try:
+        return _read_source(path, data)
+    except ValueError as exc:
+        raise KnowledgeBaseError(f"{path}: {exc}") from exc
+
+def _private_cache_dir(cache_dir):
+    # pickle исполняет код при чтении: кэшу доверяем, только если каталог
+    # принадлежит текущему пользователю и недоступен другим на запись
+    try:
+        os.makedirs(cache_dir, mode=0o700, exist_ok=True)
+        st = os.stat(cache_dir)
+    except OSError:
+        return False
+    if hasattr(os, "getuid") and (st.st_uid != os.getuid() or st.st_mode & 0o022):
+        log.warning("Кэш правил %s доступен на запись другим пользователям - не используется", cache_dir)
+        return False
+    return True
+
+def _drop_stale_cache(cache_dir, prefix, keep):
+    # На каждый файл базы знаний остается только кэш текущей версии
+    try:
+        names = os.listdir(cache_dir)
+    except OSError:
+        return
+    for name in names:
+        if name.startswith(prefix) and name.endswith(".pickle") and name != keep:
+            try:
+                os.remove(os.path.join(cache_dir, name))
+            except OSError:
+                pass
+
+def load_ruleset(path=None, cache_dir=None):
+    path = path or KB_PATH
+    cache_dir = KB_CACHE_DIR if cache_dir is None else cache_dir
+    with open(path, "rb") as f:
+        data = f.read()
+    fingerprint = hashlib.sha256(data + f"\0{COMPILER_VERSION}".encode()).hexdigest()[:16]
+    
+    # Скомпилированный набор правил берется из кэша по пути и хэшу содержимого файла
+    cache_path = None
+    if cache_dir and _private_cache_dir(cache_dir):
+        prefix = hashlib.sha256(os.path.abspath(path).encode()).hexdigest()[:16] + "-"
+        cache_name = f"{prefix}{fingerprint}.pickle"
+        cache_path = os.path.join(cache_dir, cache_name)
+    if cache_path and os.path.exists(cache_path):
+        try:
+            with open(cache_path, "rb") as f:
+                rules = pickle.load(f)
+            if isinstance(rules, RuleSet) and rules.fingerprint == fingerprint:
+                return rules
+        except Exception:
+            log.warning("Поврежденный кэш правил %s, компилируем заново", cache_path)
+    
+    try:
+        source = _read_source(path, data)
+    except ValueError as exc:
+        raise KnowledgeBaseError(f"{path}: {exc}") from exc
+    rules = RuleSet(source, fingerprint)
+    
+    if cache_path:
+        # Запись через временный файл: параллельные процессы не прочитают половину кэша
+        try:
+            tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as f:
+                pickle.dump(rules, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, cache_path)
+        except OSError:
+            pass
+        else:
+            _drop_stale_cache(cache_dir, prefix, cache_name)
+    return rules
+
+# 🔄 ГОРЯЧАЯ ПЕРЕЗАГРУЗКА
+# Активный набор правил - один объект, который подменяется целиком под
+# блокировкой. Вызов, уже получивший набор правил, доводит диагностику по
+# нему до конца; новые вызовы видят новую версию. Ошибочный файл не
+# ломает работу: ошибка пишется в лог, действуют прежние правила.
+#
+# Файл проверяет фоновый поток раз в KB_RELOAD_INTERVAL секунд (0 -
+# только явный reload_ruleset), поэтому get_ruleset на пути каждого вызова
+# - одно чтение словаря, без часов и блокировок. Поток запускается при
+# первой загрузке и заново - в дочернем процессе после fork.
+_active = {"rules": None, "stat": None}
+_reload_lock = threading.Lock()
+_listeners = []
+_watcher = {"thread": None}
+
+def _file_stat(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+def on_ruleset_change(callback):
+    # callback(rules) вызывается после каждой успешной подмены набора правил
+    _listeners.append(callback)
+    return callback
+
+def _watch():
+    while True:
+        time.sleep(KB_RELOAD_INTERVAL)
+        try:
+            reload_ruleset()
+        except Exception:
+            log.exception("Ошибка проверки базы знаний %s", KB_PATH)
+
+def _start_watcher():
+    if KB_RELOAD_INTERVAL > 0 and _watcher["thread"] is None:
+        _watcher["thread"] = threading.Thread(target=_watch, name="kb-reload", daemon=True)
+        _watcher["thread"].start()
+
+def _restart_watcher_after_fork():
+    # Потоки не переживают fork: дочернему процессу нужен свой
+    if _watcher["thread"] is not None:
+        _watcher["thread"] = None
+        _start_watcher()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_restart_watcher_after_fork)
+
+def reload_ruleset(force=False):
+    with _reload_lock:
+        stat = _file_stat(KB_PATH)
+        if not force and _active["rules"] is not None and stat == _active["stat"]:
+            return _active["rules"]
+        try:
+            rules = load_ruleset(KB_PATH)
+        except (OSError, KnowledgeBaseError) as exc:
+            if _active["rules"] is None:
+                raise
+            log.error("База знаний %s не загружена, действуют правила версии %s: %s",
+                      KB_PATH, _active["rules"].version, exc)
+            # Ту же версию файла повторно не разбираем
+            _active["stat"] = stat
+            return _active["rules"]
+        previous = _active["rules"]
+        _active["rules"], _active["stat"] = rules, stat
+    _start_watcher()
+    if previous is not None and previous.fingerprint != rules.fingerprint:
+        log.info("Загружены правила версии %s (%s)", rules.version, rules.fingerprint)
+        metrics.count("stewardship_ruleset_reloads_total")
+        for callback in list(_listeners):
+            callback(rules)
+    return rules
+
+def get_ruleset():
+    return _active["rules"] or reload_ruleset()
+
+def __getattr__(name):
+    # Прежние константы модуля отражают текущий набор правил
+    attributes = {
+        "MEDICAL_KNOWLEDGE_BASE": "knowledge_base",
+        "SYMPTOM_OPTIONS": "symptom_options",
+        "LAB_OPTIONS": "lab_options",
+        "SCORED_CONDITIONS": "conditions",
+        "SCORING_RULES": "scoring_rules",
+        "CRISIS_SYMPTOMS": "crisis_symptoms"
+    }
+    if name in attributes:
+        # Прежние константы были списками: отдаем копии, общий набор правил не меняется
+        value = getattr(get_ruleset(), attributes[name])
+        return list(value) if isinstance(value, tuple) else value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+# 🔍 ЭТАЛОННАЯ ДИАГНОСТИЧЕСКАЯ СИСТЕМА
+# Исходная поштучная реализация правил базы знаний версии 1.0.0. Рабочая
+# версия medical_diagnosis_system использует скомпилированный набор правил;
+# эта остается эталоном для проверки совпадения результатов и для бенчмарков.
+def medical_diagnosis_system_reference(symptoms, lab_data, vital_signs, temperature, bp_systolic, bp_diastolic, wbc, crp):
+    symptom_score = {}
+    
+    # Проверяем критические состояния первыми
+    if bp_systolic > 180 and bp_diastolic > 120:
+        if any(symptom in ["Головная боль", "Тошнота", "Нарушение зрения", "Одышка", "Боль в груди"] for symptom in symptoms):
+            return "hypertensive_crisis", 10
+    
+    # Определяем лабораторные показатели
+    has_leukocytosis = "Лейкоцитоз" in lab_data or wbc > 10.0
+    has_elevated_crp = "Повышение СРБ" in lab_data or crp > 5.0
+    has_urinary_leuko = "Лейкоциты в моче" in lab_data
+    
+    # Пневмония
+    pneumonia_score = sum([
+        2 if "Лихорадка >38°C" in symptoms and temperature > 38 else 0,
+        2 if "Кашель с мокротой" in symptoms else 1 if "Кашель" in symptoms else 0,
+        2 if "Одышка" in symptoms else 0,
+        2 if "Боль в груди" in symptoms else 0,
+        2 if has_leukocytosis else 0,
+        2 if has_elevated_crp else 0
+    ])
+    symptom_score["community_acquired_pneumonia"] = pneumonia_score
+    
+    # Ангина
+    pharyngitis_score = sum([
+        2 if "Боль в горле" in symptoms else 0,
+        2 if "Налеты на миндалинах" in symptoms else 0,
+        2 if "Лихорадка >38°C" in symptoms and temperature > 38 else 0,
+        2 if "Увеличение лимфоузлов" in symptoms else 0,
+        -2 if "Кашель" in symptoms else 1,
+        1 if "Головная боль" in symptoms else 0
+    ])
+    symptom_score["streptococcal_pharyngitis"] = pharyngitis_score
+    
+    # ИМП
+    uti_score = sum([
+        3 if "Дизурия" in symptoms else 0,
+        2 if "Учащенное мочеиспускание" in symptoms else 0,
+        2 if "Боль в надлобковой области" in symptoms else 0,
+        2 if has_urinary_leuko else 0,
+        2 if "Лихорадка >38°C" in symptoms and temperature > 38 else 0
+    ])
+    symptom_score["urinary_tract_infection"] = uti_score
+    
+    # Бронхит
+    bronchitis_score = sum([
+        2 if "Кашель" in symptoms else 0,
+        2 if "Кашель с мокротой" in symptoms else 0,
+        -2 if "Лихорадка >38°C" in symptoms and temperature > 38 else 1,
+        -2 if "Одышка" in symptoms else 1,
+        -2 if has_leukocytosis else 1,
+        1 if "Слабость" in symptoms else 0
+    ])
+    symptom_score["acute_bronchitis"] = bronchitis_score
+    
+    # Грипп
+    influenza_score = sum([
+        2 if "Лихорадка >38°C" in symptoms and temperature > 38 else 0,
+        2 if "Головная боль" in symptoms else 0,
+        2 if "Мышечные боли" in symptoms else 0,
+        2 if "Слабость" in symptoms else 0,
+        2 if "Внезапное начало" in symptoms else 0,
+        1 if "Сезонность" in symptoms else 0
+    ])
+    symptom_score["influenza"] = influenza_score
+    
+    # Гастроэнтерит
+    gastroenteritis_score = sum([
+        3 if "Тошнота" in symptoms else 0,
+        3 if "Рвота" in symptoms else 0,
+        3 if "Диарея" in symptoms else 0,
+        2 if "Боль в животе" in symptoms else 0,
+        1 if "Слабость" in symptoms else 0,
+        1 if "Субфебрильная температура" in symptoms and 37 < temperature < 38 else 0
+    ])
+    symptom_score["acute_gastroenteritis"] = gastroenteritis_score
+    
+    # Находим наиболее вероятный диагноз
+    sorted_diagnoses = sorted(symptom_score.items(), key=lambda x: x[1], reverse=True)
+    
+    return sorted_diagnoses[0][0], sorted_diagnoses
+
+
+def _flag_columns(df, names, list_column):
+    import numpy as np
+    import pandas as pd
+    
+    # Флаги берутся из одноименных булевых колонок и/или из колонки-списка
+    # ("symptoms" / "lab_data": список или строка через ";")
+    names = list(names)
+    # Все флаги - столбцы одной матрицы, чтобы колонка-список раскладывалась
+    # одним присваиванием при любом числе названий
+    matrix = np.zeros((len(df), len(names)), dtype=bool, order="F")
+    for i, name in enumerate(names):
+        if name in df.columns:
+            matrix[:, i] = df[name].fillna(False).astype(bool).to_numpy()
+    
+    if list_column in df.columns:
+        values = df[list_column].reset_index(drop=True).explode().dropna()
+        values = values.astype(str).str.split(";").explode().str.strip()
+        # Один проход по всем значениям: код названия -> номер колонки флагов
+        codes = pd.Categorical(values, categories=names).codes
+        found = codes >= 0
+        matrix[values.index.to_numpy()[found], codes[found]] = True
+    return dict(zip(names, matrix.T))
+
+
+# 📈 МЕТРИКИ
+def _record_diagnosis(result):
+    diagnosis, scores = result
+    metrics.count("stewardship_diagnoses_total", condition=diagnosis, source="single")
+    # Краткий путь гипертонического криза возвращает только итоговый балл
+    if isinstance(scores, int):
+        metrics.count("stewardship_crisis_short_circuits_total")
+
+def _record_batch(result):
+    metrics.count("stewardship_batch_rows_total", len(result))
+    metrics.count("stewardship_crisis_short_circuits_total", int(result["hypertensive_crisis"].sum()))
+    for diagnosis, n in result["diagnosis"].value_counts().items():
+        metrics.count("stewardship_diagnoses_total", int(n), condition=diagnosis, source="batch")
+
+metrics.describe("stewardship_diagnoses_total", "Поставленные диагнозы по состояниям")
+metrics.describe("stewardship_crisis_short_circuits_total", "Срабатывания краткого пути гипертонического криза")
+metrics.describe("stewardship_batch_rows_total", "Строки, оцененные пакетной диагностикой")
+metrics.describe("stewardship_ruleset_reloads_total", "Подмены набора правил без перезапуска")
+metrics.describe("stewardship_call_seconds", "Задержка вызовов диагностического движка")
+metrics.describe("stewardship_phase_seconds", "Длительность этапов интерфейса")
+metrics.start_exporter()
+
+# Журнал аудита диагнозов (STEWARDSHIP_AUDIT_DIR); None - журнал выключен
+AUDIT_LOG = audit_log.open_from_env()
+
+# 🔍 ДИАГНОСТИЧЕСКАЯ СИСТЕМА
+@metrics.instrument("medical_diagnosis_system", on_result=_record_diagnosis)
+def medical_diagnosis_system(symptoms, lab_data, vital_signs, temperature, bp_systolic, bp_diastolic, wbc, crp, top_k=None):
+    # top_k ограничивает ранжированный список первыми диагнозами - для крупных баз знаний.
+    # get_ruleset развернут: лишний вызов функции заметен на этом пути
+    rules = _active["rules"] or reload_ruleset()
+    result = rules.diagnose(symptoms, lab_data, temperature, bp_systolic, bp_diastolic, wbc, crp, top_k)
+    if AUDIT_LOG is not None:
+        AUDIT_LOG.append(rules, symptoms, lab_data, temperature, bp_systolic, bp_diastolic, wbc, crp, result)
+    return result
+
+@metrics.instrument("medical_diagnosis_batch", on_result=_record_batch)
+def medical_diagnosis_batch(df, rules=None):
+    # Входные колонки: temperature, bp_systolic, bp_diastolic, wbc, crp,
+    # симптомы и лабораторные флаги - как булевы колонки с названием симптома
+    # или как колонки "symptoms" / "lab_data".
+    # Результат совпадает с medical_diagnosis_system построчно: при
+    # гипертоническом кризе diagnosis = "hypertensive_crisis", score = 10,
+    # дифференциальный ряд пуст.
+    return (rules or get_ruleset()).diagnose_batch(df)
+
+def batch_weights():
+    return get_ruleset().batch_weights()
+
+def encode_patient(symptoms, lab_data, temperature, wbc, crp):
+    return get_ruleset().encode(symptoms, lab_data, temperature, wbc, crp)
+
+def score_mask(mask):
+    return get_ruleset().score_mask(mask)
+
+def antibiotics_indicated(condition):
+    return get_ruleset().antibiotics_indicated(condition)
+
+def treatment_categories(condition):
+    return get_ruleset().treatment_categories(condition)
+
+# 💾 LRU-КЭШ ДИАГНОЗОВ
+# Реальные обращения повторяются: несколько типичных наборов симптомов и
+# показатели в узких диапазонах. Ключ кэша - набор правил и каноническая
+# форма ввода: маска признаков из encode (показатели в ней уже округлены
+# ровно до порогов правил), флаг давления криза и top_k. Пациенты с
+# одинаковым ключом всегда получают одинаковый результат, поэтому повторный
+# профиль не пересчитывается, а при промахе маска не кодируется заново.
+# Попадание обходится в кодирование ввода без оценки и сортировки баллов;
+# сам LRU - functools.lru_cache (поиск и порядок на C, без блокировки на
+# уровне Python). При смене правил кэш очищается.
+DEFAULT_CACHE_SIZE = int(os.environ.get("STEWARDSHIP_DIAGNOSIS_CACHE_SIZE", "4096"))
+
+def canonical_key(symptoms, lab_data, temperature, bp_systolic, bp_diastolic, wbc, crp, top_k=None):
+    return get_ruleset().canonical_key(symptoms, lab_data, temperature, bp_systolic, bp_diastolic, wbc, crp, top_k)
+
+def _decide(decide, mask, high_bp, top_k):
+    # decide набора правил входит в ключ: результаты разных версий правил не смешиваются
+    return decide(mask, high_bp, top_k)
+
+class DiagnosisCache:
+    def __init__(self, maxsize=DEFAULT_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._decide = functools.lru_cache(maxsize=maxsize)(_decide)
+    
+    def diagnose(self, symptoms, lab_data, vital_signs, temperature, bp_systolic, bp_diastolic, wbc, crp, top_k=None):
+        # Та же сигнатура и тот же результат, что у medical_diagnosis_system
+        return self.lookup(get_ruleset(), symptoms, lab_data, temperature, bp_systolic, bp_diastolic, wbc, crp, top_k)
+    
+    def lookup(self, rules, symptoms, lab_data, temperature, bp_systolic, bp_diastolic, wbc, crp, top_k=None):
+        mask, high_bp, top_k = rules.canonical_key(symptoms, lab_data, temperature, bp_systolic, bp_diastolic, wbc, crp, top_k)
+        diagnosis, scores = self._decide(rules.decide, mask, high_bp, top_k)
+        # Список баллов копируется, чтобы вызывающий код не испортил кэш
+        return diagnosis, scores if scores.__class__ is int else scores[:]
+    
+    def lookup_many(self, rules, calls):
+        # calls - кортежи (symptoms, lab_data, temperature, bp_systolic,
+        # bp_diastolic, wbc, crp, top_k); одинаковые ключи пакета оцениваются один раз
+        cached, canonical_key, decide = self._decide, rules.canonical_key, rules.decide
+        results = []
+        for call in calls:
+            diagnosis, scores = cached(decide, *canonical_key(*call))
+            results.append((diagnosis, scores if scores.__class__ is int else scores[:]))
+        return results
+    
+    def clear(self):
+        self._decide.cache_clear()
+    
+    def stats(self):
+        info = self._decide.cache_info()
+        total = info.hits + info.misses
+        return {
+            "hits": info.hits,
+            "misses": info.misses,
+            # Каждый промах добавляет запись; все, что не осталось в кэше, вытеснено
+            "evictions": info.misses - info.currsize,
+            "size": info.currsize,
+            "maxsize": self.maxsize,
+            "hit_rate": info.hits / total if total else 0.0
+        }
+
+DIAGNOSIS_CACHE = DiagnosisCache()
+on_ruleset_change(lambda rules: DIAGNOSIS_CACHE.clear())
+
+@metrics.instrument("cached_medical_diagnosis_system", on_result=_record_diagnosis)
+def cached_medical_diagnosis_system(symptoms, lab_data, vital_signs, temperature, bp_systolic, bp_diastolic, wbc, crp, top_k=None,
+                                    rules=None):
+    # rules - набор правил, которым вызывающий код потом выводит результат
+    # (названия, лечение, версия): фоновая перезагрузка может подменить
+    # действующий набор между оценкой и выводом
+    rules = rules or _active["rules"] or reload_ruleset()
+    result = DIAGNOSIS_CACHE.lookup(rules, symptoms, lab_data, temperature, bp_systolic, bp_diastolic, wbc, crp, top_k)
+    # В журнал попадает каждый выданный диагноз, в том числе из кэша
+    if AUDIT_LOG is not None:
+        AUDIT_LOG.append(rules, symptoms, lab_data, temperature, bp_systolic, bp_diastolic, wbc, crp, result)
+    return result
+
+def _record_many(results):
+    for result in results:
+        _record_diagnosis(result)
+
+@metrics.instrument("cached_medical_diagnosis_many", on_result=_record_many)
+def cached_medical_diagnosis_many(encounters, rules=None):
+    # Пакет вызовов cached_medical_diagnosis_system (кортежи ее аргументов
+    # вместе с top_k) -> результаты в том же порядке. Набор правил берется
+    # один раз на пакет
+    rules = rules or get_ruleset()
+    calls = [(s, l, t, sys_, dia, w, c, top_k) for s, l, _, t, sys_, dia, w, c, top_k in encounters]
+    results = DIAGNOSIS_CACHE.lookup_many(rules, calls)
+    if AUDIT_LOG is not None:
+        for call, result in zip(calls, results):
+            AUDIT_LOG.append(rules, *call[:7], result)
+    return results
@@ -0,0 +1,549 @@
+# 🔥 ПОТОКОВЫЙ ПРИЕМ FHIR
+# Диагностика обращений из FHIR JSON (R4): бандлы любого размера, NDJSON
+# из бандлов или отдельных ресурсов, в том числе .gz. Файл читается
+# кусками, и каждая запись entry разбирается отдельно (json raw_decode по
+# буферу), поэтому в памяти никогда не бывает всего бандла - только
+# текущий кусок и незавершенные обращения.
+#
+#   python fhir_ingest.py bundle.json -o scored.parquet
+#   python fhir_ingest.py export.ndjson.gz -o scored.csv --batch 20000
+#   python fhir_ingest.py bundle.json -o scored.csv --mapping codes.json
+#
+# Ресурсы собираются в обращения по ссылке encounter (без нее - по
+# пациенту и дате) и переводятся в ввод medical_diagnosis_system:
+# - Observation с кодом LOINC - температура, давление (в том числе панель
+#   85354-9 с компонентами), лейкоциты, СРБ (единицы приводятся к °C,
+#   ×10⁹/л и мг/л) и качественные анализы мочи (положительный результат -
+#   флаг анализа);
+# - Condition и Observation с кодом SNOMED CT - симптомы словаря.
+# Ошибочные и отмененные наблюдения, опровергнутые и разрешенные состояния
+# пропускаются. Если показатель измерен несколько раз, берется последнее
+# измерение; неизмеренный показатель остается пустым и не превышает ни
+# одного порога. Обращения без единого симптома не оцениваются (как и в
+# форме интерфейса).
+#
+# Таблицы кодов дополняются или заменяются файлом --mapping:
+#   {"vitals": {"LOINC": "temperature|bp_systolic|bp_diastolic|wbc|crp"},
+#    "labs": {"LOINC": "название анализа"}, "symptoms": {"SNOMED": "название симптома"}}
+# (значение null удаляет код из таблицы по умолчанию).
+#
+# Симптомы правил, для которых в таблице нет ни одного кода (в таблице по
+# умолчанию - налеты на миндалинах, боль в надлобковой области, внезапное
+# начало, сезонность, субфебрильная температура, нарушение зрения), из FHIR
+# не придут, и баллы зависящих от них состояний будут систематически
+# занижены. Поэтому без кодов для них прием не запускается: коды
+# добавляются через --mapping (по справочнику SNOMED CT своей МИС). С
+# --allow-uncoded прием идет, но в каждую строку результата пишется колонка
+# uncoded_symptoms со списком таких симптомов.
+#
+# Измерения в единицах, которых нет в UNIT_CONVERSIONS и UNIT_ALIASES,
+# пропускаются (показатель остается неизмеренным) и перечисляются в конце
+# работы: значение в неизвестной единице нельзя сравнивать с порогами.
+#
+# Обращение считается завершенным в конце бандла верхнего уровня или когда
+# незавершенных больше --max-open (вытесняется давно не обновлявшееся).
+# Ресурсы одного обращения должны поэтому идти не дальше --max-open
+# обращений друг от друга - так устроены бандлы по пациенту и по обращению.
+# Ключи последних вытесненных обращений запоминаются (до
+# EVICTED_MEMORY x --max-open): если ресурс такого обращения приходит
+# позже, обращение оценено частями - это считается и выводится как
+# предупреждение с советом увеличить --max-open.
+# Готовые обращения оцениваются пакетами по --batch (medical_diagnosis_batch)
+# и дописываются в CSV или Parquet; в stderr - ресурсы и обращения в секунду.
+# Все пакеты оцениваются одним набором правил, загруженным при запуске.
+import argparse
+import collections
+import gzip
+import json
+import re
+import sys
+import time
+
+import pandas as pd
+
+from diagnosis_engine import load_ruleset
+from score_encounters import open_sink, score_chunk
+
+READ_SIZE = 1 << 20
+DEFAULT_BATCH = 10_000
+DEFAULT_MAX_OPEN = 10_000
+EVICTED_MEMORY = 10
+WHITESPACE = re.compile(r"\s*")
+DECODER = json.JSONDecoder()
+
+LOINC = "http://loinc.org"
+SNOMED = "http://snomed.info/sct"
+VITAL_COLUMNS = ["temperature", "bp_systolic", "bp_diastolic", "wbc", "crp"]
+
+VITAL_CODES = {
+    "8310-5": "temperature",   # Body temperature
+    "8331-1": "temperature",   # Oral temperature
+    "8480-6": "bp_systolic",
+    "8462-4": "bp_diastolic",
+    "6690-2": "wbc",           # Leukocytes, automated count
+    "26464-8": "wbc",          # Leukocytes in blood
+    "1988-5": "crp",           # C reactive protein
+    "30522-7": "crp"           # C reactive protein, high sensitivity
+}
+# Панели давления: значения - в компонентах 8480-6 и 8462-4
+PANEL_CODES = {"85354-9", "55284-4"}
+LAB_CODES = {
+    "5799-2": "Лейкоциты в моче",   # Leukocyte esterase, urine test strip
+    "5802-4": "Нитриты в моче"      # Nitrite, urine test strip
+}
+SYMPTOM_CODES = {
+    "386661006": "Лихорадка >38°C",
+    "43724002": "Озноб",
+    "49727002": "Кашель",
+    "28743005": "Кашель с мокротой",
+    "267036007": "Одышка",
+    "29857009": "Боль в груди",
+    "162397003": "Боль в горле",
+    "30746006": "Увеличение лимфоузлов",
+    "49650001": "Дизурия",
+    "162116003": "Учащенное мочеиспускание",
+    "422587007": "Тошнота",
+    "422400008": "Рвота",
+    "62315008": "Диарея",
+    "21522001": "Боль в животе",
+    "25064002": "Головная боль",
+    "68962001": "Мышечные боли",
+    "13791008": "Слабость",
+    "84229001": "Слабость"
+}
+# (показатель, единица UCUM) -> (множитель, сдвиг) к единицам движка;
+# единицы движка - с множителем 1 и без сдвига. Измерение без единицы
+# считается в единицах движка
+UNIT_CONVERSIONS = {
+    ("temperature", "Cel"): (1.0, 0.0),
+    ("temperature", "[degF]"): (5 / 9, -32 * 5 / 9),
+    ("temperature", "K"): (1.0, -273.15),
+    ("bp_systolic", "mm[Hg]"): (1.0, 0.0),
+    ("bp_diastolic", "mm[Hg]"): (1.0, 0.0),
+    ("wbc", "10*9/L"): (1.0, 0.0),
+    ("wbc", "10*3/uL"): (1.0, 0.0),
+    ("wbc", "10*3/mm3"): (1.0, 0.0),
+    ("wbc", "/uL"): (1e-3, 0.0),
+    ("wbc", "/mm3"): (1e-3, 0.0),
+    ("crp", "mg/L"): (1.0, 0.0),
+    ("crp", "mg/dL"): (10.0, 0.0)
+}
+# Распространенные написания вне UCUM (поле unit) -> код UCUM
+UNIT_ALIASES = {
+    "°C": "Cel", "C": "Cel", "degC": "Cel",
+    "°F": "[degF]", "F": "[degF]", "degF": "[degF]",
+    "mmHg": "mm[Hg]",
+    "10^9/L": "10*9/L", "x10^9/L": "10*9/L", "10^3/uL": "10*3/uL", "K/uL": "10*3/uL", "cells/uL": "/uL"
+}
+POSITIVE_INTERPRETATIONS = {"POS", "DET", "A", "AA", "H", "HH"}
+POSITIVE_VALUES = {"10828004", "260373001", "52101004"}   # Positive, Detected, Present
+SKIPPED_OBSERVATIONS = {"entered-in-error", "cancelled"}
+SKIPPED_CONDITIONS = {"refuted", "entered-in-error", "inactive", "resolved", "remission"}
+
+
+# 📥 ПОТОКОВЫЙ РАЗБОР
+class JsonStream:
+    # Буфер текста поверх файла: значения JSON разбираются с текущей позиции,
+    # при нехватке данных буфер дочитывается (с ростом порции, чтобы одно
+    # огромное значение не разбиралось заново на каждом мегабайте)
+    def __init__(self, source):
+        self.source = source
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+
+    def fill(self, size=READ_SIZE):
+        if self.eof:
+            return False
+        chunk = self.source.read(max(size, READ_SIZE))
+        if not chunk:
+            self.eof = True
+            return False
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self):
+        # Следующий значащий символ ("" - конец файла)
+        while True:
+            self.pos = WHITESPACE.match(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self.fill():
+                return ""
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise ValueError(f"FHIR JSON: ожидался '{char}', найдено {self.buffer[self.pos:self.pos + 40]!r}")
+        self.pos += 1
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                value, end = DECODER.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if not self.fill(len(self.buffer) - self.pos):
+                    raise
+                continue
+            # Число в самом конце буфера может быть обрезано - дочитываем
+            if end == len(self.buffer) and self.fill():
+                continue
+            self.pos = end
+            return value
+
+
+def _entry_resources(entry):
+    resource = entry.get("resource") if isinstance(entry, dict) else None
+    if not isinstance(resource, dict):
+        return
+    if resource.get("resourceType") == "Bundle":
+        for nested in resource.get("entry", []):
+            yield from _entry_resources(nested)
+    else:
+        yield resource
+
+
+def iter_resources(stream):
+    # Ресурсы всех значений верхнего уровня (бандлы, ресурсы NDJSON) по
+    # одному; None - конец бандла верхнего уровня. Массив entry бандла
+    # читается поэлементно, остальные ключи - целиком (они небольшие)
+    while stream.peek():
+        stream.expect("{")
+        top = {}
+        while stream.peek() != "}":
+            if top:
+                stream.expect(",")
+            key = stream.value()
+            stream.expect(":")
+            if key == "entry" and stream.peek() == "[":
+                stream.pos += 1
+                first = True
+                while stream.peek() != "]":
+                    if not first:
+                        stream.expect(",")
+                    first = False
+                    yield from _entry_resources(stream.value())
+                stream.pos += 1
+                top[key] = None
+            else:
+                top[key] = stream.value()
+        stream.pos += 1
+        if top.get("resourceType") == "Bundle":
+            yield None
+        else:
+            yield top
+
+
+def open_input(path):
+    if path == "-":
+        return sys.stdin
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8")
+    return open(path, encoding="utf-8")
+
+
+# 🗺️ ТАБЛИЦЫ КОДОВ
+def load_mapping(path=None, rules=None, log=sys.stderr):
+    mapping = {"vitals": dict(VITAL_CODES), "labs": dict(LAB_CODES), "symptoms": dict(SYMPTOM_CODES)}
+    if path:
+        with open(path, encoding="utf-8") as f:
+            overrides = json.load(f)
+        for table, codes in overrides.items():
+            if table not in mapping:
+                raise ValueError(f"{path}: неизвестная таблица кодов {table!r} (ожидается vitals, labs или symptoms)")
+            for code, name in codes.items():
+                if name is None:
+                    mapping[table].pop(str(code), None)
+                else:
+                    mapping[table][str(code)] = name
+    unknown = set(mapping["vitals"].values()) - set(VITAL_COLUMNS)
+    if unknown:
+        raise ValueError(f"Неизвестные показатели в таблице кодов: {sorted(unknown)}")
+    if rules is not None:
+        # Названия вне словаря движок молча пропустит - предупреждаем сразу
+        for table, vocabulary in (("labs", rules.lab_bits), ("symptoms", rules.symptom_bits)):
+            missing = set(mapping[table].values()) - set(vocabulary)
+            if missing:
+                print(f"предупреждение: нет в словаре базы знаний ({table}): {sorted(missing)}", file=log)
+    return mapping
+
+
+def uncoded_symptoms(mapping, rules):
+    # Симптомы правил, которые нельзя получить из FHIR: ни одного кода в таблице
+    return sorted(rules.rule_symptoms - set(mapping["symptoms"].values()))
+
+
+def affected_conditions(rules, symptoms):
+    # Состояния, баллы которых зависят от этих симптомов (и криз, если среди них его симптомы)
+    symptoms = set(symptoms)
+    features = {
+        spec["name"] for spec in rules.features
+        if spec.get("symptom") in symptoms or spec.get("without_symptom") in symptoms
+    }
+    affected = [c for c in rules.conditions if any(rules.scoring_rules[c]["weights"].get(f) for f in features)]
+    if symptoms.intersection(rules.crisis_symptoms):
+        affected.append(rules.crisis_condition)
+    return affected
+
+
+def _reference_id(reference):
+    # "Encounter/123", "https://host/fhir/Encounter/123", "urn:uuid:..." -> идентификатор
+    if not reference:
+        return None
+    if reference.startswith("urn:uuid:"):
+        return reference[len("urn:uuid:"):]
+    return reference.rstrip("/").rsplit("/", 1)[-1]
+
+
+def _codes(concept, system):
+    return [c.get("code") for c in (concept or {}).get("coding", []) if c.get("system") == system]
+
+
+def _quantity(holder, vital, unknown_units):
+    quantity = holder.get("valueQuantity")
+    if not isinstance(quantity, dict) or not isinstance(quantity.get("value"), (int, float)):
+        return None
+    unit = quantity.get("code") or quantity.get("unit")
+    if not unit:
+        return quantity["value"]
+    conversion = UNIT_CONVERSIONS.get((vital, UNIT_ALIASES.get(unit, unit)))
+    if conversion is None:
+        unknown_units[(vital, unit)] += 1
+        return None
+    # Округление убирает хвосты двоичной арифметики: 100.4 °F - ровно 38 °C,
+    # а не 38.00000000000001, который уже выше порога лихорадки
+    scale, shift = conversion
+    return round(quantity["value"] * scale + shift, 6)
+
+
+def _is_positive(observation):
+    if observation.get("valueBoolean") is True:
+        return True
+    if str(observation.get("valueString", "")).strip().lower() in ("positive", "pos", "+", "обнаружено"):
+        return True
+    if set(_codes(observation.get("valueCodeableConcept"), SNOMED)) & POSITIVE_VALUES:
+        return True
+    quantity = observation.get("valueQuantity")
+    if isinstance(quantity, dict) and isinstance(quantity.get("value"), (int, float)) and quantity["value"] > 0:
+        return True
+    return any(
+        coding.get("code") in POSITIVE_INTERPRETATIONS
+        for concept in observation.get("interpretation", []) for coding in concept.get("coding", [])
+    )
+
+
+# 🧩 СБОРКА ОБРАЩЕНИЙ
+class EncounterAssembler:
+    # Незавершенные обращения в порядке последнего обновления; готовые -
+    # словари в формате входа medical_diagnosis_batch
+    def __init__(self, mapping, max_open=DEFAULT_MAX_OPEN):
+        self.vitals = mapping["vitals"]
+        self.labs = mapping["labs"]
+        self.symptoms = mapping["symptoms"]
+        self.max_open = max_open
+        self.open = collections.OrderedDict()
+        # Ключи вытесненных обращений - в порядке вытеснения, последние
+        # EVICTED_MEMORY * max_open
+        self.evicted = collections.OrderedDict()
+        self.ready = []
+        self.skipped = 0
+        self.reopened = 0
+        self.unknown_units = collections.Counter()
+
+    def _record(self, resource, date, encounter=None):
+        link = resource.get("encounter") or resource.get("context") or {}
+        encounter = encounter or _reference_id(link.get("reference"))
+        patient = _reference_id((resource.get("subject") or resource.get("patient") or {}).get("reference"))
+        key = encounter or f"{patient}|{(date or '')[:10]}"
+        record = self.open.get(key)
+        if record is None:
+            if self.evicted.pop(key, False):
+                # Часть этого обращения уже оценена отдельной строкой
+                self.reopened += 1
+            record = self.open[key] = {
+                "encounter_id": key, "patient_id": patient, "encounter_date": (date or "")[:10] or None,
+                "symptoms": set(), "lab_data": set(), "measured": {}
+            }
+            if len(self.open) > self.max_open:
+                self._evict()
+        else:
+            self.open.move_to_end(key)
+            record["patient_id"] = record["patient_id"] or patient
+            record["encounter_date"] = record["encounter_date"] or (date or "")[:10] or None
+        return record
+
+    def _evict(self):
+        key, record = self.open.popitem(last=False)
+        self._finish(record)
+        self.evicted[key] = True
+        if len(self.evicted) > EVICTED_MEMORY * self.max_open:
+            self.evicted.popitem(last=False)
+
+    def _measure(self, record, vital, value, effective):
+        # Последнее по времени измерение; без времени - последнее в файле
+        previous = record["measured"].get(vital)
+        if value is not None and (previous is None or (effective or "") >= previous[0]):
+            record["measured"][vital] = (effective or "", value)
+
+    def add(self, resource):
+        kind = resource.get("resourceType")
+        if kind == "Observation":
+            self._observation(resource)
+        elif kind == "Condition":
+            self._condition(resource)
+        elif kind == "Encounter":
+            period = resource.get("period") or {}
+            record = self._record(resource, period.get("start"), encounter=resource.get("id"))
+            if period.get("start"):
+                record["encounter_date"] = period["start"][:10]
+
+    def _observation(self, observation):
+        if observation.get("status") in SKIPPED_OBSERVATIONS:
+            return
+        effective = (observation.get("effectiveDateTime") or (observation.get("effectivePeriod") or {}).get("start")
+                     or observation.get("issued"))
+        code = observation.get("code")
+        loinc = _codes(code, LOINC)
+        symptoms = [self.symptoms[c] for c in _codes(code, SNOMED) if c in self.symptoms]
+        panel = PANEL_CODES.intersection(loinc)
+        vitals = [self.vitals[c] for c in loinc if c in self.vitals]
+        labs = [self.labs[c] for c in loinc if c in self.labs]
+        if not (symptoms or panel or vitals or labs):
+            return
+        record = self._record(observation, effective)
+        for vital in vitals:
+            self._measure(record, vital, _quantity(observation, vital, self.unknown_units), effective)
+        if panel:
+            for component in observation.get("component", []):
+                for c in _codes(component.get("code"), LOINC):
+                    if c in self.vitals:
+                        vital = self.vitals[c]
+                        self._measure(record, vital, _quantity(component, vital, self.unknown_units), effective)
+        if labs and _is_positive(observation):
+            record["lab_data"].update(labs)
+        if symptoms and observation.get("valueBoolean") is not False:
+            record["symptoms"].update(symptoms)
+
+    def _condition(self, condition):
+        statuses = _codes(condition.get("clinicalStatus"), "http://terminology.hl7.org/CodeSystem/condition-clinical")
+        statuses += _codes(condition.get("verificationStatus"), "http://terminology.hl7.org/CodeSystem/condition-ver-status")
+        if SKIPPED_CONDITIONS.intersection(statuses):
+            return
+        symptoms = [self.symptoms[c] for c in _codes(condition.get("code"), SNOMED) if c in self.symptoms]
+        if symptoms:
+            onset = condition.get("onsetDateTime") or condition.get("recordedDate")
+            self._record(condition, onset)["symptoms"].update(symptoms)
+
+    def _finish(self, record):
+        # Без симптомов форма интерфейса диагноз не ставит - и здесь тоже
+        if not record["symptoms"]:
+            self.skipped += 1
+            return
+        row = {
+            "encounter_id": record["encounter_id"], "patient_id": record["patient_id"],
+            "encounter_date": record["encounter_date"],
+            "symptoms": ";".join(sorted(record["symptoms"])), "lab_data": ";".join(sorted(record["lab_data"]))
+        }
+        for vital in VITAL_COLUMNS:
+            row[vital] = record["measured"][vital][1] if vital in record["measured"] else None
+        self.ready.append(row)
+
+    def flush(self):
+        while self.open:
+            self._finish(self.open.popitem(last=False)[1])
+
+    def take(self):
+        ready, self.ready = self.ready, []
+        return ready
+
+
+# 🚀 КОНВЕЙЕР
+KEEP_COLUMNS = ["encounter_id", "patient_id", "encounter_date", "symptoms", "lab_data"] + VITAL_COLUMNS
+
+
+def _frame(rows):
+    frame = pd.DataFrame(rows, columns=KEEP_COLUMNS)
+    frame[VITAL_COLUMNS] = frame[VITAL_COLUMNS].astype(float)
+    return frame
+
+
+def run(stream, assembler, sink, rules, batch=DEFAULT_BATCH, uncoded=(), log=sys.stderr):
+    resources = encounters = 0
+    started = time.perf_counter()
+
+    def write(rows):
+        nonlocal encounters
+        frame = score_chunk(_frame(rows), KEEP_COLUMNS, rules)
+        if uncoded:
+            # Результат неполон - это видно в самих данных, а не только в stderr
+            frame["uncoded_symptoms"] = ";".join(uncoded)
+        sink.write(frame)
+        encounters += len(rows)
+        elapsed = time.perf_counter() - started
+        print(f"ресурсов {resources:,} ({resources / elapsed:,.0f}/с), оценено обращений {encounters:,} "
+              f"({encounters / elapsed:,.0f}/с)", file=log)
+
+    try:
+        for resource in iter_resources(stream):
+            if resource is None:
+                assembler.flush()
+            else:
+                resources += 1
+                assembler.add(resource)
+            if len(assembler.ready) >= batch:
+                write(assembler.take())
+        assembler.flush()
+        if assembler.ready:
+            write(assembler.take())
+    finally:
+        sink.close()
+    return resources, encounters, time.perf_counter() - started
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Потоковая диагностика обращений из FHIR JSON (бандлы, NDJSON)")
+    parser.add_argument("input", help="FHIR JSON: бандл, NDJSON или .gz ('-' - stdin)")
+    parser.add_argument("-o", "--output", required=True, help="выходной файл .csv или .parquet ('-' - stdout, CSV)")
+    parser.add_argument("--output-format", choices=["csv", "parquet"])
+    parser.add_argument("--mapping", help="JSON с дополнительными кодами LOINC/SNOMED")
+    parser.add_argument("--batch", type=int, default=DEFAULT_BATCH, help="обращений в одном пакете оценки")
+    parser.add_argument("--max-open", type=int, default=DEFAULT_MAX_OPEN,
+                        help="незавершенных обращений в памяти, дальше вытесняются давние")
+    parser.add_argument("--allow-uncoded", action="store_true",
+                        help="оценивать, даже если у симптомов правил нет кодов SNOMED (колонка uncoded_symptoms)")
+    args = parser.parse_args(argv)
+
+    try:
+        rules = load_ruleset()
+    except (OSError, ValueError) as exc:
+        sys.exit(f"База знаний: {exc}")
+    try:
+        mapping = load_mapping(args.mapping, rules)
+    except (OSError, ValueError) as exc:
+        sys.exit(f"Таблица кодов: {exc}")
+    uncoded = uncoded_symptoms(mapping, rules)
+    if uncoded:
+        message = (f"у симптомов правил нет кодов SNOMED, из FHIR они не придут: {', '.join(uncoded)}; "
+                   f"занижены баллы: {', '.join(affected_conditions(rules, uncoded))}")
+        if not args.allow_uncoded:
+            sys.exit(f"Таблица кодов: {message}. Добавьте коды через --mapping или запустите с --allow-uncoded")
+        print(f"предупреждение: {message} (отмечено в колонке uncoded_symptoms)", file=sys.stderr)
+    output_format = args.output_format or ("parquet" if args.output.lower().endswith(".parquet") else "csv")
+    sink = open_sink(args.output, output_format)
+    assembler = EncounterAssembler(mapping, args.max_open)
+    with open_input(args.input) as source:
+        resources, encounters, elapsed = run(JsonStream(source), assembler, sink, rules, args.batch, uncoded)
+    print(f"готово: {resources:,} ресурсов, {encounters:,} обращений ({assembler.skipped:,} без симптомов "
+          f"пропущено) за {elapsed:.1f} с, {resources / max(elapsed, 1e-9):,.0f} ресурсов/с -> {args.output}",
+          file=sys.stderr)
+    if assembler.reopened:
+        print(f"предупреждение: {assembler.reopened:,} обращений получили ресурсы после вытеснения и оценены "
+              f"частями - увеличьте --max-open", file=sys.stderr)
+    if assembler.unknown_units:
+        units = ", ".join(f"{vital} [{unit}]: {n:,}" for (vital, unit), n in assembler.unknown_units.most_common())
+        print(f"предупреждение: пропущены измерения в неизвестных единицах - {units}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
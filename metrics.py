@@ -0,0 +1,202 @@
+# 📈 МЕТРИКИ ДИАГНОСТИЧЕСКОГО ДВИЖКА
+# Опциональная инструментация: счетчики и гистограммы задержек в формате
+# Prometheus. Включается переменной окружения STEWARDSHIP_METRICS=1;
+# экспорт - текстовым файлом (STEWARDSHIP_METRICS_FILE, для node_exporter
+# textfile collector) и/или HTTP-эндпоинтом /metrics (STEWARDSHIP_METRICS_PORT).
+#
+# Когда метрики выключены, instrument() возвращает функцию без обертки,
+# а phase() - один и тот же пустой контекстный менеджер, так что накладные
+# расходы сводятся к одному вызову функции.
+import atexit
+import bisect
+import contextlib
+import os
+import threading
+import time
+
+ENABLED = os.environ.get("STEWARDSHIP_METRICS", "").lower() in ("1", "true", "yes", "on")
+TEXTFILE = os.environ.get("STEWARDSHIP_METRICS_FILE")
+PORT = os.environ.get("STEWARDSHIP_METRICS_PORT")
+TEXTFILE_INTERVAL = float(os.environ.get("STEWARDSHIP_METRICS_INTERVAL", "15"))
+
+LATENCY_BUCKETS = (
+    0.000005, 0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005,
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0
+)
+
+_lock = threading.Lock()
+_counters = {}
+_histograms = {}
+_help = {}
+_NULL_PHASE = contextlib.nullcontext()
+_exporter_started = False
+
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+def describe(name, text):
+    _help[name] = text
+
+
+def count(name, value=1, **labels):
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def observe(name, seconds, **labels):
+    key = _key(name, labels)
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = [[0] * (len(LATENCY_BUCKETS) + 1), 0.0, 0]
+        histogram[0][bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        histogram[1] += seconds
+        histogram[2] += 1
+
+
+class _Phase:
+    __slots__ = ("labels", "started")
+    
+    def __init__(self, labels):
+        self.labels = labels
+    
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+    
+    def __exit__(self, *exc):
+        observe("stewardship_phase_seconds", time.perf_counter() - self.started, **self.labels)
+        return False
+
+
+def phase(name):
+    # Замер этапа main(): with metrics.phase("render"): ...
+    if not ENABLED:
+        return _NULL_PHASE
+    return _Phase({"phase": name})
+
+
+def instrument(name, on_result=None):
+    # Декоратор: гистограмма задержки stewardship_call_seconds{function=name}
+    # и, при необходимости, обработка результата (например, счетчики диагнозов)
+    def decorate(func):
+        if not ENABLED:
+            return func
+        clock = time.perf_counter
+        
+        def wrapper(*args, **kwargs):
+            started = clock()
+            result = func(*args, **kwargs)
+            observe("stewardship_call_seconds", clock() - started, function=name)
+            if on_result is not None:
+                on_result(result)
+            return result
+        
+        wrapper.__name__ = func.__name__
+        wrapper.__doc__ = func.__doc__
+        wrapper.__wrapped__ = func
+        return wrapper
+    return decorate
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels, extra=()):
+    items = list(labels) + list(extra)
+    if not items:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in items) + "}"
+
+
+def render_prometheus():
+    with _lock:
+        counters = dict(_counters)
+        histograms = {k: (list(v[0]), v[1], v[2]) for k, v in _histograms.items()}
+    
+    lines = []
+    seen = set()
+    for (name, labels), value in sorted(counters.items()):
+        if name not in seen:
+            seen.add(name)
+            if name in _help:
+                lines.append(f"# HELP {name} {_help[name]}")
+            lines.append(f"# TYPE {name} counter")
+        lines.append(f"{name}{_format_labels(labels)} {value}")
+    
+    for (name, labels), (buckets, total, n) in sorted(histograms.items()):
+        if name not in seen:
+            seen.add(name)
+            if name in _help:
+                lines.append(f"# HELP {name} {_help[name]}")
+            lines.append(f"# TYPE {name} histogram")
+        cumulative = 0
+        for bound, hits in zip(LATENCY_BUCKETS + (float("inf"),), buckets):
+            cumulative += hits
+            le = "+Inf" if bound == float("inf") else repr(bound)
+            lines.append(f"{name}_bucket{_format_labels(labels, [('le', le)])} {cumulative}")
+        lines.append(f"{name}_sum{_format_labels(labels)} {total}")
+        lines.append(f"{name}_count{_format_labels(labels)} {n}")
+    return "\n".join(lines) + "\n"
+
+
+def write_textfile(path):
+    # Атомарная запись: коллектор никогда не читает наполовину записанный файл
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(render_prometheus())
+    os.replace(tmp, path)
+
+
+def start_http_server(port, host="127.0.0.1"):
+    # http.server загружается только при включенном эндпоинте
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = render_prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        
+        def log_message(self, format, *args):
+            pass
+    
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
+
+
+def _textfile_loop(path):
+    while True:
+        time.sleep(TEXTFILE_INTERVAL)
+        write_textfile(path)
+
+
+def start_exporter():
+    # Идемпотентно: Streamlit перезапускает скрипт, но экспортер один на процесс
+    global _exporter_started
+    if not ENABLED:
+        return
+    with _lock:
+        if _exporter_started:
+            return
+        _exporter_started = True
+    if PORT:
+        try:
+            start_http_server(int(PORT))
+        except OSError:
+            # Порт уже занят другим процессом (например, воркером пула)
+            pass
+    if TEXTFILE:
+        threading.Thread(target=_textfile_loop, args=(TEXTFILE,), name="metrics-textfile", daemon=True).start()
+        atexit.register(write_textfile, TEXTFILE)
@@ -0,0 +1,123 @@
+# 🎨 ОФОРМЛЕНИЕ СТРАНИЦ
+# Общие стили и заголовок для app2.py и страниц pages/. Модуль без побочных
+# эффектов: страницы импортируют его, не запуская код главного приложения.
+import html
+
+# Стили с фиолетовой цветовой схемой
+PAGE_CSS = """
+<style>
+    @import url('https://fonts.googleapis.com/css2?family=Inter:wght@300;400;500;600;700&display=swap');
+    
+    html, body, [class*="css"] {
+        font-family: 'Inter', sans-serif;
+        line-height: 1.6;
+    }
+    
+    h1, h2, h3, h4, h5, h6 {
+        font-family: 'Inter', sans-serif;
+        font-weight: 600;
+        color: #1a1a1a;
+        letter-spacing: -0.02em;
+    }
+    
+    .main {
+        background-color: #f8f9fa;
+    }
+    
+    .stButton>button {
+        font-family: 'Inter', sans-serif;
+        font-weight: 500;
+    }
+    
+    .stSelectbox, .stMultiselect, .stNumberInput, .stSlider {
+        font-family: 'Inter', sans-serif;
+    }
+    
+    .header-section {
+        background: #8B5FBF;
+        padding: 40px 30px;
+        border-radius: 16px;
+        color: white;
+        text-align: center;
+        margin-bottom: 30px;
+        box-shadow: 0 8px 25px rgba(139, 95, 191, 0.3);
+    }
+    
+    .crisis-alert {
+        background: #ff6b6b;
+        color: white;
+        padding: 24px;
+        border-radius: 12px;
+        margin: 20px 0;
+        border: none;
+        box-shadow: 0 4px 15px rgba(255, 107, 107, 0.3);
+    }
+    
+    .stats-box {
+        background: white;
+        padding: 24px;
+        border-radius: 12px;
+        border-left: 6px solid #8B5FBF;
+        margin: 15px 0;
+        box-shadow: 0 2px 12px rgba(0,0,0,0.08);
+    }
+    
+    .antibiotic-box {
+        background: #f3e8ff;
+        padding: 20px;
+        border-radius: 10px;
+        border-left: 5px solid #8B5FBF;
+        margin: 12px 0;
+        box-shadow: 0 2px 8px rgba(139, 95, 191, 0.1);
+    }
+    
+    .no-antibiotic-box {
+        background: #e8f5e8;
+        padding: 20px;
+        border-radius: 10px;
+        border-left: 5px solid #4caf50;
+        margin: 12px 0;
+        box-shadow: 0 2px 8px rgba(76, 175, 80, 0.1);
+    }
+    
+    .diagnosis-card {
+        background: white;
+        padding: 25px;
+        border-radius: 12px;
+        margin: 15px 0;
+        box-shadow: 0 4px 15px rgba(0,0,0,0.1);
+        border: 1px solid #e0e0e0;
+    }
+    
+    .sidebar-section {
+        background: white;
+        padding: 20px;
+        border-radius: 12px;
+        margin: 10px 0;
+        box-shadow: 0 2px 8px rgba(0,0,0,0.08);
+        border-left: 4px solid #8B5FBF;
+    }
+    
+    @keyframes pulse {
+        0% { transform: scale(1); }
+        50% { transform: scale(1.02); }
+        100% { transform: scale(1); }
+    }
+    
+    .pulse-alert {
+        animation: pulse 2s infinite;
+    }
+</style>
+"""
+
+
+def header_html(title, subtitle):
+    # Фиолетовый заголовок страницы (класс header-section из PAGE_CSS)
+    return f"""
+<div class="header-section">
+    <h1 style="margin:0; font-size:2.4rem; font-weight:700;">{html.escape(title)}</h1>
+    <p style="font-size:1.1rem; margin:15px 0 0 0; opacity:0.9;">
+        {html.escape(subtitle)}
+    </p>
+</div>
+"""
@@ -0,0 +1,142 @@
+# 📊 АНАЛИТИКА АНТИБИОТИКОТЕРАПИИ
+# Страница для результатов score_encounters.py (CSV или Parquet). Файл
+# читается кусками только по нужным колонкам и сразу сворачивается в
+# небольшие агрегаты: доли показанных/непоказанных антибиотиков, структуру
+# диагнозов по периодам и распределения баллов. В браузер уходят только
+# агрегаты, а не миллионы исходных точек.
+import os
+
+import pandas as pd
+import plotly.express as px
+import streamlit as st
+
+from page_style import PAGE_CSS, header_html
+
+st.set_page_config(page_title="Stewardship Analytics", page_icon="🛡️", layout="wide")
+st.markdown(PAGE_CSS, unsafe_allow_html=True)
+
+CHUNKSIZE = 500_000
+MAX_TIME_POINTS = 200
+DATE_COLUMN = "encounter_date"
+# Колонки баллов берутся из заголовка файла: набор состояний зависит от
+# версии базы знаний, которой был оценен файл
+SCORE_PREFIX = "score_"
+# Шаги агрегации по времени от мелкого к крупному
+TIME_FREQUENCIES = [("D", "день"), ("W", "неделя"), ("MS", "месяц"), ("QS", "квартал"), ("YS", "год")]
+
+
+def _file_columns(path):
+    if path.lower().endswith(".parquet"):
+        import pyarrow.parquet as pq
+        return list(pq.ParquetFile(path).schema_arrow.names)
+    return list(pd.read_csv(path, nrows=0).columns)
+
+
+def _iter_columns(path, columns):
+    # Только нужные колонки, кусками - память не зависит от размера файла
+    header = _file_columns(path)
+    present = [c for c in columns if c in header]
+    if path.lower().endswith(".parquet"):
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=CHUNKSIZE, columns=present):
+            yield batch.to_pandas()
+    else:
+        with pd.read_csv(path, usecols=present, chunksize=CHUNKSIZE) as reader:
+            yield from reader
+
+
+def _add(total, part):
+    return part if total is None else total.add(part, fill_value=0)
+
+
+@st.cache_data(show_spinner="Агрегируем обращения...", max_entries=8)
+def aggregate(path, mtime):
+    # mtime входит в ключ кэша: перезаписанный файл агрегируется заново
+    score_columns = [c for c in _file_columns(path) if c.startswith(SCORE_PREFIX)]
+    columns = ["diagnosis", "antibiotics_indicated", DATE_COLUMN] + score_columns
+    rows = 0
+    antibiotics = None
+    daily = None
+    scores = {}
+    
+    for chunk in _iter_columns(path, columns):
+        rows += len(chunk)
+        antibiotics = _add(antibiotics, chunk["antibiotics_indicated"].astype(bool).value_counts())
+        
+        if DATE_COLUMN in chunk.columns:
+            dates = pd.to_datetime(chunk[DATE_COLUMN], errors="coerce").dt.floor("D")
+            counts = chunk.groupby([dates, chunk["diagnosis"]]).size()
+            daily = _add(daily, counts)
+        
+        for column in score_columns:
+            if column in chunk.columns:
+                scores[column] = _add(scores.get(column), chunk[column].value_counts())
+    
+    antibiotics = antibiotics if antibiotics is not None else pd.Series(dtype=int)
+    if daily is not None:
+        daily = daily.rename_axis(["date", "diagnosis"]).unstack(fill_value=0).sort_index()
+    score_distribution = pd.DataFrame([
+        {"condition": column.removeprefix(SCORE_PREFIX), "score": int(score), "count": int(count)}
+        for column, counts in scores.items() for score, count in counts.items()
+    ])
+    return rows, antibiotics, daily, score_distribution
+
+
+def downsample(daily):
+    # Самая мелкая частота, при которой точек не больше MAX_TIME_POINTS
+    for freq, label in TIME_FREQUENCIES:
+        resampled = daily.resample(freq).sum()
+        if len(resampled) <= MAX_TIME_POINTS:
+            return resampled, label
+    return resampled, label
+
+
+st.markdown(header_html("Аналитика антибиотикотерапии", "Результаты пакетной диагностики (score_encounters.py)"),
+            unsafe_allow_html=True)
+
+path = st.text_input("Путь к файлу с результатами на сервере (.csv или .parquet):")
+if not path:
+    st.info("Укажите файл, созданный командой score_encounters.py")
+    st.stop()
+if not os.path.exists(path):
+    st.error(f"Файл не найден: {path}")
+    st.stop()
+
+rows, antibiotics, daily, score_distribution = aggregate(path, os.path.getmtime(path))
+
+# ДОЛЯ ПОКАЗАННЫХ АНТИБИОТИКОВ
+indicated = int(antibiotics.get(True, 0))
+not_indicated = int(antibiotics.get(False, 0))
+col1, col2, col3 = st.columns(3)
+col1.metric("Обращений", f"{rows:,}")
+col2.metric("Антибиотики показаны", f"{indicated / max(rows, 1):.1%}")
+col3.metric("Антибиотики не показаны", f"{not_indicated / max(rows, 1):.1%}")
+
+st.plotly_chart(
+    px.pie(
+        names=["Показаны", "Не показаны"], values=[indicated, not_indicated],
+        color_discrete_sequence=["#8B5FBF", "#4caf50"], hole=0.5,
+        title="Показания к антибиотикотерапии"
+    )
+)
+
+# СТРУКТУРА ДИАГНОЗОВ ВО ВРЕМЕНИ
+st.subheader("Структура диагнозов во времени")
+if daily is None or daily.empty:
+    st.info(f"В файле нет колонки {DATE_COLUMN} - динамика недоступна")
+else:
+    series, label = downsample(daily)
+    long = series.reset_index().melt(id_vars="date", var_name="diagnosis", value_name="count")
+    st.plotly_chart(
+        px.area(long, x="date", y="count", color="diagnosis", title=f"Диагнозы (период: {label})")
+    )
+
+# РАСПРЕДЕЛЕНИЕ БАЛЛОВ
+st.subheader("Распределение баллов по состояниям")
+if score_distribution.empty:
+    st.info("В файле нет колонок с баллами состояний")
+else:
+    st.plotly_chart(
+        px.bar(score_distribution, x="score", y="count", facet_col="condition", facet_col_wrap=3,
+               color_discrete_sequence=["#8B5FBF"])
+    )
@@ -0,0 +1,207 @@
+# 🛏️ ЛИСТ ОТДЕЛЕНИЯ
+# Страница для списка пациентов отделения (CSV или Parquet с теми же
+# колонками, что у score_encounters.py, плюс идентификатор койки или
+# пациента). Все пациенты оцениваются одним пакетом; таблицу можно
+# сортировать, фильтровать по диагнозу и показаниям к антибиотикам и
+# листать постранично.
+#
+# При обновлении пересчитываются только пациенты, у которых изменились
+# входные данные: для каждой строки хранится хэш колонок симптомов,
+# анализов и показателей, и в пакет попадают только новые строки и строки
+# с другим хэшем. Неизмененный файл не перечитывается вовсе (проверяется
+# mtime), а смена версии базы знаний пересчитывает весь список.
+import os
+import time
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+import metrics
+from diagnosis_engine import DIFFERENTIAL_SIZE, get_ruleset, medical_diagnosis_batch
+from page_style import PAGE_CSS, header_html
+
+st.set_page_config(page_title="Ward Worklist", page_icon="🛡️", layout="wide")
+st.markdown(PAGE_CSS, unsafe_allow_html=True)
+
+# Идентификатор пациента - первая найденная колонка; без них - номер строки
+ID_COLUMNS = ["bed", "patient_id", "encounter_id"]
+VITAL_COLUMNS = ["temperature", "bp_systolic", "bp_diastolic", "wbc", "crp"]
+LIST_COLUMNS = ["symptoms", "lab_data"]
+PAGE_SIZES = [25, 50, 100, 200]
+AUTO_REFRESH_SECONDS = 30
+SORT_COLUMNS = {
+    "Идентификатор": "id", "Балл": "score", "Диагноз": "diagnosis",
+    "Антибиотики": "antibiotics_indicated", "Температура": "temperature", "СРБ": "crp"
+}
+ANTIBIOTIC_FILTERS = ["Все", "Показаны", "Не показаны"]
+
+
+def read_census(path):
+    if path.lower().endswith(".parquet"):
+        return pd.read_parquet(path)
+    return pd.read_csv(path)
+
+
+def patient_ids(census):
+    for column in ID_COLUMNS:
+        if column in census.columns:
+            return census[column].astype(str)
+    return pd.Series(np.arange(1, len(census) + 1).astype(str), index=census.index)
+
+
+def input_hashes(census, rules):
+    # Хэш только входов диагностики: правка других колонок (ФИО, палата) не
+    # вызывает пересчета. Списки из Parquet хэшируются как строки через ";"
+    columns = [
+        c for c in census.columns
+        if c in VITAL_COLUMNS or c in LIST_COLUMNS or c in rules.symptom_bits or c in rules.lab_bits
+    ]
+    inputs = census[columns].copy()
+    for column in LIST_COLUMNS:
+        if column in inputs.columns:
+            inputs[column] = inputs[column].map(
+                lambda v: ";".join(map(str, v)) if isinstance(v, (list, tuple, np.ndarray)) else v
+            )
+    return pd.util.hash_pandas_object(inputs, index=False).to_numpy()
+
+
+def score_patients(census, rules):
+    result = medical_diagnosis_batch(census, rules)
+    indicated = {c: rules.antibiotics_indicated(c) for c in rules.knowledge_base}
+    result["antibiotics_indicated"] = result["diagnosis"].map(indicated).astype(bool)
+    columns = ["diagnosis", "score", "antibiotics_indicated", "hypertensive_crisis"]
+    columns += [f"differential_{i}" for i in range(1, DIFFERENTIAL_SIZE)]
+    return result[columns]
+
+
+def refresh(state, path, rules):
+    # Инкрементальное обновление листа в state (session_state["worklist"]);
+    # возвращает (пересчитано, всего) или None, если ничего не изменилось
+    mtime = os.path.getmtime(path)
+    if state.get("path") == path and state.get("mtime") == mtime and state.get("fingerprint") == rules.fingerprint:
+        return None
+    census = read_census(path).reset_index(drop=True)
+    ids = patient_ids(census)
+    if ids.duplicated().any():
+        raise ValueError(f"Повторяющиеся идентификаторы пациентов: {sorted(ids[ids.duplicated()].unique())[:5]}")
+    hashes = input_hashes(census, rules)
+
+    # Прежние результаты действуют только для того же файла и той же версии правил
+    if state.get("path") != path or state.get("fingerprint") != rules.fingerprint:
+        previous = pd.Series(dtype=np.uint64)
+        results = None
+    else:
+        previous, results = state["hashes"], state["results"]
+    known = ids.isin(previous.index).to_numpy()
+    changed = ~known | (previous.reindex(ids, fill_value=0).to_numpy() != hashes)
+
+    with metrics.phase("worklist_scoring"):
+        scored = score_patients(census[changed], rules) if changed.any() else None
+    if scored is not None:
+        scored.index = ids[changed].to_numpy()
+    kept = results.loc[ids[~changed]] if results is not None and not changed.all() else None
+    results = pd.concat([frame for frame in (kept, scored) if frame is not None]).reindex(ids.to_numpy())
+
+    # Таблица для отображения: результаты + показатели из файла
+    table = results.copy()
+    table.insert(0, "id", ids.to_numpy())
+    for column in VITAL_COLUMNS:
+        if column in census.columns:
+            table[column] = census[column].to_numpy()
+    table["updated"] = changed
+
+    state.update({
+        "path": path, "mtime": mtime, "fingerprint": rules.fingerprint,
+        "hashes": pd.Series(hashes, index=ids.to_numpy()), "results": results, "table": table
+    })
+    return int(changed.sum()), len(census)
+
+
+def filtered(table, diagnoses, antibiotics, search):
+    mask = np.ones(len(table), dtype=bool)
+    if diagnoses:
+        mask &= table["diagnosis"].isin(diagnoses).to_numpy()
+    if antibiotics != ANTIBIOTIC_FILTERS[0]:
+        mask &= table["antibiotics_indicated"].to_numpy() == (antibiotics == ANTIBIOTIC_FILTERS[1])
+    if search:
+        mask &= table["id"].str.contains(search, case=False, regex=False).to_numpy()
+    return table[mask]
+
+
+def show_worklist(path):
+    rules = get_ruleset()
+    state = st.session_state.setdefault("worklist", {})
+    started = time.perf_counter()
+    try:
+        update = refresh(state, path, rules)
+    except ImportError:
+        st.error("Для чтения Parquet установите pyarrow: pip install pyarrow")
+        return
+    except (ValueError, KeyError, OSError) as exc:
+        st.error(f"Не удалось обновить лист отделения: {exc}")
+        return
+    if update is not None:
+        state["last_update"] = (*update, time.perf_counter() - started)
+    rescored, total, seconds = state["last_update"]
+    table = state["table"]
+
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Пациентов", f"{total:,}")
+    col2.metric("Антибиотики показаны", f"{int(table['antibiotics_indicated'].sum()):,}")
+    col3.metric("Гипертонический криз", f"{int(table['hypertensive_crisis'].sum()):,}")
+    col4.metric("Пересчитано при обновлении", f"{rescored:,}", help=f"{seconds * 1000:.0f} мс")
+
+    # ФИЛЬТРЫ И СОРТИРОВКА
+    col1, col2, col3 = st.columns([2, 1, 1])
+    diagnoses = col1.multiselect("Диагноз:", sorted(table["diagnosis"].unique()))
+    antibiotics = col2.selectbox("Антибиотики:", ANTIBIOTIC_FILTERS)
+    search = col3.text_input("Поиск по идентификатору:")
+    col1, col2, col3 = st.columns([2, 1, 1])
+    sort_label = col1.selectbox("Сортировка:", list(SORT_COLUMNS), index=1)
+    descending = col2.toggle("По убыванию", value=True)
+    page_size = col3.selectbox("Строк на странице:", PAGE_SIZES)
+
+    # Сортировка до разбиения на страницы - порядок общий для всего листа
+    view = filtered(table, diagnoses, antibiotics, search)
+    sort_column = SORT_COLUMNS[sort_label]
+    if sort_column in view.columns:
+        # Номера коек дополняются нулями слева: "9" раньше "10"
+        width = int(view["id"].str.len().max()) if len(view) else 0
+        keys = list(dict.fromkeys([sort_column, "id"]))
+        view = view.sort_values(
+            keys, ascending=[not descending, True][:len(keys)], kind="stable",
+            key=lambda column: column.str.zfill(width) if column.name == "id" else column
+        )
+    pages = max(1, -(-len(view) // page_size))
+    page = st.number_input(f"Страница (из {pages}):", min_value=1, max_value=pages, value=1)
+    st.dataframe(
+        view.iloc[(page - 1) * page_size:page * page_size],
+        hide_index=True, width="stretch",
+        column_config={
+            "id": "Пациент",
+            "diagnosis": "Диагноз",
+            "score": st.column_config.NumberColumn("Балл"),
+            "antibiotics_indicated": st.column_config.CheckboxColumn("Антибиотики"),
+            "hypertensive_crisis": st.column_config.CheckboxColumn("Криз"),
+            "updated": st.column_config.CheckboxColumn("Пересчитан")
+        }
+    )
+    st.caption(f"Показано {min(page_size, max(0, len(view) - (page - 1) * page_size))} из {len(view)} "
+               f"отобранных; версия базы знаний {rules.version}")
+
+
+st.markdown(header_html("Лист отделения", "Диагнозы и показания к антибиотикам для всех пациентов отделения"),
+            unsafe_allow_html=True)
+
+path = st.text_input("Путь к списку пациентов на сервере (.csv или .parquet):")
+if not path:
+    st.info("Укажите файл со списком пациентов: идентификатор (bed или patient_id), симптомы, анализы и показатели")
+    st.stop()
+if not os.path.exists(path):
+    st.error(f"Файл не найден: {path}")
+    st.stop()
+
+# Автообновление перезапускает только лист, а не всю страницу
+auto = st.toggle(f"Автообновление каждые {AUTO_REFRESH_SECONDS} с", value=False)
+st.fragment(run_every=AUTO_REFRESH_SECONDS if auto else None)(show_worklist)(path)
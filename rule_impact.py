@@ -0,0 +1,302 @@
+# 🔬 ВЛИЯНИЕ ИЗМЕНЕНИЯ ПРАВИЛ
+# Полный перебор дискретизированного пространства входов для двух версий
+# базы знаний: для каждого сочетания симптомов, анализов и интервалов
+# показателей сравниваются основной диагноз и показания к антибиотикам.
+# Различия потоком пишутся в CSV, сводка по переходам - в stderr.
+#
+#   git show HEAD~1:knowledge_base/stewardship.json > /tmp/old.json
+#   python rule_impact.py /tmp/old.json knowledge_base/stewardship.json -o impact.csv
+#   python rule_impact.py /tmp/old.json -o impact_full.csv --detail
+#
+# Пространство входов: все подмножества словаря симптомов и анализов обеих
+# версий x интервалы температуры, лейкоцитов, СРБ и давления между порогами
+# правил (внутри интервала ни одно сравнение не меняется, поэтому хватает
+# одной точки). Эквивалентные входы сворачиваются:
+# - симптомы и анализы, которые не участвуют в правилах ни одной версии,
+#   не перебираются;
+# - показатель перебирается по интервалам только там, где он может что-то
+#   изменить (температура - при симптомах с температурным порогом,
+#   лейкоциты и СРБ - без отмеченного анализа, давление - при симптомах
+#   криза), иначе в отчете "любая".
+# Колонка presentations - сколько входов полного пространства (подмножеств
+# словаря x интервалов показателей) представляет строка отчета.
+#
+# По умолчанию отчет сгруппирован: строка - сочетание перебираемых
+# симптомов, анализов и интервалов показателей с одним переходом диагноза;
+# subsets - сколько наборов независимых симптомов (см. ниже) дают этот
+# переход, other_symptoms - наименьший из них. С --detail каждая строка -
+# отдельный набор симптомов с баллами обеих версий (отчет может занимать
+# гигабайты при крупных изменениях).
+#
+# Симптомы, которые входят в правила обеих версий только прямыми признаками
+# (без порогов, исключений и криза), добавляют к баллам независимые
+# слагаемые. Их вклад для всех 2**k сочетаний считается один раз матричным
+# умножением, а перебор идет по остальным симптомам и анализам: на каждое
+# их сочетание и интервал показателей - одно сложение с готовой таблицей
+# и argmax по всем 2**k строкам сразу.
+import argparse
+import collections
+import csv
+import itertools
+import sys
+import time
+
+import numpy as np
+
+from diagnosis_engine import KB_PATH, load_ruleset
+
+DEFAULT_CHUNK_BITS = 16
+ANY = "любая"
+VITAL_COLUMNS = ["temperature", "wbc", "crp", "bp_systolic", "bp_diastolic"]
+COLUMNS = [
+    "symptoms", "lab_data", *VITAL_COLUMNS, "other_symptoms", "subsets", "presentations",
+    "old_diagnosis", "new_diagnosis", "old_antibiotics", "new_antibiotics"
+]
+DETAIL_COLUMNS = [
+    "symptoms", "lab_data", *VITAL_COLUMNS, "presentations",
+    "old_diagnosis", "new_diagnosis", "old_score", "new_score", "old_antibiotics", "new_antibiotics"
+]
+
+
+def vital_buckets(thresholds):
+    # Интервалы показателя, внутри которых не меняется ни одно сравнение
+    # с порогами [(значение, ">" или "<")]: список (представитель, подпись)
+    points = sorted({value for value, _ in thresholds})
+    if not points:
+        return [(0.0, ANY)]
+    pieces = [(points[0] - 1, "(-inf", f"{points[0]:g})")]
+    for i, point in enumerate(points):
+        pieces.append((point, f"[{point:g}", f"{point:g}]"))
+        if i + 1 < len(points):
+            pieces.append(((point + points[i + 1]) / 2, f"({point:g}", f"{points[i + 1]:g})"))
+        else:
+            pieces.append((point + 1, f"({point:g}", "+inf)"))
+
+    # Соседние куски с одинаковыми результатами сравнений сливаются
+    buckets = []
+    for value, left, right in pieces:
+        signature = tuple(value > t if op == ">" else value < t for t, op in thresholds)
+        if buckets and buckets[-1][0] == signature:
+            buckets[-1][3] = right
+        else:
+            buckets.append([signature, value, left, right])
+    return [(value, f"{left}, {right}") for _, value, left, right in buckets]
+
+
+class Version:
+    # Версия правил с номерами состояний в общем для двух версий списке диагнозов
+    def __init__(self, rules, diagnoses):
+        index = {d: i for i, d in enumerate(diagnoses)}
+        self.rules = rules
+        self.lanes = np.array([index[c] for c in rules.conditions])
+        self.crisis = index[rules.crisis_condition]
+        self.indicated = np.array([d in rules.knowledge_base and rules.antibiotics_indicated(d) for d in diagnoses])
+        self.base = np.array(rules.base_scores)
+
+    def scores(self, symptoms, labs, temperature, wbc, crp):
+        return self.rules.batch_scores(self.rules.flag_features(symptoms, labs, temperature, wbc, crp))
+
+
+def _split_symptoms(old, new, symptoms, chunk_bits):
+    # Независимые симптомы - только в прямых признаках обеих версий
+    coupled = set(old.crisis_symptoms) | set(new.crisis_symptoms)
+    for spec in (*old.features, *new.features):
+        if set(spec) - {"name", "symptom"}:
+            coupled.update(spec[key] for key in ("symptom", "without_symptom") if key in spec)
+    independent = [s for s in symptoms if s not in coupled][:chunk_bits]
+    return independent, [s for s in symptoms if s not in independent]
+
+
+def _bit_flags(names, codes):
+    return {name: (codes >> bit) & 1 == 1 for bit, name in enumerate(names)}
+
+
+def sweep(old, new, report, chunk_bits=DEFAULT_CHUNK_BITS, detail=False, log=sys.stderr):
+    diagnoses = list(dict.fromkeys([*old.conditions, old.crisis_condition, *new.conditions, new.crisis_condition]))
+    diagnosis_names = np.array(diagnoses, dtype=object)
+    versions = Version(old, diagnoses), Version(new, diagnoses)
+
+    # Словарь входов - все симптомы и анализы, известные хотя бы одной версии;
+    # перебираются только участвующие в правилах
+    symptom_vocabulary = list(dict.fromkeys([*old.symptom_bits, *new.symptom_bits]))
+    lab_vocabulary = list(dict.fromkeys([*old.lab_bits, *new.lab_bits]))
+    relevant_symptoms = [s for s in symptom_vocabulary if s in old.rule_symptoms or s in new.rule_symptoms]
+    relevant_labs = [lab for lab in lab_vocabulary if lab in old.rule_labs or lab in new.rule_labs]
+    free_subsets = 1 << (len(symptom_vocabulary) + len(lab_vocabulary) - len(relevant_symptoms) - len(relevant_labs))
+    independent, enumerated = _split_symptoms(old, new, relevant_symptoms, chunk_bits)
+
+    specs = [*old.features, *new.features]
+    temperature = vital_buckets([
+        (spec[key], op) for spec in specs
+        for key, op in (("temperature_above", ">"), ("temperature_below", "<")) if key in spec
+    ])
+    wbc = vital_buckets([(spec["wbc_above"], ">") for spec in specs if "wbc_above" in spec])
+    crp = vital_buckets([(spec["crp_above"], ">") for spec in specs if "crp_above" in spec])
+    pressure = list(itertools.product(
+        vital_buckets([(rules.crisis_systolic, ">") for rules in (old, new)]),
+        vital_buckets([(rules.crisis_diastolic, ">") for rules in (old, new)])
+    ))
+    temperature_symptoms = {spec["symptom"] for spec in specs if "temperature_above" in spec or "temperature_below" in spec}
+    wbc_labs = [spec.get("lab") for spec in specs if "wbc_above" in spec]
+    crp_labs = [spec.get("lab") for spec in specs if "crp_above" in spec]
+    crisis_symptoms = set(old.crisis_symptoms) | set(new.crisis_symptoms)
+
+    # Вклад независимых симптомов (без базовых баллов) для всех их сочетаний
+    codes = np.arange(1 << len(independent), dtype=np.int64)
+    size = len(codes)
+    flags = _bit_flags(independent, codes)
+    no_flags = np.zeros(size, dtype=bool)
+    symptoms = {s: flags.get(s, no_flags) for s in relevant_symptoms}
+    labs = {lab: no_flags for lab in relevant_labs}
+    no_vitals = np.full(size, -np.inf)
+    independent_scores = [
+        version.scores(symptoms, labs, no_vitals, no_vitals, no_vitals) - version.base for version in versions
+    ]
+    independent_names = np.array([";".join(s for s in independent if flags[s][i]) for i in range(size)], dtype=object)
+    independent_counts = sum(column.astype(np.int8) for column in flags.values()) if independent else np.zeros(size)
+
+    n_chunks = 1 << (len(enumerated) + len(relevant_labs))
+    space = free_subsets * size * n_chunks * len(temperature) * len(wbc) * len(crp) * len(pressure)
+    writer = csv.writer(report)
+    writer.writerow(DETAIL_COLUMNS if detail else COLUMNS)
+    report_rows = 0
+    changed_rows = 0
+    changed_presentations = 0
+    transitions = collections.Counter()
+    started = time.perf_counter()
+
+    for chunk in range(n_chunks):
+        # Одно сочетание перебираемых симптомов и анализов на весь кусок
+        chunk_flags = _bit_flags(enumerated + relevant_labs, chunk)
+        present_symptoms = [s for s in enumerated if chunk_flags[s]]
+        present_labs = [lab for lab in relevant_labs if chunk_flags[lab]]
+        row_symptoms = {s: np.array([chunk_flags.get(s, False)]) for s in relevant_symptoms}
+        row_labs = {lab: np.array([chunk_flags[lab]]) for lab in relevant_labs}
+        prefix = ";".join(present_symptoms)
+
+        active = {
+            "temperature": any(chunk_flags[s] for s in temperature_symptoms),
+            "wbc": any(lab is None or not chunk_flags[lab] for lab in wbc_labs),
+            "crp": any(lab is None or not chunk_flags[lab] for lab in crp_labs),
+            "pressure": any(chunk_flags[s] for s in crisis_symptoms)
+        }
+        # Неактивный показатель оценивается в одном интервале и помечается "любая"
+        multiplicity = free_subsets
+        ranges = {}
+        for name, buckets in (("temperature", temperature), ("wbc", wbc), ("crp", crp), ("pressure", pressure)):
+            if active[name]:
+                ranges[name] = buckets
+            else:
+                ranges[name] = buckets[:1]
+                multiplicity *= len(buckets)
+
+        for (t, t_label), (w, w_label), (c, c_label) in itertools.product(ranges["temperature"], ranges["wbc"], ranges["crp"]):
+            tops = []
+            for version, table in zip(versions, independent_scores):
+                scores = table + version.scores(row_symptoms, row_labs, np.array([t]), np.array([w]), np.array([c]))
+                # argmax берет первый из равных максимумов - тот же диагноз,
+                # что и стабильная сортировка по баллам
+                top = scores.argmax(axis=1)
+                tops.append((top, scores[np.arange(size), top]))
+
+            for (s, s_label), (d, d_label) in ranges["pressure"]:
+                results = []
+                for version, (top, score) in zip(versions, tops):
+                    if np.any(version.rules.crisis_flags(row_symptoms, s, d)):
+                        results.append((np.full(size, version.crisis), np.full(size, version.rules.crisis_score)))
+                    else:
+                        results.append((version.lanes[top], score))
+                (old_top, old_score), (new_top, new_score) = results
+                old_indicated = versions[0].indicated[old_top]
+                new_indicated = versions[1].indicated[new_top]
+                changed = np.flatnonzero((old_top != new_top) | (old_indicated != new_indicated))
+                if not changed.size:
+                    continue
+
+                lab_names = itertools.repeat(";".join(present_labs))
+                labels = [
+                    t_label if active["temperature"] else ANY, w_label if active["wbc"] else ANY,
+                    c_label if active["crp"] else ANY, s_label if active["pressure"] else ANY,
+                    d_label if active["pressure"] else ANY
+                ]
+                # Показания к антибиотикам определяются диагнозом, поэтому
+                # переход задается парой диагнозов; в группе перехода первым
+                # идет набор с наименьшим числом независимых симптомов
+                pairs = old_top[changed] * len(diagnoses) + new_top[changed]
+                order = np.lexsort((independent_counts[changed], pairs))
+                unique_pairs, first, counts = np.unique(pairs[order], return_index=True, return_counts=True)
+                for pair, n in zip(unique_pairs, counts):
+                    transitions[divmod(int(pair), len(diagnoses))] += int(n) * multiplicity
+                changed_rows += changed.size
+                changed_presentations += changed.size * multiplicity
+
+                if detail:
+                    rows = changed
+                    symptom_names = [f"{prefix};{names}".strip(";") for names in independent_names[rows]]
+                    columns = (symptom_names, lab_names, *map(itertools.repeat, labels), itertools.repeat(multiplicity))
+                    score_columns = (old_score[rows].tolist(), new_score[rows].tolist())
+                else:
+                    rows = changed[order[first]]
+                    columns = (
+                        itertools.repeat(prefix), lab_names, *map(itertools.repeat, labels),
+                        independent_names[rows], counts.tolist(), [int(n) * multiplicity for n in counts]
+                    )
+                    score_columns = ()
+                writer.writerows(zip(
+                    *columns, diagnosis_names[old_top[rows]], diagnosis_names[new_top[rows]], *score_columns,
+                    old_indicated[rows].tolist(), new_indicated[rows].tolist()
+                ))
+                report_rows += len(rows)
+
+        if (chunk + 1) % max(1, n_chunks // 20) == 0 or chunk + 1 == n_chunks:
+            elapsed = time.perf_counter() - started
+            print(f"проверено {chunk + 1} из {n_chunks} кусков ({(chunk + 1) * size:,} сочетаний симптомов "
+                  f"и анализов), {elapsed:.1f} с, строк отчета: {report_rows:,}", file=log)
+
+    return {
+        "diagnoses": diagnoses,
+        "versions": versions,
+        "space": space,
+        "report_rows": report_rows,
+        "changed_rows": changed_rows,
+        "changed_presentations": changed_presentations,
+        "transitions": transitions,
+        "elapsed": time.perf_counter() - started
+    }
+
+
+def print_summary(old, new, result, log=sys.stderr):
+    space, changed = result["space"], result["changed_presentations"]
+    print(f"версии {old.version} -> {new.version}: входов в пространстве {space:,}, "
+          f"изменилось {changed:,} ({changed / space:.4%}), строк отчета {result['report_rows']:,}, "
+          f"{result['elapsed']:.1f} с", file=log)
+    old_version, new_version = result["versions"]
+    for (old_top, new_top), n in result["transitions"].most_common():
+        old_indicated, new_indicated = old_version.indicated[old_top], new_version.indicated[new_top]
+        antibiotics = ""
+        if old_indicated != new_indicated:
+            antibiotics = ", антибиотики " + ("показаны" if new_indicated else "не показаны")
+        print(f"  {n:>16,}  {result['diagnoses'][old_top]} -> {result['diagnoses'][new_top]}{antibiotics}", file=log)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Различия диагнозов между двумя версиями базы знаний")
+    parser.add_argument("old", help="прежняя версия базы знаний (.json или .toml)")
+    parser.add_argument("new", nargs="?", default=KB_PATH, help="новая версия (по умолчанию действующая)")
+    parser.add_argument("-o", "--output", default="-", help="отчет о различиях, CSV ('-' - stdout)")
+    parser.add_argument("--chunk-bits", type=int, default=DEFAULT_CHUNK_BITS,
+                        help="не больше N независимых симптомов в таблице вклада (куски по 2**N строк)")
+    parser.add_argument("--detail", action="store_true", help="строка отчета на каждый набор симптомов, с баллами")
+    args = parser.parse_args()
+
+    old, new = load_ruleset(args.old), load_ruleset(args.new)
+    if args.output == "-":
+        result = sweep(old, new, sys.stdout, args.chunk_bits, args.detail)
+    else:
+        with open(args.output, "w", newline="", encoding="utf-8") as report:
+            result = sweep(old, new, report, args.chunk_bits, args.detail)
+    print_summary(old, new, result)
+
+
+if __name__ == "__main__":
+    main()
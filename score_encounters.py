@@ -0,0 +1,252 @@
+# 🗂️ ПАКЕТНАЯ ДИАГНОСТИКА ФАЙЛОВ ОБРАЩЕНИЙ
+# Потоковая обработка CSV/JSONL без Streamlit-интерфейса: файл читается
+# кусками фиксированного размера, каждый кусок оценивается векторно
+# (medical_diagnosis_batch) и сразу дописывается в CSV или Parquet, так что
+# потребление памяти не зависит от размера входного файла.
+#
+#   python score_encounters.py encounters.jsonl -o scored.parquet
+#   python score_encounters.py encounters.csv -o scored.csv --chunksize 100000
+#   python score_encounters.py encounters.csv -o scored.csv --workers 8
+#
+# Входные колонки: temperature, bp_systolic, bp_diastolic, wbc, crp и
+# симптомы/анализы - либо списком в "symptoms" / "lab_data" (в CSV через ";"),
+# либо отдельными булевыми колонками с названием симптома.
+#
+# С --workers N куски сырых строк раздаются пулу процессов: разбор и оценка
+# идут параллельно, а результаты пишутся строго в исходном порядке. В полете
+# одновременно не больше 2*N кусков, поэтому память остается ограниченной.
+# В параллельном режиме одна запись должна занимать одну строку файла
+# (CSV без переносов строк внутри кавычек).
+#
+# Набор правил загружается один раз при запуске (load_ruleset, без фоновой
+# перезагрузки) и передается каждому куску и каждому процессу пула: правка
+# базы знаний во время работы не смешивает в одном файле две версии правил
+# и не ломает схему Parquet, зафиксированную по первому куску.
+import argparse
+import collections
+import gzip
+import io
+import itertools
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from diagnosis_engine import KnowledgeBaseError, load_ruleset, medical_diagnosis_batch
+
+DEFAULT_CHUNKSIZE = 50_000
+DEFAULT_KEEP_COLUMNS = "encounter_id,encounter_date"
+
+
+def _detect_format(path, explicit):
+    if explicit:
+        return explicit
+    name = path.lower()
+    if name.endswith((".jsonl", ".ndjson", ".jsonl.gz", ".ndjson.gz")):
+        return "jsonl"
+    if name.endswith(".parquet"):
+        return "parquet"
+    return "csv"
+
+
+def read_chunks(path, fmt, chunksize):
+    source = sys.stdin if path == "-" else path
+    if fmt == "jsonl":
+        reader = pd.read_json(source, lines=True, chunksize=chunksize)
+    elif fmt == "csv":
+        reader = pd.read_csv(source, chunksize=chunksize)
+    else:
+        sys.exit(f"Неподдерживаемый формат входа: {fmt} (ожидается csv или jsonl)")
+    with reader:
+        yield from reader
+
+
+def read_raw_blocks(path, fmt, chunksize):
+    # Куски исходного текста по chunksize записей; для CSV к каждому куску
+    # добавляется строка заголовка, чтобы его можно было разобрать отдельно
+    if fmt not in ("csv", "jsonl"):
+        sys.exit(f"Неподдерживаемый формат входа: {fmt} (ожидается csv или jsonl)")
+    if path == "-":
+        source = sys.stdin
+    elif path.lower().endswith(".gz"):
+        # Последовательный режим распаковывает .gz средствами pandas, здесь - сами
+        source = gzip.open(path, "rt", encoding="utf-8")
+    else:
+        source = open(path, encoding="utf-8")
+    with source:
+        header = source.readline() if fmt == "csv" else ""
+        while True:
+            lines = list(itertools.islice(source, chunksize))
+            if not lines:
+                break
+            yield header + "".join(lines)
+
+
+def parse_block(text, fmt):
+    if fmt == "jsonl":
+        return pd.read_json(io.StringIO(text), lines=True)
+    return pd.read_csv(io.StringIO(text))
+
+
+def score_chunk(chunk, keep_columns, rules):
+    # Диагнозы и сводка по лечению берутся из одной версии базы знаний
+    result = medical_diagnosis_batch(chunk, rules)
+    
+    # Сводка по лечению считается один раз на состояние, а не на строку
+    indicated = {c: rules.antibiotics_indicated(c) for c in rules.knowledge_base}
+    categories = {c: ";".join(rules.treatment_categories(c)) for c in rules.knowledge_base}
+    result["antibiotics_indicated"] = result["diagnosis"].map(indicated).astype(bool)
+    result["treatment_categories"] = result["diagnosis"].map(categories)
+    
+    # Дифференциальных колонок столько, сколько создал движок (DIFFERENTIAL_SIZE)
+    for column in result.columns:
+        if column.startswith("differential_"):
+            result[column] = result[column].astype("string")
+    
+    kept = [c for c in keep_columns if c in chunk.columns]
+    if kept:
+        # Переносимые колонки всегда строковые: тип, выведенный по одному куску
+        # (пустая в начале файла дата, целые идентификаторы), не совпал бы со
+        # схемой Parquet, зафиксированной по первому куску
+        result = pd.concat([chunk[kept].astype("string"), result], axis=1)
+    return result.reset_index(drop=True)
+
+
+class CsvSink:
+    def __init__(self, path):
+        self.path = path
+        self.header = True
+    
+    def write(self, frame):
+        target = sys.stdout if self.path == "-" else self.path
+        frame.to_csv(target, mode="w" if self.header else "a", header=self.header, index=False)
+        self.header = False
+    
+    def close(self):
+        pass
+
+
+class ParquetSink:
+    def __init__(self, path):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            sys.exit("Для записи Parquet установите pyarrow: pip install pyarrow")
+        self.pa = pa
+        self.pq = pq
+        self.path = path
+        self.writer = None
+    
+    def write(self, frame):
+        if self.writer is None:
+            table = self.pa.Table.from_pandas(frame, preserve_index=False)
+            self.writer = self.pq.ParquetWriter(self.path, table.schema)
+        else:
+            table = self.pa.Table.from_pandas(frame, schema=self.writer.schema, preserve_index=False)
+        self.writer.write_table(table)
+    
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+def open_sink(path, fmt):
+    if fmt == "parquet":
+        return ParquetSink(path)
+    if fmt == "csv":
+        return CsvSink(path)
+    sys.exit(f"Неподдерживаемый формат выхода: {fmt} (ожидается csv или parquet)")
+
+
+def run(chunks, sink, keep_columns, rules, log=sys.stderr):
+    rows = 0
+    started = time.perf_counter()
+    try:
+        for chunk in chunks:
+            sink.write(score_chunk(chunk, keep_columns, rules))
+            rows += len(chunk)
+            elapsed = time.perf_counter() - started
+            print(f"обработано {rows} обращений, {rows / elapsed:,.0f} строк/с", file=log)
+    finally:
+        sink.close()
+    return rows
+
+
+# Набор правил процесса пула - тот же, что у родителя (передается при запуске процесса)
+_worker = {"rules": None}
+
+
+def _init_worker(rules):
+    rules.batch_weights()
+    _worker["rules"] = rules
+
+
+def _score_block(text, fmt, keep_columns):
+    return score_chunk(parse_block(text, fmt), keep_columns, _worker["rules"])
+
+
+def run_parallel(blocks, fmt, sink, keep_columns, workers, rules, log=sys.stderr):
+    rows = 0
+    started = time.perf_counter()
+    pending = collections.deque()
+    
+    def drain_one():
+        nonlocal rows
+        frame = pending.popleft().result()
+        sink.write(frame)
+        rows += len(frame)
+        elapsed = time.perf_counter() - started
+        print(f"обработано {rows} обращений, {rows / elapsed:,.0f} строк/с", file=log)
+    
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(rules,)) as pool:
+            for text in blocks:
+                pending.append(pool.submit(_score_block, text, fmt, keep_columns))
+                if len(pending) >= 2 * workers:
+                    drain_one()
+            while pending:
+                drain_one()
+    finally:
+        sink.close()
+    return rows
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Потоковая диагностика файла обращений (CSV/JSONL)")
+    parser.add_argument("input", help="входной файл CSV или JSONL ('-' - stdin)")
+    parser.add_argument("-o", "--output", required=True, help="выходной файл .csv или .parquet ('-' - stdout, CSV)")
+    parser.add_argument("--input-format", choices=["csv", "jsonl"])
+    parser.add_argument("--output-format", choices=["csv", "parquet"])
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE,
+                        help=f"строк в одном куске (по умолчанию {DEFAULT_CHUNKSIZE})")
+    parser.add_argument("--keep", default=DEFAULT_KEEP_COLUMNS,
+                        help="входные колонки, переносимые в результат, через запятую")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="число процессов для оценки (по умолчанию 1 - без пула)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    input_format = _detect_format(args.input, args.input_format)
+    output_format = _detect_format(args.output, args.output_format)
+    keep_columns = [c.strip() for c in args.keep.split(",") if c.strip()]
+    try:
+        rules = load_ruleset()
+    except (OSError, KnowledgeBaseError) as exc:
+        sys.exit(f"База знаний: {exc}")
+    
+    sink = open_sink(args.output, output_format)
+    if args.workers > 1:
+        blocks = read_raw_blocks(args.input, input_format, args.chunksize)
+        rows = run_parallel(blocks, input_format, sink, keep_columns, args.workers, rules)
+    else:
+        chunks = read_chunks(args.input, input_format, args.chunksize)
+        rows = run(chunks, sink, keep_columns, rules)
+    print(f"готово: {rows} обращений -> {args.output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,259 @@
+# 🌐 ЛОКАЛЬНЫЙ HTTP/JSON API ДИАГНОСТИКИ
+# Асинхронный сервис на asyncio (без внешних зависимостей) для интеграции
+# с МИС. Параллельные запросы собираются в небольшие пакеты: все, что уже
+# ждет в очереди, забирается сразу и оценивается одним вызовом
+# (cached_medical_diagnosis_many: набор правил берется один раз на пакет,
+# одинаковые обращения оцениваются один раз). Под нагрузкой
+# очередь копится сама, пока цикл событий занят вводом-выводом, поэтому
+# по умолчанию сборщик не ждет. С --window-ms > 0 он дополнительно ждет
+# добора пакета до --max-batch; это добавляет задержку и окупается, только
+# если оценка обходится дороже разбора HTTP и JSON.
+#
+#   python scoring_api.py --port 8765
+#   curl -s localhost:8765/diagnose -d '{"symptoms": ["Кашель"], "temperature": 37.2}'
+#   curl -s localhost:8765/diagnose -d '{"symptoms": ["Кашель"], "top_k": 4}'
+import argparse
+import asyncio
+import functools
+import json
+import logging
+import time
+
+from diagnosis_engine import (
+    DIAGNOSIS_CACHE, VITAL_DEFAULTS, cached_medical_diagnosis_many, cached_medical_diagnosis_system, get_ruleset
+)
+
+log = logging.getLogger(__name__)
+
+DEFAULT_WINDOW_MS = 0.0
+DEFAULT_MAX_BATCH = 64
+MAX_BODY_BYTES = 1 << 20
+
+DEFAULTS = VITAL_DEFAULTS
+
+# Лечебная часть ответа не зависит от пациента - готовим один раз на версию базы знаний
+@functools.lru_cache(maxsize=4)
+def treatment_payloads(rules):
+    return {
+        condition: {
+            "antibiotics_indicated": rules.antibiotics_indicated(condition),
+            "treatments": info["treatments"],
+            "referral": info["referral"],
+            "source": info["source"]
+        }
+        for condition, info in rules.knowledge_base.items()
+    }
+
+
+class RequestError(ValueError):
+    pass
+
+
+def parse_encounter(payload):
+    if not isinstance(payload, dict):
+        raise RequestError("ожидается JSON-объект")
+    symptoms = payload.get("symptoms", [])
+    lab_data = payload.get("lab_data", [])
+    if not isinstance(symptoms, list) or not isinstance(lab_data, list):
+        raise RequestError("symptoms и lab_data должны быть списками")
+    if not all(isinstance(v, str) for v in symptoms) or not all(isinstance(v, str) for v in lab_data):
+        raise RequestError("элементы symptoms и lab_data должны быть строками")
+    try:
+        vitals = {k: float(payload.get(k, default)) for k, default in DEFAULTS.items()}
+    except (TypeError, ValueError):
+        raise RequestError("temperature, bp_systolic, bp_diastolic, wbc, crp должны быть числами")
+    # top_k - сколько первых диагнозов вернуть в ranked (по умолчанию все)
+    top_k = payload.get("top_k")
+    if top_k is not None and (not isinstance(top_k, int) or isinstance(top_k, bool) or top_k < 1):
+        raise RequestError("top_k должно быть положительным целым числом")
+    return (symptoms, lab_data, None, vitals["temperature"], vitals["bp_systolic"],
+            vitals["bp_diastolic"], vitals["wbc"], vitals["crp"], top_k)
+
+
+def diagnosis_response(rules, result):
+    # rules - набор правил, которым result получен: версия и лечение в ответе
+    # должны ему соответствовать, даже если правила уже перезагружены
+    diagnosis, scores = result
+    if isinstance(scores, int):
+        score, ranked = scores, []
+    else:
+        score, ranked = scores[0][1], [{"condition": c, "score": s} for c, s in scores]
+    response = {"diagnosis": diagnosis, "score": score, "ranked": ranked, "knowledge_base_version": rules.version}
+    response.update(treatment_payloads(rules)[diagnosis])
+    return response
+
+
+class MicroBatcher:
+    def __init__(self, window_ms=DEFAULT_WINDOW_MS, max_batch=DEFAULT_MAX_BATCH):
+        self.window = window_ms / 1000.0
+        self.max_batch = max_batch
+        self.queue = asyncio.Queue()
+        self.batches = 0
+        self.items = 0
+        self._last_batch_size = 0
+        self._task = None
+    
+    def start(self):
+        self._task = asyncio.get_running_loop().create_task(self._run())
+    
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+    
+    async def submit(self, encounter):
+        # -> (набор правил, результат)
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((encounter, future))
+        return await future
+    
+    def _drain(self, batch):
+        while len(batch) < self.max_batch:
+            try:
+                batch.append(self.queue.get_nowait())
+            except asyncio.QueueEmpty:
+                break
+    
+    async def _collect(self):
+        batch = [await self.queue.get()]
+        self._drain(batch)
+        # Окно ожидания включается только под нагрузкой: если прошлый пакет
+        # был одиночным, новый запрос обрабатывается без задержки
+        if self._last_batch_size > 1 and len(batch) < self.max_batch:
+            deadline = time.perf_counter() + self.window
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+                self._drain(batch)
+        return batch
+    
+    async def _run(self):
+        while True:
+            batch = await self._collect()
+            self._last_batch_size = len(batch)
+            self.batches += 1
+            self.items += len(batch)
+            pending = [(encounter, future) for encounter, future in batch if not future.done()]
+            rules = get_ruleset()
+            try:
+                results = cached_medical_diagnosis_many([encounter for encounter, _ in pending], rules)
+            except Exception:
+                # Ошибка одного обращения не должна доставаться соседям по пакету
+                for encounter, future in pending:
+                    try:
+                        future.set_result((rules, cached_medical_diagnosis_system(*encounter, rules=rules)))
+                    except Exception as exc:
+                        future.set_exception(exc)
+                continue
+            for (_, future), result in zip(pending, results):
+                future.set_result((rules, result))
+
+
+async def _read_request(reader):
+    head = await reader.readuntil(b"\r\n\r\n")
+    lines = head.decode("latin-1").split("\r\n")
+    method, path, version = lines[0].split(" ", 2)
+    headers = {}
+    for line in lines[1:]:
+        if ":" in line:
+            name, value = line.split(":", 1)
+            headers[name.strip().lower()] = value.strip()
+    length = int(headers.get("content-length", 0))
+    if length > MAX_BODY_BYTES:
+        raise RequestError("слишком большое тело запроса")
+    body = await reader.readexactly(length) if length else b""
+    keep_alive = headers.get("connection", "").lower() != "close" and version == "HTTP/1.1"
+    return method, path, body, keep_alive
+
+
+def _write_response(writer, status, payload, keep_alive):
+    body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    reason = {
+        200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 500: "Internal Server Error"
+    }.get(status, "Error")
+    writer.write(
+        f"HTTP/1.1 {status} {reason}\r\n"
+        "Content-Type: application/json; charset=utf-8\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode("latin-1") + body
+    )
+
+
+class ScoringServer:
+    def __init__(self, window_ms=DEFAULT_WINDOW_MS, max_batch=DEFAULT_MAX_BATCH):
+        self.batcher = MicroBatcher(window_ms, max_batch)
+    
+    async def handle(self, method, path, body):
+        if path == "/health":
+            rules = get_ruleset()
+            return 200, {
+                "status": "ok", "batches": self.batcher.batches, "requests": self.batcher.items,
+                "knowledge_base": {"version": rules.version, "fingerprint": rules.fingerprint},
+                "cache": DIAGNOSIS_CACHE.stats()
+            }
+        if path != "/diagnose":
+            return 404, {"error": "неизвестный путь"}
+        if method != "POST":
+            return 405, {"error": "используйте POST"}
+        try:
+            encounter = parse_encounter(json.loads(body or b"{}"))
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            return 400, {"error": "некорректный JSON"}
+        except RequestError as exc:
+            return 400, {"error": str(exc)}
+        return 200, diagnosis_response(*await self.batcher.submit(encounter))
+    
+    async def serve_connection(self, reader, writer):
+        try:
+            while True:
+                try:
+                    method, path, body, keep_alive = await _read_request(reader)
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    break
+                except (RequestError, ValueError) as exc:
+                    _write_response(writer, 400, {"error": str(exc)}, False)
+                    break
+                try:
+                    status, payload = await self.handle(method, path.split("?")[0], body)
+                except Exception:
+                    log.exception("Ошибка обработки запроса %s %s", method, path)
+                    status, payload = 500, {"error": "внутренняя ошибка сервера"}
+                _write_response(writer, status, payload, keep_alive)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        finally:
+            writer.close()
+    
+    async def start(self, host, port):
+        self.batcher.start()
+        return await asyncio.start_server(self.serve_connection, host, port)
+
+
+async def serve(host, port, window_ms, max_batch):
+    server = await ScoringServer(window_ms, max_batch).start(host, port)
+    print(f"API диагностики: http://{host}:{port}/diagnose")
+    async with server:
+        await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Локальный HTTP/JSON API диагностики")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--window-ms", type=float, default=DEFAULT_WINDOW_MS,
+                        help="максимальное ожидание добора пакета под нагрузкой, мс (по умолчанию не ждать)")
+    parser.add_argument("--max-batch", type=int, default=DEFAULT_MAX_BATCH)
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args.host, args.port, args.window_ms, args.max_batch))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()